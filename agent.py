@@ -0,0 +1,168 @@
+# agent.py
+"""
+The model/tool loop for one user message, independent of Streamlit, so the
+app and the offline benchmarks drive exactly the same code.
+"""
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from agent_config import DEFAULT_TIMEZONE, SYSTEM_PROMPT, TOOLS, context_message
+from history_manager import estimate_tokens
+from logger_config import logger
+from metrics import COUNT_BUCKETS, metrics
+from rate_limiter import gemini_limiter
+
+
+def to_python(value):
+    """Converts proto map/repeated values in function-call args into plain dicts and lists."""
+    if value is None or isinstance(value, (str, bytes, int, float, bool)):
+        return value
+    if hasattr(value, "items"):
+        return {key: to_python(item) for key, item in value.items()}
+    return [to_python(item) for item in value]
+
+
+@dataclass
+class TurnResult:
+    text: str
+    round_trips: int
+    tool_calls: list = field(default_factory=list)  # (name, args) in the order the model made them
+    profile: Optional[str] = None   # cProfile's hottest functions, when the turn was profiled (see SchedulerService)
+
+
+class Agent:
+    """
+    Runs user messages against a model and the calendar tools.
+
+    `model` is anything with Gemini's `generate_content`: the real
+    GenerativeModel in the app, a scripted fake in the benchmarks. The
+    conversation lives in the HistoryManager passed to `respond`, so one
+    Agent serves every session. With a `cache` (a ToolResultCache), read-only
+    tool results are reused and plain schedule lookups are answered from a
+    template without a second model call.
+    """
+
+    def __init__(self, model, executor=None, limiter=gemini_limiter, timezone: str = DEFAULT_TIMEZONE, cache=None):
+        self.model = model
+        self.limiter = limiter
+        self.timezone = timezone
+        self.cache = cache
+        self._executor = executor
+        # Tokens the system prompt and tool declarations add to every request
+        self.overhead_tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(json.dumps(TOOLS))
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            # Imported on first use: it pulls in the whole Calendar stack.
+            from tool_executor import tool_executor
+            self._executor = tool_executor
+        return self._executor
+
+    def generate(self, history, reply=None, shown=None, **kwargs):
+        """
+        Calls the model through the rate limiter, paying for the estimated input tokens.
+        With a StreamingReply, text chunks are pushed to it as they arrive, and the text
+        of this round is appended to `shown`. The stream is read inside the limited call,
+        so a 429/5xx mid-stream is retried like any other, after taking back what the
+        failed attempt showed. The current time goes in as a context note ahead of the
+        history rather than into the system prompt.
+        """
+        started = time.perf_counter()
+        contents = [context_message(self.timezone)] + history.contents()
+        overhead = self.overhead_tokens + estimate_tokens(contents[0])
+        cost = {"input_tokens_per_minute": history.token_count + overhead}
+        streamed = []
+        if reply is not None:
+            reply.checkpoint()
+
+        def attempt():
+            response = self.model.generate_content(contents, stream=reply is not None, **kwargs)
+            if reply is not None:
+                # The reply may be a relay to another thread: only tell it what to do.
+                reply.rewind()
+                reply.new_paragraph()
+                streamed.clear()
+                for chunk in response:
+                    if not chunk.candidates: continue
+                    for part in chunk.candidates[0].content.parts:
+                        reply.add_text(part.text)
+                        streamed.append(part.text)
+            return response
+        with metrics.timer("model_call"):
+            response = self.limiter.call(attempt, cost=cost)
+        if shown is not None:
+            shown.append("".join(streamed))
+        usage = response.usage_metadata
+        metrics.inc("model_tokens_total", usage.prompt_token_count, direction="input")
+        metrics.inc("model_tokens_total", usage.candidates_token_count, direction="output")
+        history.calibrate(usage.prompt_token_count, overhead)
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info("Model call finished in %.1f ms", duration_ms, extra={
+            "duration_ms": duration_ms, "prompt_tokens": usage.prompt_token_count,
+            "output_tokens": usage.candidates_token_count, "total_tokens": usage.total_token_count,
+        })
+        return response
+
+    def respond(self, history, prompt: str, reply=None, on_tool_calls=None) -> TurnResult:
+        """
+        Answers one user message, running whatever tools the model asks for.
+
+        `on_tool_calls(calls)` is told about each batch of (name, args) before it
+        runs. If anything fails, the turn is removed from the history so a retry
+        starts clean, and the exception propagates.
+        """
+        history.add_user_message(prompt)
+        try:
+            shown = []     # the text each round streamed to `reply`
+            response = self.generate(history, reply, shown, generation_config={"candidate_count": 1})
+            round_trips = 1
+            all_calls = []
+            text = None
+
+            while response.candidates[0].content.parts and any(part.function_call for part in response.candidates[0].content.parts):
+                # This is a tool-use turn
+                parts = response.candidates[0].content.parts
+                history.append(response.candidates[0].content)
+                calls = [
+                    (part.function_call.name, {key: to_python(value) for key, value in part.function_call.args.items()})
+                    for part in parts if part.function_call
+                ]
+                all_calls.extend(calls)
+                if on_tool_calls is not None:
+                    on_tool_calls(calls)
+
+                # Independent calls of this turn run concurrently; results keep the call order
+                if self.cache is not None:
+                    tool_results = self.cache.execute(calls, self.executor)
+                else:
+                    tool_results = self.executor.execute(calls)
+
+                # Append all tool results (compacted) and call the model again,
+                # unless a plain schedule lookup can be answered from a template
+                history.add_tool_results(calls, tool_results)
+                if self.cache is not None and round_trips == 1 and not any(part.text for part in parts):
+                    text = self.cache.templated_answer(prompt, calls, tool_results)
+                    if text is not None:
+                        if reply is not None:
+                            reply.add_text(text)
+                            shown.append(text)
+                        break
+                response = self.generate(history, reply, shown)
+                round_trips += 1
+
+            if text is None:
+                text = response.text
+            if reply is not None:
+                reply.finish()
+                # What the user saw, text from earlier tool rounds included, is what the model
+                # sees next turn; rounds are separated the way the reply separates them.
+                text = "\n\n".join(round_text for round_text in shown if round_text)
+            history.add_model_message(text)
+        except Exception:
+            history.discard_current_turn()
+            raise
+        metrics.observe("llm_round_trips_per_message", round_trips, buckets=COUNT_BUCKETS)
+        return TurnResult(text=text, round_trips=round_trips, tool_calls=all_calls)
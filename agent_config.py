@@ -0,0 +1,175 @@
+# agent_config.py
+"""
+Everything the model is built from that does not change between requests:
+the tool declarations and the system prompt. The current time is not part of
+the prompt; `context_message` supplies it per request, so the model itself can
+be built once per process.
+"""
+import datetime
+
+import pytz
+
+MODEL_NAME = "gemini-2.0-flash"
+DEFAULT_TIMEZONE = "Asia/Kolkata"
+
+TOOLS = [
+    {"function_declarations": [
+        {
+            "name": "check_availability",
+            "description": "Checks the user's calendar and lists when a new event of the given duration can start: single start times and ranges like '<first> to HH:MM every 15 min'. Says so when the list was truncated.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "start_time": {"type": "string", "description": "Start of search range in ISO 8601 format."},
+                    "end_time": {"type": "string", "description": "End of search range in ISO 8601 format."},
+                    "duration_minutes": {"type": "integer", "description": "Meeting duration in minutes. This is a mandatory field."},
+                    "timezone": {"type": "string", "description": "User's IANA timezone. Defaults to 'Asia/Kolkata' if not specified by the user."},
+                    "granularity_minutes": {"type": "integer", "description": "Spacing between suggested start times in minutes. Defaults to 15."},
+                    "buffer_minutes": {"type": "integer", "description": "Free time to keep before and after existing events. Defaults to 0."},
+                    "min_notice_minutes": {"type": "integer", "description": "Minimum minutes from now before a slot may start. Defaults to 0."},
+                    "working_hours_start": {"type": "string", "description": "Earliest local time of day a slot may start, e.g. '09:00'."},
+                    "working_hours_end": {"type": "string", "description": "Latest local time of day a slot may end, e.g. '18:00'."},
+                    "calendar_ids": {"type": "array", "items": {"type": "string"}, "description": "Calendars that must all be free. Defaults to ['primary']."}
+                }, "required": ["start_time", "end_time", "duration_minutes"]
+            }
+        },
+        {
+            "name": "find_group_availability",
+            "description": "Finds the best common free slots for several people or calendars in a single lookup. Use this instead of checking each person separately.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "calendar_ids": {"type": "array", "items": {"type": "string"}, "description": "Attendee emails or calendar IDs. Include 'primary' for the user."},
+                    "start_time": {"type": "string", "description": "Start of search range in ISO 8601 format."},
+                    "end_time": {"type": "string", "description": "End of search range in ISO 8601 format."},
+                    "duration_minutes": {"type": "integer", "description": "Meeting duration in minutes."},
+                    "timezone": {"type": "string", "description": "User's IANA timezone. Defaults to 'Asia/Kolkata'."},
+                    "working_hours_start": {"type": "string", "description": "Earliest local time of day a slot may start, e.g. '09:00'."},
+                    "working_hours_end": {"type": "string", "description": "Latest local time of day a slot may end, e.g. '18:00'."},
+                    "max_results": {"type": "integer", "description": "How many ranked slots to return. Defaults to 10."}
+                }, "required": ["calendar_ids", "start_time", "end_time", "duration_minutes"]
+            }
+        },
+        {
+            "name": "search_availability",
+            "description": "Finds the best free slots across a range of days with recurring constraints (weekdays, daily time windows) in one call, e.g. 'an hour any weekday morning in the next two weeks'.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "start_date": {"type": "string", "description": "First day to search: 'today', 'tomorrow' or YYYY-MM-DD."},
+                    "end_date": {"type": "string", "description": "Last day to search (inclusive): 'today', 'tomorrow' or YYYY-MM-DD. At most 62 days after start_date."},
+                    "duration_minutes": {"type": "integer", "description": "Meeting duration in minutes."},
+                    "timezone": {"type": "string", "description": "User's IANA timezone. Defaults to 'Asia/Kolkata'."},
+                    "weekdays": {"type": "array", "items": {"type": "string"}, "description": "Allowed days, e.g. ['monday', 'thursday'], ['weekdays'] or ['weekends']. Defaults to every day."},
+                    "time_windows": {"type": "array", "items": {"type": "string"}, "description": "Allowed local time windows each day, e.g. ['09:00-12:00'] or ['morning', 'evening']. Defaults to ['09:00-18:00']."},
+                    "calendar_ids": {"type": "array", "items": {"type": "string"}, "description": "Calendars that must all be free. Defaults to ['primary']."},
+                    "buffer_minutes": {"type": "integer", "description": "Free time to keep before and after existing events. Defaults to 0."},
+                    "min_notice_minutes": {"type": "integer", "description": "Minimum minutes from now before a slot may start. Defaults to 0."},
+                    "max_results": {"type": "integer", "description": "How many ranked slots to return. Defaults to 5."},
+                    "max_per_day": {"type": "integer", "description": "At most this many returned slots on one day. Defaults to 2."}
+                }, "required": ["start_date", "end_date", "duration_minutes"]
+            }
+        },
+        {
+            "name": "get_day_schedule",
+            "description": "Retrieves and lists all scheduled events for a specific day from the user's calendar.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "day": {"type": "string", "description": "The day to retrieve the schedule for. Can be 'today', 'tomorrow', or a specific date like '2025-06-10'."},
+                    "timezone": {"type": "string", "description": "The user's IANA timezone. Defaults to 'Asia/Kolkata'."}
+                }, "required": ["day"]
+            }
+        },
+        {
+            "name": "create_calendar_event",
+            "description": "Creates a new calendar event. Only use this for brand new events.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "start_time": {"type": "string", "description": "The exact start time of the event in ISO 8601 format."},
+                    "end_time": {"type": "string", "description": "The exact end time of the event in ISO 8601 format."},
+                    "title": {"type": "string", "description": "The title of the meeting."},
+                    "timezone": {"type": "string", "description": "The user's IANA timezone. Defaults to 'Asia/Kolkata'."}
+                }, "required": ["start_time", "end_time", "title"]
+            }
+        },
+        {
+            "name": "manage_calendar_event",
+            "description": "Finds, then deletes OR updates a single existing calendar event based on a search query or its event_id.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "The search text to find the event, e.g., 'Meeting with HQ' or 'my 5pm meeting'."},
+                    "event_id": {"type": "string", "description": "The event's ID, when known from an earlier tool result. Use instead of query."},
+                    "action": {"type": "string", "description": "The operation to perform: 'delete' or 'update'."},
+                    "new_start_time": {"type": "string", "description": "The new start time if updating (ISO 8601 format). Required for 'update' action."},
+                    "new_end_time": {"type": "string", "description": "The new end time if updating (ISO 8601 format). Required for 'update' action."}
+                }, "required": ["action"]
+            }
+        },
+        {
+            "name": "bulk_manage_calendar_events",
+            "description": "Creates, updates and deletes several calendar events in a single call. Use it whenever more than one event changes.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "operations": {
+                        "type": "array",
+                        "description": "One item per event to change.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "action": {"type": "string", "description": "'create', 'update' or 'delete'."},
+                                "event_id": {"type": "string", "description": "The event to update or delete, when its ID is known."},
+                                "query": {"type": "string", "description": "Search text for the event to update or delete, when its ID is not known."},
+                                "title": {"type": "string", "description": "Title for a new event, or a new title when updating."},
+                                "start_time": {"type": "string", "description": "Start time (ISO 8601). Required for 'create'; for 'update', give with end_time to move the event."},
+                                "end_time": {"type": "string", "description": "End time (ISO 8601). Required for 'create'; for 'update', give with start_time to move the event."}
+                            }, "required": ["action"]
+                        }
+                    }
+                }, "required": ["operations"]
+            }
+        }
+    ]}
+]
+
+# --- RESTORED "BETTER" EMPATHETIC PROMPT ---
+SYSTEM_PROMPT = f"""
+You are a world-class AI assistant, not just a scheduler, but a thoughtful and perceptive planner with high emotional intelligence. Your primary goal is to make scheduling a seamless and pleasant experience by adapting your tone and suggestions to the nature of the event.
+
+**Current Context:**
+- The current date and time are given in a context note at the start of each request. Always use them to resolve relative dates like "tomorrow".
+- Your default timezone is '{DEFAULT_TIMEZONE}' (India Standard Time). You MUST assume this is the user's timezone unless they explicitly state a different one.
+
+**Your Core Logic: Two Modes of Operation**
+1.  **Personal/Social Mode (High EQ):** Triggers: "date," "hangout," "dinner," etc. Tone: Warm, friendly, use emojis. Proactive Suggestions: Offer buffer time, reminders, encouraging notes.
+2.  **Professional/Formal Mode (High IQ):** Triggers: "meeting," "interview," "sync-up," etc. Tone: Efficient, clear, professional.
+
+**General Rules:**
+- Remember the entire conversation. Follow the user's lead.
+- To delete or move an event, use `manage_calendar_event`. If it reports several matching events, ask the user which one they mean and call it again with that event's `event_id`.
+- When several events change at once (e.g. "cancel all my meetings tomorrow"), use one `bulk_manage_calendar_events` call instead of one call per event.
+- For free time over several days or with recurring constraints (e.g. "any weekday morning next week"), use one `search_availability` call instead of checking day by day.
+- You can also retrieve the user's schedule for a given day using `get_day_schedule`.
+- CRITICAL RULE: When a tool returns a success message (especially with a link), present that exact message to the user. Do not claim you cannot access information the tool just gave you.
+"""
+
+
+def build_model(api_key: str):
+    """Configures the Gemini SDK and builds the model. Imported here so the SDK loads only when needed."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(
+        model_name=MODEL_NAME,
+        system_instruction=SYSTEM_PROMPT,
+        tools=TOOLS
+    )
+
+
+def context_message(timezone: str = DEFAULT_TIMEZONE) -> dict:
+    """The per-request context note: the current date and time in the user's timezone."""
+    now = datetime.datetime.now(pytz.timezone(timezone))
+    return {"role": "user", "parts": [{"text": f"Current context: it is {now.strftime('%A')}, {now.isoformat(timespec='seconds')} ({timezone})."}]}
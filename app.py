@@ -1,22 +1,29 @@
 # app.py
 import streamlit as st
-import google.generativeai as genai
 import json
-from datetime import datetime
-import speech_recognition as sr
 import os
-import io
-import pytz
+import threading
+import uuid
 
-# Import our custom modules
-from config import GEMINI_API_KEY
-from calendar_tools import check_availability, create_calendar_event, get_day_schedule, manage_calendar_event, get_calendar_service
-from logger_config import logger
+# Import our custom modules. The Gemini SDK, the Calendar client and speech
+# recognition are heavy; they are imported where they are first needed so the
+# page paints before they load.
+from agent import Agent
+from agent_config import build_model
+from config import DEFAULT_USER, require_gemini_api_key
+from history_manager import HistoryManager
+from logger_config import log_context, logger
+from metrics import METRICS_PORT, metrics, start_metrics_server
+from rate_limiter import RateLimitExceeded
+from service import ServiceBusy
+from streaming import StreamingReply
 
 # Import Streamlit UI components
 from streamlit_mic_recorder import mic_recorder
 from streamlit_js_eval import streamlit_js_eval
 
+GEMINI_API_KEY = require_gemini_api_key()
+
 # --- Page & Model Configuration ---
 st.set_page_config(
     page_title="Smart Scheduler AI",
@@ -26,120 +33,125 @@ st.set_page_config(
 st.title("🗓️ Smart Scheduler AI Agent")
 st.caption("I'm a perceptive planner. I can schedule, manage, and tell you about your day!")
 
+@st.cache_resource
+def load_clients():
+    """Every user's Calendar client (credentials, refresh timer, warm services), once per process."""
+    from calendar_client import CalendarClientCache
+    return CalendarClientCache()
+
+def current_user_id():
+    """The signed-in user's email when Streamlit authentication is configured; otherwise the account in token.json."""
+    return st.user.email if st.user.get("is_logged_in") else DEFAULT_USER
+
 # --- Authentication & Initialization ---
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
 
 if not st.session_state.authenticated:
-    if os.path.exists("token.json"):
+    user_id = current_user_id()
+    if user_id == DEFAULT_USER:
+        # Local run: the desktop flow opens a browser on this machine. The Calendar
+        # client is heavy to import, so it is left alone while token.json exists.
+        if os.path.exists("token.json"):
+            st.session_state.authenticated = True
+        else:
+            st.warning("You are not authenticated with Google Calendar.")
+            if st.button("Authenticate with Google Calendar"):
+                load_clients().get(user_id).get_credentials()
+                st.session_state.authenticated = True
+                st.success("Authentication successful! Please reload the page.")
+                st.rerun()
+    elif load_clients().get(user_id).has_token():
         st.session_state.authenticated = True
+    elif "code" in st.query_params and "state" in st.query_params:
+        # Back from Google's consent page (web OAuth redirect flow)
+        from calendar_client import CalendarAuthRequired
+        try:
+            load_clients().complete_authorization(user_id, st.query_params["state"], st.query_params["code"])
+            st.session_state.authenticated = True
+        except CalendarAuthRequired as e:
+            st.session_state.auth_error = str(e)
+        except Exception as e:
+            logger.error("Google sign-in failed: %s", e, exc_info=True)
+            st.session_state.auth_error = f"Google sign-in failed: {e}"
+        st.session_state.pop("auth_url", None)
+        st.query_params.clear()
+        st.rerun()
     else:
+        if "auth_error" in st.session_state:
+            st.error(st.session_state.pop("auth_error"))
         st.warning("You are not authenticated with Google Calendar.")
-        if st.button("Authenticate with Google Calendar"):
-            get_calendar_service() 
-            st.session_state.authenticated = True
-            st.success("Authentication successful! Please reload the page.")
-            st.rerun()
+        if "auth_url" not in st.session_state:
+            st.session_state.auth_url = load_clients().authorization_url(user_id)
+        st.link_button("Authenticate with Google Calendar", st.session_state.auth_url)
 
 with st.sidebar:
     st.header("Controls")
     if st.button("Start New Conversation"):
         # Clear all session state associated with the conversation
         for key in list(st.session_state.keys()):
-            if key in ['messages', 'history']:
+            if key in ['messages', 'history', 'conversation_id']:
                 del st.session_state[key]
         st.rerun()
     if st.button("Clear Google Credentials"):
-        if os.path.exists("token.json"): os.remove("token.json")
+        from event_store import reset_event_stores
+        user_id = current_user_id()
+        user_client = load_clients().get(user_id)
+        if os.path.exists(user_client.token_file): os.remove(user_client.token_file)
+        user_client.reset()
+        reset_event_stores(user_id)
         st.session_state.authenticated = False
+        st.session_state.pop("auth_url", None)
         st.rerun()
+    stream_responses = st.checkbox("Stream responses", value=True, help="Show and speak the reply while it is being generated.")
+    with st.expander("Debug: performance"):
+        profile_next = st.checkbox("Profile messages", help="While checked, each turn runs under cProfile on its service worker and its hottest functions are shown here. Tool calls run on other threads and show up only as waits.")
+        st.dataframe(metrics.summary(), hide_index=True)
+        round_trips = metrics.histogram("llm_round_trips_per_message")
+        if round_trips is not None and round_trips.count:
+            st.caption(f"LLM round trips per message: {round_trips.sum / round_trips.count:.2f} on average over {round_trips.count} messages")
+        hits, misses = metrics.total("tool_cache_hits_total"), metrics.total("tool_cache_misses_total")
+        if hits + misses:
+            st.caption(f"Tool cache: {hits / (hits + misses):.0%} hit rate over {hits + misses:.0f} lookups, "
+                       f"{metrics.total('templated_answers_total'):.0f} templated answers, "
+                       f"~{metrics.total('tool_cache_saved_seconds_total'):.1f}s saved")
+        queue_wait = metrics.histogram("service_queue_wait_seconds")
+        if queue_wait is not None and queue_wait.count:
+            st.caption(f"Service: {queue_wait.sum / queue_wait.count * 1000:.0f} ms mean queue wait over {queue_wait.count} turns, "
+                       f"{metrics.total('service_rejections_total'):.0f} refused as busy")
+        st.json(metrics.counters())
+        if "last_profile" in st.session_state:
+            st.code(st.session_state.last_profile)
 
 # --- Model, Tools, and Prompt Configuration ---
-genai.configure(api_key=GEMINI_API_KEY)
-
-tools = [
-    {"function_declarations": [
-        {
-            "name": "check_availability",
-            "description": "Checks the user's calendar for available slots to schedule a new event.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "start_time": {"type": "string", "description": "Start of search range in ISO 8601 format."},
-                    "end_time": {"type": "string", "description": "End of search range in ISO 8601 format."},
-                    "duration_minutes": {"type": "integer", "description": "Meeting duration in minutes. This is a mandatory field."},
-                    "timezone": {"type": "string", "description": "User's IANA timezone. Defaults to 'Asia/Kolkata' if not specified by the user."}
-                }, "required": ["start_time", "end_time", "duration_minutes"]
-            }
-        },
-        {
-            "name": "get_day_schedule",
-            "description": "Retrieves and lists all scheduled events for a specific day from the user's calendar.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "day": {"type": "string", "description": "The day to retrieve the schedule for. Can be 'today', 'tomorrow', or a specific date like '2025-06-10'."},
-                    "timezone": {"type": "string", "description": "The user's IANA timezone. Defaults to 'Asia/Kolkata'."}
-                }, "required": ["day"]
-            }
-        },
-        {
-            "name": "create_calendar_event",
-            "description": "Creates a new calendar event. Only use this for brand new events.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "start_time": {"type": "string", "description": "The exact start time of the event in ISO 8601 format."},
-                    "end_time": {"type": "string", "description": "The exact end time of the event in ISO 8601 format."},
-                    "title": {"type": "string", "description": "The title of the meeting."},
-                    "timezone": {"type": "string", "description": "The user's IANA timezone. Defaults to 'Asia/Kolkata'."}
-                }, "required": ["start_time", "end_time", "title"]
-            }
-        },
-        {
-            "name": "manage_calendar_event",
-            "description": "Finds, then deletes OR updates a single existing calendar event based on a search query.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string", "description": "The search text to find the event, e.g., 'Meeting with HQ' or 'my 5pm meeting'."},
-                    "action": {"type": "string", "description": "The operation to perform: 'delete' or 'update'."},
-                    "new_start_time": {"type": "string", "description": "The new start time if updating (ISO 8601 format). Required for 'update' action."},
-                    "new_end_time": {"type": "string", "description": "The new end time if updating (ISO 8601 format). Required for 'update' action."}
-                }, "required": ["query", "action"]
-            }
-        }
-    ]}
-]
-
-# --- RESTORED "BETTER" EMPATHETIC PROMPT ---
-system_prompt = f"""
-You are a world-class AI assistant, not just a scheduler, but a thoughtful and perceptive planner with high emotional intelligence. Your primary goal is to make scheduling a seamless and pleasant experience by adapting your tone and suggestions to the nature of the event.
-
-**Current Context:**
-- The current date and time is: {datetime.now(pytz.timezone('Asia/Kolkata')).isoformat()}
-- Your default timezone is 'Asia/Kolkata' (India Standard Time). You MUST assume this is the user's timezone unless they explicitly state a different one.
-
-**Your Core Logic: Two Modes of Operation**
-1.  **Personal/Social Mode (High EQ):** Triggers: "date," "hangout," "dinner," etc. Tone: Warm, friendly, use emojis. Proactive Suggestions: Offer buffer time, reminders, encouraging notes.
-2.  **Professional/Formal Mode (High IQ):** Triggers: "meeting," "interview," "sync-up," etc. Tone: Efficient, clear, professional.
-
-**General Rules:**
-- Remember the entire conversation. Follow the user's lead.
-- To delete an event, you must follow a two-step process: First, use `find_calendar_event` to get the event's unique ID. Then, after confirming with the user, use `delete_calendar_event` with that ID.
-- You can also retrieve the user's schedule for a given day using `get_day_schedule`.
-- CRITICAL RULE: When a tool returns a success message (especially with a link), present that exact message to the user. Do not claim you cannot access information the tool just gave you.
-"""
-
-# Initialize the model and history management
-model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash",
-    system_instruction=system_prompt,
-    tools=tools
-)
+@st.cache_resource(show_spinner="Loading the assistant...")
+def load_service():
+    """Builds the Gemini model, the tool-result cache, the agent loop and the worker pool
+    that runs it once per process; they are shared by every session and rerun."""
+    from service import SchedulerService
+    from tool_cache import ToolResultCache
+    return SchedulerService(Agent(build_model(GEMINI_API_KEY), cache=ToolResultCache()), clients=load_clients())
+
+@st.cache_resource
+def warm_up():
+    """Imports the Gemini SDK and the tool stack on a background thread, once per process,
+    so the first message does not pay for them."""
+    def load():
+        import google.generativeai  # noqa: F401
+        import tool_executor  # noqa: F401
+    thread = threading.Thread(target=load, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+@st.cache_resource
+def metrics_server():
+    """The Prometheus /metrics endpoint, one per process."""
+    return start_metrics_server(int(METRICS_PORT))
 
 if "history" not in st.session_state:
-    st.session_state.history = []
+    st.session_state.history = HistoryManager()
+if "conversation_id" not in st.session_state:
+    st.session_state.conversation_id = uuid.uuid4().hex
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -151,99 +163,143 @@ for message in st.session_state.messages:
             with st.expander("View Tool Details"):
                 st.code(message["details"], language="json")
 
-def speak(text):
+def speak(text, key=None):
     text = text.replace("'", "\\'").replace("\n", " ")
     js_code = f"""
         const utterance = new SpeechSynthesisUtterance('{text}');
         utterance.lang = 'en-US';
         window.speechSynthesis.speak(utterance);
     """
-    streamlit_js_eval(js_code=js_code)
+    streamlit_js_eval(js_expressions=js_code, key=key)
 
 def process_and_respond(prompt):
     # Add user message to display history and API history
     st.session_state.messages.append({"role": "user", "content": prompt})
-    st.session_state.history.append({"role": "user", "parts": [{"text": prompt}]})
+    history = st.session_state.history
 
     with st.chat_message("user"):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
-            try:
-                # Use the low-level API for robust history management
-                response = model.generate_content(
-                    st.session_state.history,
-                    generation_config=genai.types.GenerationConfig(candidate_count=1)
+            reply = None
+            if stream_responses:
+                text_placeholder = st.empty()
+                turn_id = len(st.session_state.messages)
+                sentence_ids = iter(range(10_000))
+                reply = StreamingReply(
+                    render=text_placeholder.markdown,
+                    speak=lambda sentence: speak(sentence, key=f"tts-{turn_id}-{next(sentence_ids)}"),
                 )
 
-                while response.candidates[0].content.parts and any(part.function_call for part in response.candidates[0].content.parts):
-                    # This is a tool-use turn
-                    st.session_state.history.append(response.candidates[0].content)
-                    function_responses = []
-                    
-                    for part in response.candidates[0].content.parts:
-                        if not part.function_call: continue # Skip non-function call parts
-
-                        function_call = part.function_call
-                        function_name = function_call.name
-                        args = {key: value for key, value in function_call.args.items()}
-                        
-                        tool_details = json.dumps({"tool_name": function_name, "arguments": args}, indent=2)
-                        st.info(f"⚙️ Using tool: `{function_name}`")
-                        with st.expander("View Tool Details"):
-                            st.code(tool_details, language="json")
-
-                        # Execute the correct tool
-                        if function_name == "check_availability":
-                            tool_result = check_availability(**args)
-                        elif function_name == "get_day_schedule":
-                            tool_result = get_day_schedule(**args)
-                        elif function_name == "create_calendar_event":
-                            tool_result = create_calendar_event(**args)
-                        elif function_name == "manage_calendar_event":
-                            tool_result = manage_calendar_event(**args)
-                        else:
-                            tool_result = f"Unknown tool requested: {function_name}"
-                        
-                        function_responses.append({
-                            "function_response": {
-                                "name": function_name,
-                                "response": {"result": json.dumps(tool_result)}
-                            }
-                        })
-                    
-                    # Append all tool results and call the model again
-                    st.session_state.history.append({"role": "model", "parts": function_responses})
-                    response = model.generate_content(st.session_state.history)
-
-                final_response = response.text
-                st.markdown(final_response)
-                speak(final_response)
-                st.session_state.messages.append({"role": "assistant", "content": final_response, "details": "Tool sequence complete."})
-                st.session_state.history.append({"role": "model", "parts": [{"text": final_response}]})
+            def show_tool_calls(calls):
+                for function_name, args in calls:
+                    tool_details = json.dumps({"tool_name": function_name, "arguments": args}, indent=2)
+                    st.info(f"⚙️ Using tool: `{function_name}`")
+                    with st.expander("View Tool Details"):
+                        st.code(tool_details, language="json")
 
+            from calendar_client import CalendarAuthRequired  # already loaded by the service
+            try:
+                # Runs on the shared worker pool; the reply and tool callbacks still run here
+                result = load_service().respond(current_user_id(), history, prompt, reply, on_tool_calls=show_tool_calls,
+                                                profile=profile_next)
+                if result.profile is not None:
+                    st.session_state.last_profile = result.profile
+                if reply is not None:
+                    shown = reply.text
+                else:
+                    st.markdown(result.text)
+                    speak(result.text)
+                    shown = result.text
+                st.session_state.messages.append({"role": "assistant", "content": shown, "details": "Tool sequence complete."})
+
+            except ServiceBusy as e:
+                # Refused before it started; the history is untouched
+                logger.warning("Service busy: %s", e)
+                error_message = "I'm busy with other requests right now. Please try again in a few seconds."
+                st.error(error_message)
+                st.session_state.messages.append({"role": "assistant", "content": error_message})
+            except CalendarAuthRequired as e:
+                # Refused before it started, e.g. after the token file was removed; sign in again
+                logger.warning("Calendar access missing: %s", e)
+                error_message = "I can't reach your Google Calendar any more. Please authenticate again."
+                st.error(error_message)
+                st.session_state.messages.append({"role": "assistant", "content": error_message})
+                st.session_state.authenticated = False
+            except RateLimitExceeded as e:
+                # The agent has already dropped the unfinished turn from the history
+                logger.error("Rate limit exhausted: %s", e)
+                error_message = "I'm receiving too many requests right now. Please try again in a minute."
+                st.error(error_message)
+                st.session_state.messages.append({"role": "assistant", "content": error_message})
             except Exception as e:
-                logger.error(f"An error occurred: {e}", exc_info=True)
+                logger.error("An error occurred: %s", e, exc_info=True)
                 error_message = f"An error occurred: {e}"
                 st.error(error_message)
                 st.session_state.messages.append({"role": "assistant", "content": error_message})
-                st.session_state.history.append({"role": "model", "parts": [{"text": f"Error: {e}"}]})
+
+def handle_message(prompt):
+    """One user message, tagged for the logs and timed; `process_and_respond` asks the service to profile it when requested in the sidebar."""
+    with log_context(conversation_id=st.session_state.conversation_id), metrics.timer("turn"):
+        process_and_respond(prompt)
 
 # --- User Input Handling ---
 if st.session_state.authenticated:
-    audio_bytes = mic_recorder(start_prompt="🎤", stop_prompt="⏹️", key='recorder', use_container_width=True, format="wav")
+    audio_bytes = mic_recorder(start_prompt="🎤", stop_prompt="⏹️", key='recorder', just_once=True, use_container_width=True, format="wav")
 
     if audio_bytes:
-        r = sr.Recognizer()
-        audio_io = io.BytesIO(audio_bytes['bytes'])
-        with sr.AudioFile(audio_io) as source:
-            audio_data = r.record(source)
+        # Transcribed on a worker thread; the fragment below shows the partial
+        # transcript and hands the final one back to a full rerun, where it can
+        # be corrected before it is sent.
+        from speech import TranscriptionError, start_transcription
+        with log_context(conversation_id=st.session_state.conversation_id):
+            try:
+                st.session_state.transcription = start_transcription(audio_bytes['bytes'])
+            except TranscriptionError as e:
+                # A misconfigured backend (unknown SPEECH_BACKEND, no VOSK_MODEL_PATH) fails before any audio is read.
+                logger.error("Could not start transcription: %s", e)
+                st.error(f"Voice input is unavailable: {e}")
+
+    @st.fragment(run_every=0.3)
+    def transcription_status():
+        job = st.session_state.get("transcription")
+        if job is None:
+            return
+        if not job.done():
+            st.caption(f"🎤 {job.partial}…" if job.partial else "🎤 Transcribing…")
+            return
+        del st.session_state.transcription
         try:
-            prompt = r.recognize_google(audio_data)
-            process_and_respond(prompt)
-        except (sr.UnknownValueError, sr.RequestError) as e:
-            st.error(f"Could not understand audio or there was a service error: {e}")
+            st.session_state.voice_draft = job.result()
+        except Exception as e:
+            logger.error("Transcription failed: %s", e)
+            st.session_state.voice_error = str(e)
+        st.rerun()
+
+    if "transcription" in st.session_state:
+        transcription_status()
+    if voice_error := st.session_state.pop("voice_error", None):
+        st.error(f"Could not understand audio or there was a service error: {voice_error}")
+
+    def send_voice_draft():
+        st.session_state.voice_prompt = st.session_state.pop("voice_draft", "").strip()
+
+    def discard_voice_draft():
+        st.session_state.pop("voice_draft", None)
+
+    if "voice_draft" in st.session_state:
+        st.text_area("Transcript", key="voice_draft", help="Correct anything misheard, then send it.")
+        send_column, discard_column = st.columns(2)
+        send_column.button("Send", on_click=send_voice_draft, type="primary", use_container_width=True)
+        discard_column.button("Discard", on_click=discard_voice_draft, use_container_width=True)
+    if voice_prompt := st.session_state.pop("voice_prompt", None):
+        handle_message(voice_prompt)
 
     if prompt := st.chat_input("Or type your message here..."):
-        process_and_respond(prompt)
\ No newline at end of file
+        handle_message(prompt)
+
+# Everything above has rendered; load the rest in the background.
+warm_up()
+if METRICS_PORT:
+    metrics_server()
@@ -0,0 +1,243 @@
+# availability.py
+import datetime
+
+import numpy as np
+import pytz
+
+DEFAULT_GRANULARITY_MINUTES = 15
+# Free time beyond this on either side of a slot no longer improves its rank.
+SLACK_CAP_MINUTES = 120
+
+
+class IntervalIndex:
+    """
+    Sorted, immutable set of [start, end) intervals held as int64 epoch-second arrays.
+
+    Lookups use binary search over the arrays, so building is O(n log n) and
+    each query is O(log n) regardless of how many months of events are loaded.
+    """
+
+    def __init__(self, starts, ends):
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        order = np.argsort(starts, kind="stable")
+        self.starts = starts[order]
+        self.ends = ends[order]
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """Builds an index from (start, end) epoch pairs."""
+        if not len(pairs):
+            return cls(np.empty(0, np.int64), np.empty(0, np.int64))
+        arr = np.asarray(pairs, dtype=np.float64)
+        return cls(np.floor(arr[:, 0]), np.ceil(arr[:, 1]))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def padded(self, seconds: int) -> "IntervalIndex":
+        """Returns a copy with every interval widened by `seconds` on both sides."""
+        if not seconds:
+            return self
+        return IntervalIndex(self.starts - seconds, self.ends + seconds)
+
+    def merged(self) -> "IntervalIndex":
+        """Returns the union of the intervals as disjoint, sorted intervals."""
+        if len(self) < 2:
+            return self
+        running_end = np.maximum.accumulate(self.ends)
+        # A new group begins wherever a start lies beyond everything seen so far.
+        breaks = np.flatnonzero(self.starts[1:] > running_end[:-1]) + 1
+        group_starts = np.concatenate(([0], breaks))
+        group_ends = np.concatenate((breaks - 1, [len(self) - 1]))
+        return IntervalIndex(self.starts[group_starts], running_end[group_ends])
+
+    def overlapping(self, lo: int, hi: int) -> "IntervalIndex":
+        """Returns the intervals that overlap [lo, hi). Assumes a merged index."""
+        first = np.searchsorted(self.ends, lo, side="right")
+        last = np.searchsorted(self.starts, hi, side="left")
+        return IntervalIndex(self.starts[first:last], self.ends[first:last])
+
+    def conflicts(self, starts, duration: int):
+        """Boolean mask of which candidate [start, start + duration) ranges hit an interval. Assumes a merged index."""
+        starts = np.asarray(starts, dtype=np.int64)
+        if not len(self):
+            return np.zeros(len(starts), dtype=bool)
+        # First interval that ends after the candidate starts; it is the only one that can overlap.
+        idx = np.searchsorted(self.ends, starts, side="right")
+        hit = idx < len(self)
+        hit[hit] = self.starts[idx[hit]] < starts[hit] + duration
+        return hit
+
+    def contains(self, starts, duration: int):
+        """Boolean mask of which candidate ranges lie entirely inside one interval. Assumes a merged index."""
+        starts = np.asarray(starts, dtype=np.int64)
+        if not len(self):
+            return np.zeros(len(starts), dtype=bool)
+        idx = np.searchsorted(self.starts, starts, side="right") - 1
+        ok = idx >= 0
+        ok[ok] = starts[ok] + duration <= self.ends[idx[ok]]
+        return ok
+
+
+def working_windows(start_ts: int, end_ts: int, tz, day_start: datetime.time, day_end: datetime.time, weekdays=None) -> IntervalIndex:
+    """
+    Returns the daily [day_start, day_end) windows in `tz` that touch the range.
+
+    Each day is localized separately so DST transitions shift the window
+    correctly. `weekdays` is an optional set of ints (Monday=0).
+    """
+    first = datetime.datetime.fromtimestamp(start_ts, tz).date() - datetime.timedelta(days=1)
+    last = datetime.datetime.fromtimestamp(end_ts, tz).date()
+    starts, ends = [], []
+    day = first
+    while day <= last:
+        if weekdays is None or day.weekday() in weekdays:
+            starts.append(tz.localize(datetime.datetime.combine(day, day_start)).timestamp())
+            # An end at or before the start (e.g. 22:00-06:00) runs into the next day.
+            end_day = day if day_end > day_start else day + datetime.timedelta(days=1)
+            ends.append(tz.localize(datetime.datetime.combine(end_day, day_end)).timestamp())
+        day += datetime.timedelta(days=1)
+    return IntervalIndex(starts, ends).merged()
+
+
+def find_free_slots(busy, start_ts: int, end_ts: int, duration_minutes: int,
+                    granularity_minutes: int = DEFAULT_GRANULARITY_MINUTES, buffer_minutes: int = 0,
+                    min_notice_minutes: int = 0, now_ts: int = None, allowed: IntervalIndex = None, tz=None):
+    """
+    Enumerates every slot start in [start_ts, end_ts) where a meeting fits.
+
+    Args:
+        busy: IntervalIndex (or iterable of (start, end) epoch pairs) of busy time.
+        start_ts, end_ts: Search range as epoch seconds.
+        duration_minutes: Meeting length.
+        granularity_minutes: Candidate starts are aligned to this step.
+        buffer_minutes: Free time required around every busy interval.
+        min_notice_minutes: Earliest start, measured from `now_ts`.
+        now_ts: Current epoch seconds; only used with `min_notice_minutes`.
+        allowed: Optional IntervalIndex (e.g. from `working_windows`) the slot must fall inside.
+        tz: Timezone whose wall clock the step is aligned to (so 60-minute steps land on
+            the hour in e.g. Asia/Kolkata); UTC when omitted.
+
+    Returns:
+        A sorted int64 array of slot start epochs.
+    """
+    if not isinstance(busy, IntervalIndex):
+        busy = IntervalIndex.from_pairs(list(busy))
+    duration = int(duration_minutes) * 60
+    step = int(granularity_minutes) * 60
+    earliest = int(np.ceil(start_ts))
+    if min_notice_minutes and now_ts is not None:
+        earliest = max(earliest, int(now_ts) + int(min_notice_minutes) * 60)
+    offset = int(datetime.datetime.fromtimestamp(earliest, tz).utcoffset().total_seconds()) if tz is not None else 0
+    first = earliest + (-(earliest + offset)) % step  # ceil to the local grid
+    candidates = np.arange(first, int(end_ts) - duration + 1, step, dtype=np.int64)
+    if not len(candidates):
+        return candidates
+    blocked = busy.padded(int(buffer_minutes) * 60).merged().overlapping(first, int(end_ts))
+    mask = ~blocked.conflicts(candidates, duration)
+    if allowed is not None:
+        mask &= allowed.contains(candidates, duration)
+    return candidates[mask]
+
+
+def slot_slack(busy: IntervalIndex, slots, duration_minutes: int):
+    """
+    Breathing room of each slot in seconds: the smaller of the free time before
+    and after it, capped at SLACK_CAP_MINUTES. `busy` must be merged and every
+    slot must be free of it.
+    """
+    slots = np.asarray(slots, dtype=np.int64)
+    cap = SLACK_CAP_MINUTES * 60
+    duration = int(duration_minutes) * 60
+    idx = np.searchsorted(busy.ends, slots, side="right")
+    after = np.full(len(slots), cap, dtype=np.int64)
+    before = np.full(len(slots), cap, dtype=np.int64)
+    has_next = idx < len(busy)
+    after[has_next] = busy.starts[idx[has_next]] - (slots[has_next] + duration)
+    has_prev = idx > 0
+    before[has_prev] = slots[has_prev] - busy.ends[idx[has_prev] - 1]
+    return np.minimum(np.minimum(before, after), cap)
+
+
+def rank_slots(busy: IntervalIndex, slots, duration_minutes: int, limit: int = None):
+    """
+    Orders free slots by breathing room (see `slot_slack`), largest first,
+    with earlier slots winning ties.
+    """
+    slots = np.asarray(slots, dtype=np.int64)
+    if not len(slots):
+        return slots
+    order = np.lexsort((slots, -slot_slack(busy, slots, duration_minutes)))
+    return slots[order][:limit]
+
+
+def recurring_windows(start_ts: int, end_ts: int, tz, windows, weekdays=None) -> IntervalIndex:
+    """The union of `working_windows` for each (day_start, day_end) in `windows`, on `weekdays`."""
+    starts, ends = [], []
+    for day_start, day_end in windows:
+        index = working_windows(start_ts, end_ts, tz, day_start, day_end, weekdays)
+        starts.append(index.starts)
+        ends.append(index.ends)
+    return IntervalIndex(np.concatenate(starts), np.concatenate(ends)).merged()
+
+
+def local_days(slots, tz):
+    """Local day number (0 = the first slot's day) of every slot, from the DST-aware midnights spanning them."""
+    slots = np.asarray(slots, dtype=np.int64)
+    first = datetime.datetime.fromtimestamp(int(slots.min()), tz).date()
+    last = datetime.datetime.fromtimestamp(int(slots.max()), tz).date()
+    midnights = [tz.localize(datetime.datetime.combine(first + datetime.timedelta(days=i), datetime.time())).timestamp()
+                 for i in range((last - first).days + 1)]
+    return np.searchsorted(np.asarray(midnights), slots, side="right") - 1
+
+
+def free_runs(slots, granularity_minutes: int, tz):
+    """
+    Groups sorted slot starts into runs that are one step apart on the same
+    local day. Returns (first start, last start) arrays, one entry per run.
+    """
+    slots = np.asarray(slots, dtype=np.int64)
+    if not len(slots):
+        return slots, slots
+    breaks = np.flatnonzero((np.diff(slots) != int(granularity_minutes) * 60) | (np.diff(local_days(slots, tz)) != 0)) + 1
+    return slots[np.r_[0, breaks]], slots[np.r_[breaks - 1, len(slots) - 1]]
+
+
+def select_best_slots(busy: IntervalIndex, slots, duration_minutes: int, tz, limit: int, max_per_day: int = None):
+    """
+    Picks up to `limit` slots by breathing room that do not overlap each
+    other, at most `max_per_day` per local day so the picks spread over the
+    range instead of crowding into its first free morning.
+
+    Returns:
+        (slot starts, scores) in rank order; a score is the slot's breathing
+        room as a fraction of SLACK_CAP_MINUTES, so 1.0 means unhurried on both sides.
+    """
+    slots = np.asarray(slots, dtype=np.int64)
+    if not len(slots):
+        return slots, np.empty(0)
+    slack = slot_slack(busy, slots, duration_minutes)
+    order = np.lexsort((slots, -slack))
+    duration = int(duration_minutes) * 60
+    days = local_days(slots, tz)
+    picked, per_day = [], {}
+    for i in order:
+        start, day = slots[i], days[i]
+        if max_per_day and per_day.get(day, 0) >= max_per_day:
+            continue
+        if any(abs(start - slots[j]) < duration for j in picked):
+            continue
+        picked.append(i)
+        per_day[day] = per_day.get(day, 0) + 1
+        if len(picked) == limit:
+            break
+    picked = np.asarray(picked, dtype=np.int64)
+    return slots[picked], slack[picked] / (SLACK_CAP_MINUTES * 60)
+
+
+def to_isoformat(slots, tz) -> list[str]:
+    """Formats epoch slot starts as ISO 8601 strings in `tz`."""
+    if isinstance(tz, str):
+        tz = pytz.timezone(tz)
+    return [datetime.datetime.fromtimestamp(ts, tz).isoformat() for ts in np.asarray(slots).tolist()]
@@ -0,0 +1,238 @@
+# benchmarks/bench_agent_load.py
+"""
+Load test of the whole agent loop, offline: N simulated users replay
+conversation traces through `agent.Agent.respond` (the loop the app runs for
+every message) against the fake Gemini model and the mock Calendar server in
+`fakes.py`. The real tools, executor, event store, history and logging run.
+
+A trace file is JSONL. A line with "messages" (strings, or {"role", "content"}
+objects whose user turns are replayed) is one conversation; a line with
+"prompt", "text" or "body" is a one-message conversation, so a request log like
+requests.jsonl can be replayed as is. Without --trace a built-in set is used.
+Conversations are dealt round-robin to the users, each with its own history;
+every user gets the same number, wrapping around the traces (so some are
+replayed more than once) when they do not divide evenly or are fewer than the users.
+
+Reports throughput, p50/p95/p99 turn latency, LLM round trips and tool calls
+per turn, errors, tool-cache hit rate and the time it saved, and peak memory; --json prints the same as one JSON object
+for tracking across commits. Gemini quota is lifted (the fake has none); the
+Calendar limiter stays as in production and its queueing is reported.
+
+With --workers N, turns go through `service.SchedulerService` as in the app:
+each simulated user is a separate user with their own Calendar client, turns
+run on N workers, and overload is refused as busy. The report then also gives
+the busy count, how fast busy answers came back and the queue wait.
+
+Run from the repository root:
+    python benchmarks/bench_agent_load.py --users 20 [--trace requests.jsonl] [--repeat 3] [--workers 8]
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CALLER_DIR = os.getcwd()   # --trace and --script paths are relative to where the script was run
+TMP = tempfile.mkdtemp()
+os.chdir(TMP)   # importing logger_config opens ./agent.log
+
+import logger_config  # noqa: E402
+from agent import Agent  # noqa: E402
+from calendar_client import CalendarClientCache  # noqa: E402
+from fakes import FakeGeminiModel, MockCalendar, load_script, mock_client_factory, serve_mock_calendar  # noqa: E402
+from history_manager import HistoryManager  # noqa: E402
+from metrics import metrics  # noqa: E402
+from rate_limiter import RateLimiter, limiter_stats  # noqa: E402
+from service import SchedulerService, ServiceBusy  # noqa: E402
+from streaming import StreamingReply  # noqa: E402
+from tool_cache import ToolResultCache  # noqa: E402
+
+TZ = "Asia/Kolkata"
+BUILTIN_TRACES = [
+    ["What does my schedule look like tomorrow?", "Am I free tomorrow afternoon for 30 minutes?",
+     "Book a sync at 3pm tomorrow", "Thanks!"],
+    ["Give me an overview of tomorrow", "Find me a free slot", "Cancel the sync"],
+    ["Hi there", "Any meetings tomorrow?", "Set up a 30 minute sync tomorrow", "What's on my agenda?"],
+]
+
+
+def load_traces(path: str) -> list[list[str]]:
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "messages" in record:
+                messages = [m if isinstance(m, str) else m.get("content") or m.get("text", "")
+                            for m in record["messages"] if isinstance(m, str) or m.get("role", "user") == "user"]
+            else:
+                messages = [record.get("prompt") or record.get("text") or record.get("body", "")]
+            conversations.append([m for m in messages if m])
+    return [c for c in conversations if c]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of an unsorted list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))] if ordered else 0.0
+
+
+def run_user(respond, conversations, stream, turns, errors, busy):
+    for messages in conversations:
+        history = HistoryManager()
+        with logger_config.log_context(conversation_id=uuid.uuid4().hex):
+            for prompt in messages:
+                reply = StreamingReply(render=lambda text: None, speak=lambda sentence: None) if stream else None
+                started = time.perf_counter()
+                try:
+                    result = respond(history, prompt, reply)
+                except ServiceBusy:
+                    busy.append(time.perf_counter() - started)
+                    continue
+                except Exception as e:
+                    errors.append(f"{type(e).__name__}: {e}")
+                    continue
+                turns.append((time.perf_counter() - started, result.round_trips, len(result.tool_calls)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated users")
+    parser.add_argument("--trace", help="JSONL conversation traces (default: a built-in set)")
+    parser.add_argument("--script", help="JSON/JSONL rules for the fake model (default: fakes.DEFAULT_SCRIPT)")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the traces this many times")
+    parser.add_argument("--model-latency-ms", type=float, default=400, help="fake model time to first token")
+    parser.add_argument("--chunk-ms", type=float, default=30, help="fake model delay between streamed chunks")
+    parser.add_argument("--calendar-latency-ms", type=float, default=50, help="mock Calendar round-trip time")
+    parser.add_argument("--events", type=int, default=8, help="events seeded on tomorrow's calendar")
+    parser.add_argument("--no-cache", action="store_true", help="run without the tool-result cache and templated answers")
+    parser.add_argument("--workers", type=int, help="run turns through the scheduler service with this many workers")
+    parser.add_argument("--max-queue", type=int, default=64, help="scheduler service queue bound")
+    parser.add_argument("--max-wait", type=float, default=20, help="scheduler service wait limit in seconds")
+    parser.add_argument("--no-stream", action="store_true", help="request whole replies instead of streaming")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the Python heap peak (slower)")
+    parser.add_argument("--json", action="store_true", help="print the report as one JSON object")
+    args = parser.parse_args()
+
+    # Keep the console for the report; the log file still receives everything.
+    logger_config.setup_logger(log_file=os.path.join(TMP, "agent.log"), stream=None)
+
+    traces = load_traces(os.path.join(CALLER_DIR, args.trace)) if args.trace else BUILTIN_TRACES
+    conversations = traces * args.repeat
+    calendar = MockCalendar(latency_ms=args.calendar_latency_ms, timezone=TZ)
+    import pytz
+    tomorrow = pytz.timezone(TZ).localize(datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time()))
+    calendar.seed(args.events, tomorrow)
+    server = serve_mock_calendar(calendar)
+
+    model = FakeGeminiModel(load_script(os.path.join(CALLER_DIR, args.script)) if args.script else None, latency_ms=args.model_latency_ms,
+                            chunk_ms=args.chunk_ms, timezone=TZ)
+    unlimited = RateLimiter("gemini-fake", {"requests_per_minute": (1e9, 60)})
+    agent = Agent(model, limiter=unlimited, timezone=TZ, cache=None if args.no_cache else ToolResultCache())
+    agent.executor  # import the tool stack before the clock starts
+    service = None
+    if args.workers:
+        service = SchedulerService(agent, clients=CalendarClientCache(factory=mock_client_factory(server)), workers=args.workers,
+                                   max_queue=args.max_queue, max_wait=args.max_wait)
+    metrics.reset()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    turns, errors, busy = [], [], []
+
+    def responder(i):
+        if service is None:
+            return agent.respond
+        return lambda history, prompt, reply: service.respond(f"user-{i}", history, prompt, reply)
+    # Every user gets the same number of conversations, taken in rotation, so none sits idle when there are fewer traces than users.
+    per_user = -(-len(conversations) // args.users)
+    assigned = [[conversations[(i + k * args.users) % len(conversations)] for k in range(per_user)] for i in range(args.users)]
+    users = [threading.Thread(target=run_user, args=(responder(i), assigned[i], not args.no_stream, turns, errors, busy),
+                              name=f"user-{i}") for i in range(args.users)]
+    started = time.perf_counter()
+    for user in users:
+        user.start()
+    for user in users:
+        user.join()
+    wall = time.perf_counter() - started
+    if service is not None:
+        service.close()
+    server.shutdown()
+
+    latencies = [t[0] for t in turns]
+    hits, misses = metrics.total("tool_cache_hits_total"), metrics.total("tool_cache_misses_total")
+    report = {
+        "users": args.users,
+        "conversations": sum(map(len, assigned)),
+        "turns": len(turns),
+        "errors": len(errors),
+        "busy": len(busy),
+        "wall_s": round(wall, 2),
+        "throughput_turns_per_s": round(len(turns) / wall, 2) if wall else 0.0,
+        "latency_ms": {name: round(percentile(latencies, q) * 1000, 1) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "mean_latency_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+        "llm_round_trips_per_turn": round(statistics.fmean(t[1] for t in turns), 2) if turns else 0.0,
+        "tool_calls_per_turn": round(statistics.fmean(t[2] for t in turns), 2) if turns else 0.0,
+        "model_calls": model.calls,
+        "calendar_round_trips": calendar.round_trips,
+        "cache_hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0,
+        "templated_answers": int(metrics.total("templated_answers_total")),
+        "cache_saved_s": round(metrics.total("tool_cache_saved_seconds_total"), 2),
+        "calendar_queued_s": limiter_stats()["calendar"]["queued_seconds"],
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_growth_mb": round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+    }
+    if service is not None:
+        queue_wait = metrics.histogram("service_queue_wait_seconds")
+        report["workers"] = args.workers
+        report["busy_response_ms"] = {name: round(percentile(busy, q) * 1000, 2) for name, q in (("p50", 0.5), ("p99", 0.99))}
+        report["queue_wait_ms"] = {"mean": round(queue_wait.sum / queue_wait.count * 1000, 1) if queue_wait and queue_wait.count else 0.0,
+                                   "p95": round(queue_wait.quantile(0.95) * 1000, 1) if queue_wait and queue_wait.count else 0.0}
+    if args.tracemalloc:
+        report["heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        tracemalloc.stop()
+
+    if args.json:
+        print(json.dumps(report))
+        return
+    print(f"{report['users']} users, {report['conversations']} conversations, {report['turns']} turns "
+          f"({report['errors']} errors) in {report['wall_s']} s")
+    print(f"  model {args.model_latency_ms:g} ms to first token + {args.chunk_ms:g} ms/chunk, calendar {args.calendar_latency_ms:g} ms/round trip")
+    print(f"  throughput       {report['throughput_turns_per_s']} turns/s")
+    print(f"  turn latency     p50 {report['latency_ms']['p50']} ms  p95 {report['latency_ms']['p95']} ms  "
+          f"p99 {report['latency_ms']['p99']} ms  (mean {report['mean_latency_ms']} ms)")
+    if service is not None:
+        print(f"  service          {args.workers} workers, {report['busy']} turns refused as busy (p50 {report['busy_response_ms']['p50']} ms, "
+              f"p99 {report['busy_response_ms']['p99']} ms to answer), queue wait mean {report['queue_wait_ms']['mean']} ms "
+              f"p95 {report['queue_wait_ms']['p95']} ms (bucket bound)")
+    print(f"  per turn         {report['llm_round_trips_per_turn']} LLM round trips, {report['tool_calls_per_turn']} tool calls")
+    if not args.no_cache:
+        print(f"  cache            {report['cache_hit_rate']:.0%} tool-result hits, {report['templated_answers']} templated answers, "
+              f"~{report['cache_saved_s']} s saved")
+    print(f"  calendar         {report['calendar_round_trips']} round trips, {report['calendar_queued_s']} s queued on quota")
+    memory = f"  memory           peak RSS {report['peak_rss_mb']} MB (+{report['rss_growth_mb']} MB during the run)"
+    if "heap_peak_mb" in report:
+        memory += f", Python heap peak {report['heap_peak_mb']} MB"
+    print(memory)
+    print("\nSlowest operations (bucket upper bounds):")
+    for row in sorted(metrics.summary(), key=lambda row: -row["mean_ms"])[:8]:
+        print(f"  {row['operation']:48s} {row['calls']:6d} calls  mean {row['mean_ms']:8.1f} ms  p95 {row['p95_ms']:8.1f} ms")
+    for error in sorted(set(errors))[:5]:
+        print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
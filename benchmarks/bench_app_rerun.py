@@ -0,0 +1,43 @@
+# benchmarks/bench_app_rerun.py
+"""
+Cold-start and rerun latency of app.py, measured headlessly with Streamlit's AppTest.
+
+Cold start is the first script run in a fresh interpreter, imports included.
+Reruns are later runs in the same process, like the ones Streamlit does on every
+interaction. No network access is needed; a placeholder API key is used.
+
+Run from the repository root:  python benchmarks/bench_app_rerun.py [reruns]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(reruns: int):
+    from streamlit.testing.v1 import AppTest
+
+    started = time.perf_counter()
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    at.run()
+    cold = time.perf_counter() - started
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - started)
+    print(f"cold start {cold * 1000:8.1f} ms | rerun median {statistics.median(timings) * 1000:7.1f} ms"
+          f" | rerun max {max(timings) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    if os.environ.get("_BENCH_CHILD"):
+        measure(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
+    else:
+        env = dict(os.environ, _BENCH_CHILD="1", GEMINI_API_KEY=os.environ.get("GEMINI_API_KEY", "benchmark-placeholder"))
+        # A fresh interpreter per sample so the cold start really is cold.
+        for _ in range(3):
+            subprocess.run([sys.executable, __file__, *sys.argv[1:]], cwd=ROOT, env=env, check=True)
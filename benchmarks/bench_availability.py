@@ -0,0 +1,108 @@
+# benchmarks/bench_availability.py
+"""
+Compares the availability engine with the original first-fit sweep from
+check_availability on synthetic busy data, then a multi-day recurring search
+done as one range pass (`search_availability`) against one working-hours pass
+per day, as the model did before by calling check_availability day by day.
+The per-day column excludes the Calendar round trip each of those calls also
+made; the range search makes one.
+
+Run from the repository root:  python benchmarks/bench_availability.py
+"""
+import datetime
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytz  # noqa: E402
+
+from availability import IntervalIndex, find_free_slots, recurring_windows, select_best_slots, working_windows  # noqa: E402
+
+DURATION_MINUTES = 30
+
+
+def make_busy(days: int, per_day: int, seed: int = 7):
+    """Returns freebusy-style dicts plus (start, end) epoch pairs for `days` of events."""
+    rng = random.Random(seed)
+    base = datetime.datetime(2025, 6, 2, tzinfo=datetime.timezone.utc)
+    busy = []
+    for day in range(days):
+        for _ in range(per_day):
+            start = base + datetime.timedelta(days=day, minutes=rng.randrange(0, 24 * 60, 15))
+            end = start + datetime.timedelta(minutes=rng.choice((15, 30, 45, 60, 90)))
+            busy.append({"start": start.isoformat().replace("+00:00", "Z"), "end": end.isoformat().replace("+00:00", "Z")})
+    pairs = [(datetime.datetime.fromisoformat(b["start"].replace("Z", "+00:00")).timestamp(),
+              datetime.datetime.fromisoformat(b["end"].replace("Z", "+00:00")).timestamp()) for b in busy]
+    return base, base + datetime.timedelta(days=days), busy, pairs
+
+
+def legacy_sweep(start_dt, end_dt, busy_intervals, duration_minutes):
+    """The loop check_availability used before the engine existed."""
+    available_slots = []
+    current_time = start_dt
+    busy_intervals = sorted(busy_intervals, key=lambda x: x['start'])
+    for busy in busy_intervals:
+        busy_start = datetime.datetime.fromisoformat(busy['start'].replace('Z', '+00:00'))
+        if current_time + datetime.timedelta(minutes=duration_minutes) <= busy_start:
+            available_slots.append(current_time.isoformat())
+        busy_end = datetime.datetime.fromisoformat(busy['end'].replace('Z', '+00:00'))
+        current_time = max(current_time, busy_end)
+    if current_time + datetime.timedelta(minutes=duration_minutes) <= end_dt:
+        available_slots.append(current_time.isoformat())
+    return available_slots
+
+
+def run(days: int, per_day: int, number: int = 20):
+    start_dt, end_dt, busy, pairs = make_busy(days, per_day)
+    start_ts, end_ts = start_dt.timestamp(), end_dt.timestamp()
+
+    legacy = timeit.timeit(lambda: legacy_sweep(start_dt, end_dt, busy, DURATION_MINUTES), number=number) / number
+    engine = timeit.timeit(lambda: find_free_slots(IntervalIndex.from_pairs(pairs), start_ts, end_ts, DURATION_MINUTES), number=number) / number
+    legacy_slots = len(legacy_sweep(start_dt, end_dt, busy, DURATION_MINUTES))
+    engine_slots = len(find_free_slots(IntervalIndex.from_pairs(pairs), start_ts, end_ts, DURATION_MINUTES))
+    print(f"{days:4d} days x {per_day:2d} events | legacy {legacy * 1e3:8.2f} ms ({legacy_slots:5d} gap starts)"
+          f" | engine {engine * 1e3:8.2f} ms ({engine_slots:6d} slots, {engine_slots / engine / 1e6:6.2f} M slots/s)")
+
+
+def run_range(days: int, per_day: int, number: int = 20):
+    """Weekday mornings and late afternoons over `days`, best 5 slots, New York time (crosses DST in March)."""
+    tz = pytz.timezone("America/New_York")
+    start_dt, end_dt, _, pairs = make_busy(days, per_day)
+    start_ts, end_ts = start_dt.timestamp(), end_dt.timestamp()
+    windows = [(datetime.time(9), datetime.time(12)), (datetime.time(16), datetime.time(18))]
+    weekdays = {0, 1, 2, 3, 4}
+
+    def per_day_loop():
+        found = []
+        for day in range(days):
+            day_start = start_ts + day * 86400
+            if datetime.datetime.fromtimestamp(day_start, tz).weekday() not in weekdays:
+                continue
+            busy = IntervalIndex.from_pairs(pairs).merged()
+            for window_start, window_end in windows:
+                allowed = working_windows(day_start, day_start + 86400, tz, window_start, window_end)
+                found.append(find_free_slots(busy, day_start, day_start + 86400, DURATION_MINUTES, allowed=allowed))
+        return found
+
+    def range_search():
+        busy = IntervalIndex.from_pairs(pairs).merged()
+        allowed = recurring_windows(start_ts, end_ts, tz, windows, weekdays)
+        slots = find_free_slots(busy, start_ts, end_ts, DURATION_MINUTES, allowed=allowed)
+        return select_best_slots(busy, slots, DURATION_MINUTES, tz, 5, 2)
+
+    loop = timeit.timeit(per_day_loop, number=number) / number
+    once = timeit.timeit(range_search, number=number) / number
+    calls = sum(datetime.datetime.fromtimestamp(start_ts + d * 86400, tz).weekday() in weekdays for d in range(days)) * len(windows)
+    print(f"{days:4d} days x {per_day:2d} events | per-day passes {loop * 1e3:8.2f} ms ({calls:3d} calls)"
+          f" | range search + ranking {once * 1e3:7.2f} ms (1 call)")
+
+
+if __name__ == "__main__":
+    for days, per_day in ((1, 8), (7, 8), (30, 10), (90, 12), (365, 12)):
+        run(days, per_day)
+    print()
+    for days, per_day in ((7, 8), (14, 8), (31, 10), (62, 10)):
+        run_range(days, per_day)
@@ -0,0 +1,86 @@
+# benchmarks/bench_bulk_manage.py
+"""
+Changes N events one tool call at a time and then with one bulk call, against
+an in-process mock Calendar server that also speaks the HTTP batch protocol.
+
+Every round trip to the mock costs LATENCY_MS, like a real network hop. The
+script prints the round trips and wall time for both paths, then the per-item
+results of a mixed bulk call (creates, updates, deletes, and operations that
+fail) so the reporting can be checked by eye. No Google account is needed.
+
+Run from the repository root:  python benchmarks/bench_bulk_manage.py [events]
+
+The default of 120 events spans several batches, and the mock rejects a batch
+over MAX_BATCH_CALLS like Calendar does, so the bulk path must split them.
+"""
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import calendar_tools  # noqa: E402
+import event_store  # noqa: E402
+from fakes import MockCalendar, serve_mock_calendar  # noqa: E402
+
+LATENCY_MS = 20
+TZ = "Asia/Kolkata"
+
+
+def fresh_store():
+    event_store.reset_event_stores()
+    store = event_store.get_event_store()
+    store.events_between(datetime.datetime.now(datetime.timezone.utc), datetime.datetime.now(datetime.timezone.utc))
+    return store
+
+
+def main(count):
+    calendar = MockCalendar(latency_ms=LATENCY_MS, timezone=TZ)
+    server = serve_mock_calendar(calendar)
+
+    import pytz
+    day = pytz.timezone(TZ).localize(datetime.datetime.combine(datetime.date.today() + datetime.timedelta(days=1), datetime.time()))
+
+    calendar.seed(count, day)
+    fresh_store()
+    calendar.round_trips = 0
+    started = time.perf_counter()
+    for i in range(count):
+        calendar_tools.manage_calendar_event(query=f"review {i}", action="delete", timezone=TZ)
+    single = (calendar.round_trips, time.perf_counter() - started, len(calendar.events))
+
+    calendar.seed(count, day)
+    fresh_store()
+    calendar.round_trips = 0
+    started = time.perf_counter()
+    calendar_tools.bulk_manage_calendar_events([{"action": "delete", "query": f"review {i}"} for i in range(count)], timezone=TZ)
+    bulk = (calendar.round_trips, time.perf_counter() - started, len(calendar.events))
+
+    print(f"{count} deletes, {LATENCY_MS} ms per round trip")
+    print(f"  one call per event: {single[0]:4d} round trips {single[1] * 1000:8.1f} ms  ({single[2]} events left)")
+    print(f"  one bulk call:      {bulk[0]:4d} round trips {bulk[1] * 1000:8.1f} ms  ({bulk[2]} events left)")
+
+    calendar.seed(4, day)
+    store = fresh_store()
+    slot = (day + datetime.timedelta(hours=15)).isoformat()
+    slot_end = (day + datetime.timedelta(hours=15, minutes=30)).isoformat()
+    calendar.events.pop("seed3")    # deleted elsewhere after the store synced: fails inside the batch
+    results = calendar_tools.bulk_manage_calendar_events([
+        {"action": "create", "title": "Planning", "start_time": slot, "end_time": slot_end},
+        {"action": "update", "event_id": "seed0", "title": "Review 0 (moved)", "start_time": slot, "end_time": slot_end},
+        {"action": "delete", "query": "user1@example.com"},
+        {"action": "delete", "query": "review"},
+        {"action": "delete", "event_id": "seed3"},
+        {"action": "delete", "event_id": "missing"},
+        {"action": "archive", "event_id": "seed2"},
+    ], timezone=TZ)
+    print("\nMixed bulk call:")
+    for line in results:
+        print("  " + line.replace("\n", "\n    "))
+    print(f"Store now holds: {sorted(e['summary'] for e in store.lookup(time_min=day, limit=50))}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 120)
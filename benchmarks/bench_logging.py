@@ -0,0 +1,71 @@
+# benchmarks/bench_logging.py
+"""
+Cost of a log call on the request thread: the old synchronous setup (file +
+stream handlers, f-string messages) against the queue-based pipeline in
+logger_config (lazy %-style messages, formatting and I/O on the listener).
+
+Also times calls below the log level, where an f-string is still built but a
+lazy message is not, and how long the listener needs to drain the backlog.
+
+Run from the repository root:  python benchmarks/bench_logging.py [calls]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TMP = tempfile.mkdtemp()
+os.chdir(TMP)   # importing logger_config opens ./agent.log
+
+import logger_config  # noqa: E402
+
+ARGS = {"start_time": "2025-06-10T09:00:00+05:30", "end_time": "2025-06-10T18:00:00+05:30", "calendar_ids": ["primary", "a@example.com"]}
+
+
+def per_call_us(func, calls):
+    started = time.perf_counter()
+    for i in range(calls):
+        func(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main(calls):
+    devnull = open(os.devnull, "w")
+
+    old = logging.getLogger("bench.old")
+    old.propagate = False
+    old.setLevel(logging.INFO)
+    formatter = logging.Formatter(logger_config.TEXT_FORMAT)
+    for handler in (logging.FileHandler(os.path.join(TMP, "old.log")), logging.StreamHandler(devnull)):
+        handler.setFormatter(formatter)
+        old.addHandler(handler)
+
+    # No rotation here, so the drain check below can count lines in one file.
+    logger_config.setup_logger(log_file=os.path.join(TMP, "new.log"), stream=devnull, max_bytes=0)
+    new = logging.getLogger("bench.new")
+
+    results = {
+        "old, INFO, f-string": per_call_us(lambda i: old.info(f"Tool 'check_availability' called with args: {ARGS} #{i}"), calls),
+        "new, INFO, lazy": per_call_us(lambda i: new.info("Tool 'check_availability' called with args: %s #%s", ARGS, i), calls),
+        "old, DEBUG (off), f-string": per_call_us(lambda i: old.debug(f"State saved: {ARGS} #{i}"), calls),
+        "new, DEBUG (off), lazy": per_call_us(lambda i: new.debug("State saved: %s #%s", ARGS, i), calls),
+    }
+    drained = time.perf_counter()
+    with open(os.path.join(TMP, "new.log")) as f:
+        while sum(1 for _ in f) < calls:
+            time.sleep(0.01)
+            f.seek(0)
+    drain_ms = (time.perf_counter() - drained) * 1000
+
+    print(f"{calls} calls per case, microseconds per call on the calling thread")
+    for name, us in results.items():
+        print(f"  {name:28s} {us:7.2f} us")
+    print(f"  listener backlog drained {drain_ms:.0f} ms after the last call")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,91 @@
+# benchmarks/bench_models.py
+"""
+Memory per session and serialize/deserialize throughput of MeetingRequestState
+against the original plain dataclass with ISO string times. Expect the binary
+form to beat the legacy JSON both ways and the new JSON form to trail it: it
+builds a fresh dict and validates and converts the slots on load, where the
+legacy path dumps and splats `__dict__` as is.
+
+Run from the repository root:  python benchmarks/bench_models.py
+"""
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import MeetingRequestState  # noqa: E402
+
+SESSIONS = 20_000
+SLOTS = ["2025-06-10T09:00:00+05:30", "2025-06-10T09:15:00+05:30", "2025-06-10T09:30:00+05:30",
+         "2025-06-10T11:00:00+05:30", "2025-06-10T14:00:00+05:30", "2025-06-10T16:30:00+05:30"]
+
+
+@dataclass
+class LegacyMeetingRequestState:
+    """The model as it was: a plain dataclass holding ISO strings."""
+    conversation_id: str = "default_session"
+    duration_minutes: Optional[int] = None
+    time_range_start: Optional[str] = None
+    time_range_end: Optional[str] = None
+    user_timezone: Optional[str] = None
+    suggested_slots: List[str] = field(default_factory=list)
+    confirmed_slot_start: Optional[str] = None
+    meeting_title: Optional[str] = None
+    status: str = "needs_info"
+
+    def to_dict(self):
+        return self.__dict__
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+def iso_strings(i):
+    """Per-session ISO strings, as they would arrive from the model (no shared literals)."""
+    return [f"2025-06-{10 + i % 10}T{9 + j:02d}:{(i * 7) % 60:02d}:00+05:30" for j in range(len(SLOTS) + 3)]
+
+
+def legacy_state(i):
+    times = iso_strings(i)
+    return LegacyMeetingRequestState(f"session-{i}", 30, times[0], times[1], "Asia/Kolkata", times[3:], times[2], "Sync with HQ", "confirmed")
+
+
+def new_state(i):
+    times = iso_strings(i)
+    return MeetingRequestState(f"session-{i}", 30, times[0], times[1], "Asia/Kolkata", times[3:], times[2], "Sync with HQ", "confirmed")
+
+
+def bytes_per_session(factory):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    states = [factory(i) for i in range(SESSIONS)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del states
+    return total / SESSIONS
+
+
+def throughput(func, number=20_000):
+    return number / timeit.timeit(func, number=number)
+
+
+if __name__ == "__main__":
+    legacy, new = legacy_state(1), new_state(1)
+    legacy_json, new_json, new_bin = json.dumps(legacy.to_dict()), new.to_json(), new.to_bytes()
+    assert MeetingRequestState.from_json(new_json) == new
+    assert MeetingRequestState.from_bytes(new_bin) == new
+
+    print(f"memory/session   legacy {bytes_per_session(legacy_state):7.0f} B | slotted {bytes_per_session(new_state):7.0f} B")
+    print(f"encoded size     legacy json {len(legacy_json)} B | json {len(new_json)} B | binary {len(new_bin)} B")
+    print(f"serialize/s      legacy json {throughput(lambda: json.dumps(legacy.to_dict())):9.0f}"
+          f" | json {throughput(new.to_json):9.0f} | binary {throughput(new.to_bytes):9.0f}")
+    print(f"deserialize/s    legacy json {throughput(lambda: LegacyMeetingRequestState.from_dict(json.loads(legacy_json))):9.0f}"
+          f" | json {throughput(lambda: MeetingRequestState.from_json(new_json)):9.0f}"
+          f" | binary {throughput(lambda: MeetingRequestState.from_bytes(new_bin)):9.0f}")
@@ -0,0 +1,112 @@
+# benchmarks/bench_speech.py
+"""
+Transcription latency against clip length: the old voice path (record the
+whole clip with SpeechRecognition, then one blocking request on the script
+thread) against `speech.start_transcription` (chunked decode and resample on a
+worker, segments cut at pauses and sent concurrently, partial transcripts).
+
+Clips are synthetic 48 kHz speech-like bursts with pauses, as the browser
+records them. By default the engine is a stand-in whose request time is
+REQUEST_MS plus PER_AUDIO_SECOND_MS for every second of audio sent, roughly a
+hosted recognizer; pass a backend name (vosk, sphinx, google) to time a real
+engine instead. Decoding, resampling and segmenting are always real.
+
+Columns: how long the UI thread is blocked, time to the first partial
+transcript, time to the final one, and the decode+resample time alone.
+
+Run from the repository root:  python benchmarks/bench_speech.py [backend]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TMP = tempfile.mkdtemp()
+os.chdir(TMP)   # importing logger_config opens ./agent.log
+
+import logger_config  # noqa: E402
+import speech  # noqa: E402
+
+CLIP_SECONDS = (5, 10, 20, 40, 60)
+RATE = 48000
+REQUEST_MS = 400
+PER_AUDIO_SECOND_MS = 60
+
+
+class SimulatedBackend(speech.SegmentedBackend):
+    name = "simulated"
+
+    def transcribe_segment(self, pcm):
+        seconds = len(pcm) / self.sample_rate
+        time.sleep((REQUEST_MS + PER_AUDIO_SECOND_MS * seconds) / 1000)
+        return " ".join(["word"] * int(seconds * 2))
+
+
+def make_clip(seconds: float) -> bytes:
+    """1.2 s voiced bursts (a few harmonics plus noise) separated by 0.4 s pauses."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * RATE)) / RATE
+    voiced = (t % 1.6) < 1.2
+    signal = sum(np.sin(2 * np.pi * f * t) / i for i, f in enumerate((180, 360, 720, 1440), 1))
+    samples = (voiced * (0.3 * signal + 0.05 * rng.standard_normal(len(t))) + 0.002 * rng.standard_normal(len(t))) * 32767 * 0.5
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(np.clip(samples, -32768, 32767).astype(np.int16).tobytes())
+    return out.getvalue()
+
+
+def old_path(wav_bytes: bytes, backend) -> float:
+    """The previous app code: full record, then one request for the whole clip, all on the caller."""
+    import speech_recognition as sr
+    started = time.perf_counter()
+    recognizer = sr.Recognizer()
+    with sr.AudioFile(io.BytesIO(wav_bytes)) as source:
+        audio = recognizer.record(source)
+    if isinstance(backend, SimulatedBackend):
+        seconds = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+        time.sleep((REQUEST_MS + PER_AUDIO_SECOND_MS * seconds) / 1000)
+    else:
+        pcm = np.frombuffer(audio.get_raw_data(convert_rate=speech.TARGET_SAMPLE_RATE, convert_width=2), np.int16)
+        "".join(backend.stream(iter([pcm])))
+    return time.perf_counter() - started
+
+
+def main(backend_name=None):
+    logger_config.setup_logger(log_file=os.path.join(TMP, "agent.log"), stream=None)
+    backend = speech.get_backend(backend_name) if backend_name else SimulatedBackend()
+    if backend_name is None:
+        print(f"Simulated engine: {REQUEST_MS} ms per request + {PER_AUDIO_SECOND_MS} ms per audio second")
+    else:
+        print(f"Engine: {backend.name}")
+    print(f"{'clip':>6} {'old: UI blocked':>16} {'new: UI blocked':>16} {'first partial':>14} {'final':>10} {'decode':>9}")
+    for seconds in CLIP_SECONDS:
+        wav_bytes = make_clip(seconds)
+
+        started = time.perf_counter()
+        for _ in speech.iter_pcm_chunks(wav_bytes):
+            pass
+        decode = time.perf_counter() - started
+
+        old = old_path(wav_bytes, backend)
+
+        started = time.perf_counter()
+        job = speech.start_transcription(wav_bytes, backend)
+        blocked = time.perf_counter() - started
+        job.result()
+        final = time.perf_counter() - started
+        first = (job.first_partial_at - job.started) if job.first_partial_at else final
+
+        print(f"{seconds:5d}s {old * 1000:14.0f}ms {blocked * 1000:14.2f}ms {first * 1000:12.0f}ms {final * 1000:8.0f}ms {decode * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,83 @@
+# benchmarks/bench_state_store.py
+"""
+Load/save throughput of the state store backends with many concurrent sessions,
+next to the original one-JSON-file-per-save approach.
+
+Run from the repository root:  python benchmarks/bench_state_store.py [sessions] [threads]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import MeetingRequestState, to_epoch  # noqa: E402
+from state_manager import JournalStateStore, MemoryStateStore, SQLiteStateStore  # noqa: E402
+
+SAVES_PER_SESSION = 5
+
+
+def session_updates(conversation_id):
+    """A typical conversation: a few fields change on each turn."""
+    state = MeetingRequestState(conversation_id=conversation_id)
+    yield state
+    state.duration_minutes = 30
+    yield state
+    state.time_range_start, state.time_range_end = to_epoch("2025-06-10T09:00:00+05:30"), to_epoch("2025-06-10T18:00:00+05:30")
+    yield state
+    state.suggested_slots.extend(to_epoch(slot) for slot in ("2025-06-10T09:00:00+05:30", "2025-06-10T10:30:00+05:30", "2025-06-10T14:00:00+05:30"))
+    state.status = "pending_confirmation"
+    yield state
+    state.confirmed_slot_start, state.status = to_epoch("2025-06-10T10:30:00+05:30"), "confirmed"
+    yield state
+
+
+class LegacyJsonStore:
+    """The original StateManager behaviour: rewrite a whole indented JSON file on every save."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def save(self, state):
+        with open(os.path.join(self.directory, f"{state.conversation_id}.json"), "w") as f:
+            json.dump(state.to_dict(), f, indent=4)
+
+    def load(self, conversation_id):
+        with open(os.path.join(self.directory, f"{conversation_id}.json")) as f:
+            return MeetingRequestState.from_dict(json.load(f))
+
+
+def run(name, store, sessions, threads):
+    ids = [f"session-{i}" for i in range(sessions)]
+
+    def drive(conversation_id):
+        for state in session_updates(conversation_id):
+            store.save(state)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(drive, ids))
+    save_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        loaded = list(pool.map(store.load, ids))
+    load_seconds = time.perf_counter() - started
+    assert all(state.status == "confirmed" for state in loaded)
+
+    saves = sessions * SAVES_PER_SESSION
+    print(f"{name:10s} | {saves / save_seconds:10.0f} saves/s | {sessions / load_seconds:10.0f} loads/s")
+
+
+if __name__ == "__main__":
+    sessions = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    print(f"{sessions} sessions, {SAVES_PER_SESSION} saves each, {threads} threads")
+    with tempfile.TemporaryDirectory() as tmp:
+        run("legacy", LegacyJsonStore(tmp), sessions, threads)
+        run("memory", MemoryStateStore(capacity=sessions), sessions, threads)
+        run("sqlite", SQLiteStateStore(os.path.join(tmp, "state.db")), sessions, threads)
+        run("journal", JournalStateStore(os.path.join(tmp, "state.jsonl")), sessions, threads)
@@ -0,0 +1,362 @@
+# benchmarks/fakes.py
+"""
+Deterministic local stand-ins for the two remote services, so the agent can be
+benchmarked without credentials or network:
+
+- `MockCalendar` plus `serve_mock_calendar`: an in-process HTTP server speaking
+  just enough of the Calendar v3 API (events, freeBusy and the batch protocol)
+  for the real googleapiclient code paths to run against it.
+- `FakeGeminiModel`: a drop-in for `genai.GenerativeModel` that answers from a
+  script of rules, with configurable time to first token and per-chunk delay.
+
+Both add latency with `time.sleep`, which releases the GIL like real network
+waits do, so concurrency results stay meaningful.
+"""
+import dataclasses
+import datetime
+import email
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_config import DEFAULT_TIMEZONE, SYSTEM_PROMPT, TOOLS  # noqa: E402
+from history_manager import estimate_tokens  # noqa: E402
+
+EVENTS_PATH = "/calendar/v3/calendars/primary/events"
+FREEBUSY_PATH = "/calendar/v3/freeBusy"
+# Calendar rejects an HTTP batch with more calls than this, and so does the mock.
+MAX_BATCH_CALLS = 50
+
+
+# --- Calendar ---
+
+class MockCalendar:
+    """Just enough of the Calendar API: events list, get, insert, patch, update, delete, and freeBusy."""
+
+    def __init__(self, latency_ms: float = 20, timezone: str = DEFAULT_TIMEZONE):
+        self.latency_ms = latency_ms
+        self.timezone = timezone
+        self.events = {}
+        self.lock = threading.Lock()
+        self.round_trips = 0
+
+    def handle(self, method, path, body):
+        """Returns (status, response body) for one API call."""
+        url = urlsplit(path)
+        if url.path == FREEBUSY_PATH:
+            return 200, self._freebusy(body)
+        event_id = url.path[len(EVENTS_PATH) + 1:] if url.path.startswith(EVENTS_PATH + "/") else None
+        with self.lock:
+            if method == "GET" and event_id is None:
+                if "syncToken" in parse_qs(url.query):
+                    return 200, {"items": [], "nextSyncToken": "sync"}
+                return 200, {"items": list(self.events.values()), "timeZone": self.timezone, "nextSyncToken": "sync"}
+            if method == "POST" and event_id is None:
+                event = {**body, "id": uuid.uuid4().hex, "status": "confirmed"}
+                event["htmlLink"] = f"https://calendar.example/{event['id']}"
+                self.events[event["id"]] = event
+                return 200, event
+            if event_id not in self.events:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if method == "GET":
+                return 200, self.events[event_id]
+            if method == "DELETE":
+                del self.events[event_id]
+                return 204, None
+            if method == "PATCH":
+                self.events[event_id] = {**self.events[event_id], **body}
+            else:
+                self.events[event_id] = {**body, "id": event_id}
+            return 200, self.events[event_id]
+
+    def _freebusy(self, body):
+        """Other people's calendars are always free; the primary one is busy during its events."""
+        with self.lock:
+            primary = [{"start": e["start"]["dateTime"], "end": e["end"]["dateTime"]}
+                       for e in self.events.values() if "dateTime" in e.get("start", {})]
+        return {"calendars": {item["id"]: {"busy": primary if item["id"] == "primary" else []} for item in body.get("items", [])}}
+
+    def seed(self, count: int, day: datetime.datetime):
+        """Replaces the calendar with `count` back-to-back 25-minute reviews from 09:00 on `day`."""
+        with self.lock:
+            self.events.clear()
+            for i in range(count):
+                start = day + datetime.timedelta(hours=9, minutes=30 * i)
+                end = start + datetime.timedelta(minutes=25)
+                event_id = f"seed{i}"
+                self.events[event_id] = {
+                    "id": event_id, "status": "confirmed", "summary": f"Review {i}",
+                    "start": {"dateTime": start.isoformat()}, "end": {"dateTime": end.isoformat()},
+                    "attendees": [{"email": f"user{i}@example.com"}], "htmlLink": f"https://calendar.example/{event_id}",
+                }
+
+
+def make_handler(calendar):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _reply(self, status, content_type, payload: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _dispatch(self):
+            with calendar.lock:
+                calendar.round_trips += 1
+            time.sleep(calendar.latency_ms / 1000)
+            raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.startswith("/batch"):
+                return self._batch(raw)
+            status, body = calendar.handle(self.command, self.path, json.loads(raw) if raw else None)
+            self._reply(status, "application/json", json.dumps(body).encode() if body is not None else b"")
+
+        def _batch(self, raw):
+            message = email.message_from_bytes(b"Content-Type: " + self.headers["Content-Type"].encode() + b"\r\n\r\n" + raw)
+            if len(message.get_payload()) > MAX_BATCH_CALLS:
+                error = {"error": {"code": 400, "message": f"A batch may contain at most {MAX_BATCH_CALLS} calls."}}
+                return self._reply(400, "application/json", json.dumps(error).encode())
+            parts = []
+            for part in message.get_payload():
+                inner = part.get_payload()
+                head, _, body = inner.replace("\r\n", "\n").partition("\n\n")
+                method, path, _ = head.split("\n", 1)[0].split(" ", 2)
+                status, response = calendar.handle(method, path, json.loads(body) if body.strip() else None)
+                text = json.dumps(response) if response is not None else ""
+                parts.append(
+                    f"--mockboundary\r\nContent-Type: application/http\r\n"
+                    f"Content-ID: <response-{part['Content-ID'].strip('<>')}>\r\n\r\n"
+                    f"HTTP/1.1 {status} OK\r\nContent-Type: application/json\r\nContent-Length: {len(text)}\r\n\r\n{text}\r\n"
+                )
+            self._reply(200, "multipart/mixed; boundary=mockboundary", ("".join(parts) + "--mockboundary--").encode())
+
+        do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _dispatch
+
+    return Handler
+
+
+def serve_mock_calendar(calendar: MockCalendar):
+    """
+    Starts the mock server on a free port and points the default Calendar
+    client at it. Returns the server; call `shutdown()` on it when done, and
+    pass it to `mock_client_factory` for per-user clients.
+    """
+    import calendar_client
+    import event_store
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(calendar))
+    threading.Thread(target=server.serve_forever, name="mock-calendar", daemon=True).start()
+    # The tools and the stores reach the default client through this module global.
+    calendar_client.calendar_client = mock_client_factory(server)(calendar_client.DEFAULT_USER)
+    event_store.reset_event_stores()
+    return server
+
+
+def mock_client_factory(server):
+    """A `CalendarClientCache` factory: every user gets a client of their own talking to `server`."""
+    from google.oauth2.credentials import Credentials
+
+    from calendar_client import CalendarClientManager
+
+    def factory(user_id):
+        return CalendarClientManager(api_endpoint=f"http://127.0.0.1:{server.server_port}/calendar/v3/",
+                                     credentials=Credentials(token=f"mock-{user_id}"), user_id=user_id)
+    return factory
+
+
+# --- Gemini ---
+
+@dataclasses.dataclass
+class FakeFunctionCall:
+    name: str
+    args: dict
+
+
+@dataclasses.dataclass
+class FakePart:
+    text: str = ""
+    function_call: FakeFunctionCall = None
+
+
+@dataclasses.dataclass
+class FakeContent:
+    parts: list
+    role: str = "model"
+
+
+@dataclasses.dataclass
+class FakeCandidate:
+    content: FakeContent
+
+
+@dataclasses.dataclass
+class FakeUsage:
+    prompt_token_count: int
+    candidates_token_count: int
+    total_token_count: int
+
+
+class FakeResponse:
+    """The parts of a GenerateContentResponse the agent reads; iterating yields the streamed chunks."""
+
+    def __init__(self, parts: list, usage: FakeUsage, chunks=(), chunk_delay: float = 0.0):
+        self.candidates = [FakeCandidate(FakeContent(parts))]
+        self.usage_metadata = usage
+        self._chunks = list(chunks)
+        self._chunk_delay = chunk_delay
+
+    @property
+    def text(self) -> str:
+        return "".join(part.text for part in self.candidates[0].content.parts)
+
+    def __iter__(self):
+        if not self._chunks:
+            yield self
+            return
+        for i, chunk in enumerate(self._chunks):
+            if i:
+                time.sleep(self._chunk_delay)
+            yield FakeResponse([FakePart(text=chunk)], self.usage_metadata)
+
+
+# Rules are tried in order against the latest user message; the first match wins.
+# `steps` are the function calls of each successive tool-use turn, and `reply`
+# is the final answer. Strings in args and the reply may use {today},
+# {tomorrow}, {next_week} (YYYY-MM-DD, a week after tomorrow), {offset} (e.g. +05:30) and, in the reply, {result}:
+# the last tool result.
+DEFAULT_SCRIPT = [
+    {"match": r"\b(book|create|set up|add|schedule an?)\b",
+     "steps": [[{"name": "check_availability", "args": {"start_time": "{tomorrow}T15:00:00{offset}", "end_time": "{tomorrow}T16:00:00{offset}", "duration_minutes": 30}}],
+               [{"name": "create_calendar_event", "args": {"title": "Sync", "start_time": "{tomorrow}T15:00:00{offset}", "end_time": "{tomorrow}T15:30:00{offset}"}}]],
+     "reply": "Done. {result}"},
+    {"match": r"\b(cancel|delete|remove|reschedule|move)\b",
+     "steps": [[{"name": "manage_calendar_event", "args": {"query": "sync", "action": "delete"}}]],
+     "reply": "{result}"},
+    {"match": r"\b(overview|plan my day|how busy)\b",
+     "steps": [[{"name": "get_day_schedule", "args": {"day": "{tomorrow}"}},
+                {"name": "check_availability", "args": {"start_time": "{tomorrow}T09:00:00{offset}", "end_time": "{tomorrow}T18:00:00{offset}", "duration_minutes": 60}}]],
+     "reply": "Here is tomorrow at a glance. You have a few meetings, and these hours are still open: {result}"},
+    {"match": r"\b(schedule|agenda|calendar|my day|meetings)\b",
+     "steps": [[{"name": "get_day_schedule", "args": {"day": "{tomorrow}"}}]],
+     "reply": "Here's what you have on {tomorrow}: {result}"},
+    {"match": r"\b(next (two )?weeks?|this week|any (week)?day|every (day|week))\b",
+     "steps": [[{"name": "search_availability", "args": {"start_date": "{tomorrow}", "end_date": "{next_week}", "duration_minutes": 60,
+                                                          "weekdays": ["weekdays"], "time_windows": ["morning"]}}]],
+     "reply": "The best openings I found: {result}. Want me to book one?"},
+    {"match": r"\b(free|available|availability|slots?|time)\b",
+     "steps": [[{"name": "check_availability", "args": {"start_time": "{tomorrow}T09:00:00{offset}", "end_time": "{tomorrow}T18:00:00{offset}", "duration_minutes": 30}}]],
+     "reply": "These times are open tomorrow: {result}. Shall I book one of them?"},
+    {"match": r"",
+     "steps": [],
+     "reply": "I can check your availability, book or move meetings, and tell you about your day. What would you like to do?"},
+]
+
+
+def load_script(path: str) -> list[dict]:
+    """Reads rules from a JSON list or a JSONL file with one rule per line."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def _fill(value, fields):
+    if isinstance(value, str):
+        return value.format_map(fields)
+    if isinstance(value, dict):
+        return {key: _fill(item, fields) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, fields) for item in value]
+    return value
+
+
+def _result_text(part) -> str:
+    result = json.loads(part["function_response"]["response"]["result"])
+    return result if isinstance(result, str) else json.dumps(result)
+
+
+def _is_tool_results(content) -> bool:
+    return isinstance(content, dict) and any("function_response" in part for part in content.get("parts", []))
+
+
+class FakeGeminiModel:
+    """
+    Stands in for `genai.GenerativeModel`. Every call sleeps `latency_ms`
+    before the first chunk; a text reply arrives in chunks of `chunk_words`
+    words, `chunk_ms` apart (streamed or not). Token counts are estimated the
+    same way the history manager does, including the system prompt and tools.
+    """
+
+    def __init__(self, script=None, latency_ms: float = 400, chunk_ms: float = 30, chunk_words: int = 4,
+                 timezone: str = DEFAULT_TIMEZONE):
+        self.rules = [(re.compile(rule["match"], re.IGNORECASE), rule) for rule in (script or DEFAULT_SCRIPT)]
+        self.latency_ms = latency_ms
+        self.chunk_ms = chunk_ms
+        self.chunk_words = chunk_words
+        self.timezone = timezone
+        self.overhead_tokens = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(json.dumps(TOOLS))
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _fields(self, result: str = "") -> dict:
+        import pytz
+        now = datetime.datetime.now(pytz.timezone(self.timezone))
+        offset = now.strftime("%z")
+        return {
+            "today": now.date().isoformat(),
+            "tomorrow": (now.date() + datetime.timedelta(days=1)).isoformat(),
+            "next_week": (now.date() + datetime.timedelta(days=8)).isoformat(),
+            "offset": f"{offset[:3]}:{offset[3:]}",
+            "result": result,
+        }
+
+    def _turn(self, contents):
+        """The latest user message and the tool results that followed it, from the request contents."""
+        results = []
+        for content in reversed(contents):
+            if _is_tool_results(content):
+                results.append(content)
+            elif isinstance(content, dict) and content.get("role") == "user":
+                return " ".join(part.get("text", "") for part in content["parts"]), results[::-1]
+        return "", results[::-1]
+
+    def generate_content(self, contents, stream: bool = False, generation_config=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        prompt, results = self._turn(contents)
+        rule = next(rule for pattern, rule in self.rules if pattern.search(prompt))
+        steps = rule.get("steps", [])
+        prompt_tokens = self.overhead_tokens + sum(estimate_tokens(content) for content in contents)
+        time.sleep(self.latency_ms / 1000)
+
+        if len(results) < len(steps):
+            fields = self._fields()
+            parts = [FakePart(function_call=FakeFunctionCall(call["name"], _fill(call.get("args", {}), fields)))
+                     for call in steps[len(results)]]
+            output_tokens = estimate_tokens(str(parts))
+            return FakeResponse(parts, FakeUsage(prompt_tokens, output_tokens, prompt_tokens + output_tokens))
+
+        last = "; ".join(_result_text(part) for part in results[-1]["parts"]) if results else ""
+        text = _fill(rule["reply"], self._fields(last[:300]))
+        words = text.split(" ")
+        chunks = [" ".join(words[i:i + self.chunk_words]) + (" " if i + self.chunk_words < len(words) else "")
+                  for i in range(0, len(words), self.chunk_words)]
+        output_tokens = estimate_tokens(text)
+        usage = FakeUsage(prompt_tokens, output_tokens, prompt_tokens + output_tokens)
+        if stream:
+            return FakeResponse([FakePart(text=text)], usage, chunks, self.chunk_ms / 1000)
+        time.sleep(self.chunk_ms / 1000 * (len(chunks) - 1))
+        return FakeResponse([FakePart(text=text)], usage)
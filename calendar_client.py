@@ -0,0 +1,388 @@
+# calendar_client.py
+import collections
+import contextlib
+import contextvars
+import datetime
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+from urllib.parse import urlsplit
+
+import httplib2
+import google_auth_httplib2
+import requests
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import Flow, InstalledAppFlow
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document, DISCOVERY_URI
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+from config import DEFAULT_USER
+from logger_config import logger
+from metrics import metrics
+from rate_limiter import new_calendar_limiter, RateLimitExceeded
+
+SCOPES = ["https://www.googleapis.com/auth/calendar"]
+TOKEN_FILE = "token.json"
+CREDENTIALS_FILE = "credentials.json"
+# DEFAULT_USER's token is TOKEN_FILE; any other user's lives in TOKEN_DIR/<user_file_name(user)>.json.
+TOKEN_DIR = os.getenv("CALENDAR_TOKEN_DIR", "tokens")
+# Users whose credentials and services are kept warm; the least recently used is dropped beyond this.
+MAX_CACHED_USERS = 256
+# Where Google sends signed-in users back to after they grant Calendar access: the
+# app's own URL, registered for the "web" OAuth client in CREDENTIALS_FILE.
+OAUTH_REDIRECT_URI = os.getenv("OAUTH_REDIRECT_URI", "http://localhost:8501/")
+# A started web sign-in that is not completed within this long is forgotten.
+OAUTH_STATE_TTL_SECONDS = 600
+
+# Refresh this long before the access token actually expires.
+REFRESH_MARGIN_SECONDS = 300
+HTTP_TIMEOUT_SECONDS = 30
+
+
+class CalendarAuthRequired(Exception):
+    """The user has no usable Calendar token and must grant access in the browser first."""
+
+
+def _endpoint(uri: str) -> str:
+    """Coarse metrics label for a Calendar API URL."""
+    path = urlsplit(uri).path
+    if path.startswith("/batch"):
+        return "batch"
+    if path.endswith("/freeBusy"):
+        return "freebusy"
+    if "/events" in path:
+        return "events"
+    return "other"
+
+
+class RateLimitedHttp:
+    """
+    httplib2-compatible wrapper that sends every Calendar request, batches
+    included, through its client's rate limiter. 429 responses are retried
+    there, and so are 5xx responses to requests that are safe to repeat. A 5xx
+    to a POST that writes (an event insert, or a batch, which may hold
+    writes) may come after the server applied it, so a retry could create a
+    duplicate: it is handed back instead. If retries run out, the last
+    response is handed back too, so googleapiclient raises its usual HttpError.
+    """
+
+    def __init__(self, http, limiter):
+        self._http = http
+        self._limiter = limiter
+
+    def request(self, *args, **kwargs):
+        endpoint = _endpoint(args[0] if args else kwargs.get("uri", ""))
+        method = (args[1] if len(args) > 1 else kwargs.get("method", "GET")).upper()
+        # freeBusy queries are POSTs too, but only read.
+        retry_server_errors = method != "POST" or endpoint == "freebusy"
+
+        def send():
+            with metrics.timer("calendar_http", endpoint=endpoint):
+                resp, content = self._http.request(*args, **kwargs)
+            if resp.status >= 400:
+                metrics.inc("calendar_http_errors_total", endpoint=endpoint)
+            if resp.status == 429 or (resp.status >= 500 and retry_server_errors):
+                raise HttpError(resp, content)
+            return resp, content
+        try:
+            return self._limiter.call(send)
+        except RateLimitExceeded as e:
+            if isinstance(e.__cause__, HttpError):
+                return e.__cause__.resp, e.__cause__.content
+            raise
+
+    def __getattr__(self, name):
+        return getattr(self._http, name)
+
+
+class CalendarClientManager:
+    """
+    Process-wide owner of the Google Calendar credentials and service objects.
+
+    Credentials are loaded once and refreshed in the background shortly before
+    they expire. The discovery document is parsed once per process. Each thread
+    gets its own service bound to a persistent httplib2 connection (httplib2 is
+    not thread-safe), so chained tool calls reuse warm keep-alive connections
+    instead of rebuilding the client every time.
+
+    Pass `api_endpoint` (and optionally `credentials` and `batch_uri`) to point
+    the client at a local fake Calendar server.
+
+    Without a usable token, an `interactive` client runs the desktop OAuth flow
+    (a browser on this machine, blocking until access is granted), which only
+    suits a local run for DEFAULT_USER. Any other client raises
+    CalendarAuthRequired instead; signed-in users get their token through
+    `CalendarClientCache.authorization_url` and `complete_authorization`.
+    """
+
+    def __init__(self, token_file=TOKEN_FILE, credentials_file=CREDENTIALS_FILE, scopes=SCOPES,
+                 api_endpoint=None, credentials=None, refresh_margin=REFRESH_MARGIN_SECONDS, batch_uri=None,
+                 user_id=DEFAULT_USER, interactive=None, limiter=None):
+        self.user_id = user_id
+        self.limiter = limiter or new_calendar_limiter()
+        self.interactive = user_id == DEFAULT_USER if interactive is None else interactive
+        self.token_file = token_file
+        self.credentials_file = credentials_file
+        self.scopes = scopes
+        self.api_endpoint = api_endpoint
+        self.refresh_margin = refresh_margin
+        if batch_uri is None and api_endpoint:
+            parts = urlsplit(api_endpoint)
+            batch_uri = f"{parts.scheme}://{parts.netloc}/batch/calendar/v3"
+        self.batch_uri = batch_uri
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._creds = credentials
+        self._discovery_doc = None
+        self._generation = 0
+        self._refresh_timer = None
+        self._session = requests.Session()
+        if credentials is not None:
+            self._schedule_refresh()
+
+    # --- Credentials ---
+    def _load_credentials(self):
+        creds = None
+        if os.path.exists(self.token_file):
+            try:
+                creds = Credentials.from_authorized_user_file(self.token_file, self.scopes)
+            except Exception as e:
+                logger.error("Failed to load %s: %s. Forcing re-auth.", self.token_file, e)
+                creds = None
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                try:
+                    creds.refresh(Request(self._session))
+                except Exception as e:
+                    logger.error("Failed to refresh token: %s. Forcing re-auth.", e)
+                    if os.path.exists(self.token_file): os.remove(self.token_file)
+                    creds = None
+            if not creds:
+                if not self.interactive:
+                    raise CalendarAuthRequired(f"User '{self.user_id}' has not granted Calendar access yet.")
+                flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, self.scopes)
+                creds = flow.run_local_server(port=0)
+            self._save_credentials(creds)
+        return creds
+
+    def _save_credentials(self, creds):
+        if os.path.dirname(self.token_file):
+            os.makedirs(os.path.dirname(self.token_file), exist_ok=True)
+        with open(self.token_file, "w") as token:
+            token.write(creds.to_json())
+
+    def has_token(self) -> bool:
+        """Whether credentials are loaded or a token file exists, i.e. no sign-in flow is needed first."""
+        return self._creds is not None or os.path.exists(self.token_file)
+
+    def set_credentials(self, creds):
+        """Adopts credentials obtained elsewhere (the web sign-in flow) and saves them to `token_file`."""
+        with self._lock:
+            self._save_credentials(creds)
+            self._creds = creds
+            self._generation += 1
+            self._schedule_refresh()
+
+    def get_credentials(self):
+        """Returns the cached credentials, loading them on first use."""
+        with self._lock:
+            if self._creds is None:
+                self._creds = self._load_credentials()
+                self._generation += 1
+                self._schedule_refresh()
+            return self._creds
+
+    def _schedule_refresh(self):
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+            self._refresh_timer = None
+        creds = self._creds
+        if creds is None or not creds.expiry or not getattr(creds, "refresh_token", None):
+            return
+        # google-auth keeps `expiry` as a naive UTC datetime.
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        delay = (creds.expiry - now).total_seconds() - self.refresh_margin
+        self._refresh_timer = threading.Timer(max(delay, 0), self._background_refresh)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _background_refresh(self):
+        with self._lock:
+            creds = self._creds
+            if creds is None:
+                return
+            try:
+                creds.refresh(Request(self._session))
+                self._save_credentials(creds)
+                logger.info("Calendar credentials refreshed ahead of expiry.")
+            except Exception as e:
+                # Leave the token in place; AuthorizedHttp retries the refresh on the next request.
+                logger.error("Background credential refresh failed: %s", e)
+                return
+            self._schedule_refresh()
+
+    # --- Service ---
+    def _get_discovery_document(self):
+        if self._discovery_doc is None:
+            with self._lock:
+                if self._discovery_doc is None:
+                    doc = discovery_cache.get_static_doc("calendar", "v3")
+                    if doc is None:
+                        uri = DISCOVERY_URI.format(api="calendar", apiVersion="v3")
+                        _, content = httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS).request(uri)
+                        doc = content.decode("utf-8")
+                    self._discovery_doc = json.loads(doc)
+        return self._discovery_doc
+
+    def get_service(self):
+        """Returns this thread's Calendar service, building it only when missing or stale."""
+        creds = self.get_credentials()
+        local = self._local
+        if getattr(local, "service", None) is None or local.generation != self._generation:
+            with metrics.timer("calendar_service_build"):
+                local.service = self._build_service(creds)
+            local.generation = self._generation
+        return local.service
+
+    def _build_service(self, creds):
+        http = RateLimitedHttp(google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS)), self.limiter)
+        client_options = {"api_endpoint": self.api_endpoint} if self.api_endpoint else None
+        return build_from_document(self._get_discovery_document(), http=http, client_options=client_options)
+
+    def new_batch_http_request(self, callback=None):
+        """Returns an HTTP batch that sends many Calendar calls in one round trip."""
+        if self.batch_uri:
+            return BatchHttpRequest(callback=callback, batch_uri=self.batch_uri)
+        return self.get_service().new_batch_http_request(callback=callback)
+
+    def reset(self):
+        """Drops cached credentials and services, e.g. after token.json was removed."""
+        with self._lock:
+            if self._refresh_timer is not None:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
+            self._creds = None
+            self._generation += 1
+
+
+calendar_client = CalendarClientManager()
+
+def user_file_name(user_id: str) -> str:
+    """
+    `user_id` made safe to use in a file name: its SHA-256 hex digest, so two
+    users never share a token file or event store (as "a+b@x.com" and
+    "a_b@x.com" would if odd characters were just replaced).
+    """
+    return hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+
+
+# The client of the user the current request runs for; unset means `calendar_client`.
+_active_client = contextvars.ContextVar("calendar_client", default=None)
+
+
+def current_calendar_client() -> CalendarClientManager:
+    """The Calendar client the tools and event stores should use right now."""
+    return _active_client.get() or calendar_client
+
+
+@contextlib.contextmanager
+def use_calendar_client(client: CalendarClientManager):
+    """Routes Calendar calls in this block (and in contexts copied from it, e.g. tool workers) to `client`."""
+    token = _active_client.set(client)
+    try:
+        yield client
+    finally:
+        _active_client.reset(token)
+
+
+class CalendarClientCache:
+    """
+    Per-user Calendar clients, keyed by user ID.
+
+    Each user gets their own CalendarClientManager, so their credentials are
+    loaded and refreshed once, their services stay warm between requests, and
+    their Calendar requests are paced by their own rate limiter. DEFAULT_USER is the process-wide `calendar_client`. Beyond `max_users` the
+    least recently used user is dropped: their refresh timer is cancelled and
+    their event stores are released. `factory(user_id)` builds a client, e.g.
+    one pointed at a fake Calendar server.
+    """
+
+    def __init__(self, factory=None, max_users=MAX_CACHED_USERS, token_dir=TOKEN_DIR):
+        self.factory = factory or self._default_factory
+        self.max_users = max_users
+        self.token_dir = token_dir
+        self._lock = threading.Lock()
+        self._clients = collections.OrderedDict()   # user id -> client, least recently used first
+        self._authorizations = {}                   # OAuth state -> (user id, Flow, started)
+
+    def _default_factory(self, user_id: str) -> CalendarClientManager:
+        return CalendarClientManager(token_file=os.path.join(self.token_dir, f"{user_file_name(user_id)}.json"), user_id=user_id)
+
+    def get(self, user_id: str) -> CalendarClientManager:
+        if user_id == DEFAULT_USER:
+            return calendar_client
+        evicted = []
+        with self._lock:
+            client = self._clients.get(user_id)
+            if client is None:
+                client = self._clients[user_id] = self.factory(user_id)
+                while len(self._clients) > self.max_users:
+                    evicted.append(self._clients.popitem(last=False))
+            self._clients.move_to_end(user_id)
+        for old_user, old_client in evicted:
+            self._release(old_user, old_client)
+        return client
+
+    # --- Web sign-in ---
+    def authorization_url(self, user_id: str, redirect_uri: str = OAUTH_REDIRECT_URI) -> str:
+        """
+        Starts the web OAuth flow for `user_id` and returns the Google consent
+        URL to send them to. Google redirects back to `redirect_uri` with the
+        `state` and `code` query parameters for `complete_authorization`.
+        """
+        flow = Flow.from_client_secrets_file(self.get(user_id).credentials_file, SCOPES, redirect_uri=redirect_uri)
+        state = secrets.token_urlsafe(24)
+        url, _ = flow.authorization_url(access_type="offline", prompt="consent", include_granted_scopes="true", state=state)
+        now = time.monotonic()
+        with self._lock:
+            for old_state in [key for key, (_, _, started) in self._authorizations.items() if now - started > OAUTH_STATE_TTL_SECONDS]:
+                del self._authorizations[old_state]
+            self._authorizations[state] = (user_id, flow, now)
+        return url
+
+    def complete_authorization(self, user_id: str, state: str, code: str):
+        """
+        Exchanges the `code` Google redirected back with for `user_id`'s token.
+        Raises CalendarAuthRequired if `state` is unknown, expired or was
+        started for another user.
+        """
+        with self._lock:
+            pending = self._authorizations.pop(state, None)
+        if pending is None or pending[0] != user_id or time.monotonic() - pending[2] > OAUTH_STATE_TTL_SECONDS:
+            raise CalendarAuthRequired("The Google sign-in expired or does not belong to this user; please start it again.")
+        flow = pending[1]
+        flow.fetch_token(code=code)
+        self.get(user_id).set_credentials(flow.credentials)
+        logger.info("User '%s' granted Calendar access.", user_id)
+
+    def drop(self, user_id: str):
+        """Forgets a user's client, e.g. after they signed out."""
+        with self._lock:
+            client = self._clients.pop(user_id, None)
+        if client is not None:
+            self._release(user_id, client)
+
+    def _release(self, user_id: str, client: CalendarClientManager):
+        from event_store import reset_event_stores
+        client.reset()
+        reset_event_stores(user_id)
+        logger.info("Released the Calendar client of user '%s'.", user_id)
+
+    def __len__(self):
+        return len(self._clients)
@@ -1,95 +1,307 @@
 # calendar_tools.py
 import datetime
-import os
 import pytz
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from availability import (DEFAULT_GRANULARITY_MINUTES, IntervalIndex, find_free_slots, free_runs, rank_slots, recurring_windows, select_best_slots,
+                          to_isoformat, working_windows)
+from calendar_client import current_calendar_client
+from event_store import get_event_store, parse_event_time
 from logger_config import logger
+from metrics import track_tool
 
-SCOPES = ["https://www.googleapis.com/auth/calendar"]
+# Upper bound on the lines (single starts or ranges of starts) returned per availability check.
+MAX_SLOT_RESULTS = 40
+# Range searches: longest range, default result count, and the daily window used when none is given.
+MAX_SEARCH_DAYS = 62
+MAX_SEARCH_RESULTS = 5
+DEFAULT_SEARCH_WINDOW = "09:00-18:00"
+NAMED_WINDOWS = {"morning": "09:00-12:00", "afternoon": "12:00-17:00", "evening": "17:00-21:00"}
+WEEKDAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+# Candidates listed back to the model when a query matches more than one event.
+MAX_EVENT_MATCHES = 5
+# The freebusy endpoint accepts at most this many calendars per query,
+# and an HTTP batch at most this many calls.
+FREEBUSY_MAX_ITEMS = 50
+BATCH_MAX_CALLS = 50
 
 
 def get_calendar_service():
-    creds = None
-    if os.path.exists("token.json"):
+    """Returns the current user's pooled Calendar service; credentials and discovery are cached per process."""
+    return current_calendar_client().get_service()
+
+
+def query_busy_intervals(calendar_ids: list[str], start_dt: datetime.datetime, end_dt: datetime.datetime, timezone: str):
+    """
+    Collects busy time for several calendars over one range.
+
+    'primary' is answered from the local event store. The other calendars go
+    to freebusy in chunks of FREEBUSY_MAX_ITEMS. When more than one chunk is
+    needed, the chunks travel together as a single HTTP batch.
+
+    Returns:
+        ({calendar_id: [(start_ts, end_ts), ...]}, {calendar_id: error message})
+    """
+    busy, errors = {}, {}
+    remote = []
+    for calendar_id in dict.fromkeys(calendar_ids):
+        if calendar_id == 'primary':
+            busy[calendar_id] = get_event_store().busy_intervals(start_dt, end_dt)
+        else:
+            remote.append(calendar_id)
+    if not remote:
+        return busy, errors
+
+    bodies = [
+        {"timeMin": start_dt.isoformat(), "timeMax": end_dt.isoformat(), "timeZone": timezone,
+         "items": [{"id": calendar_id} for calendar_id in remote[i:i + FREEBUSY_MAX_ITEMS]]}
+        for i in range(0, len(remote), FREEBUSY_MAX_ITEMS)
+    ]
+
+    def collect(request_id, response, exception):
+        if exception is not None:
+            for item in bodies[int(request_id)]['items']:
+                errors[item['id']] = str(exception)
+            return
+        for calendar_id, calendar in response.get('calendars', {}).items():
+            if calendar.get('errors'):
+                errors[calendar_id] = ", ".join(error.get('reason', 'unknown') for error in calendar['errors'])
+                continue
+            busy[calendar_id] = [
+                (datetime.datetime.fromisoformat(b['start'].replace('Z', '+00:00')).timestamp(),
+                 datetime.datetime.fromisoformat(b['end'].replace('Z', '+00:00')).timestamp())
+                for b in calendar.get('busy', [])
+            ]
+
+    service = get_calendar_service()
+    if len(bodies) == 1:
         try:
-            creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-        except Exception as e:
-            logger.error(f"Failed to load token.json: {e}. Forcing re-auth.")
-            creds = None
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-            except Exception as e:
-                logger.error(f"Failed to refresh token: {e}. Forcing re-auth.")
-                if os.path.exists("token.json"): os.remove("token.json")
-                creds = None
-        if not creds:
-            flow = InstalledAppFlow.from_client_secrets_file("credentials.json", SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
-    return build("calendar", "v3", credentials=creds)
-
-
-def check_availability(start_time: str, end_time: str, duration_minutes: int, timezone: str = "Asia/Kolkata") -> list[str]:
-    logger.info(f"Tool 'check_availability' called with args: start={start_time}, end={end_time}")
+            collect("0", service.freebusy().query(body=bodies[0]).execute(), None)
+        except HttpError as e:
+            collect("0", None, e)
+        return busy, errors
+    for first in range(0, len(bodies), BATCH_MAX_CALLS):
+        batch = current_calendar_client().new_batch_http_request(callback=collect)
+        for i in range(first, min(first + BATCH_MAX_CALLS, len(bodies))):
+            batch.add(service.freebusy().query(body=bodies[i]), request_id=str(i))
+        batch.execute()
+    return busy, errors
+
+
+def _find_common_slots(calendar_ids, start_time, end_time, duration_minutes, timezone, granularity_minutes,
+                       buffer_minutes, min_notice_minutes, working_hours_start, working_hours_end):
+    """Returns (tz, merged busy index, slot starts, per-calendar errors) for everyone in `calendar_ids`."""
+    tz = pytz.timezone(timezone)
+    start_dt = datetime.datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+    end_dt = datetime.datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+    if start_dt.tzinfo is None: start_dt = tz.localize(start_dt)
+    if end_dt.tzinfo is None: end_dt = tz.localize(end_dt)
+    busy_by_calendar, errors = query_busy_intervals(list(calendar_ids), start_dt, end_dt, timezone)
+    # Everyone is free exactly where the union of all busy sets is empty.
+    busy = IntervalIndex.from_pairs([pair for pairs in busy_by_calendar.values() for pair in pairs]).merged()
+    allowed = None
+    if working_hours_start and working_hours_end:
+        allowed = working_windows(start_dt.timestamp(), end_dt.timestamp(), tz,
+                                  datetime.time.fromisoformat(working_hours_start), datetime.time.fromisoformat(working_hours_end))
+    slots = find_free_slots(busy, start_dt.timestamp(), end_dt.timestamp(), int(duration_minutes),
+                            granularity_minutes=int(granularity_minutes), buffer_minutes=int(buffer_minutes),
+                            min_notice_minutes=int(min_notice_minutes), now_ts=datetime.datetime.now(tz).timestamp(), allowed=allowed, tz=tz)
+    return tz, busy, slots, errors
+
+
+@track_tool
+def check_availability(start_time: str, end_time: str, duration_minutes: int, timezone: str = "Asia/Kolkata",
+                       granularity_minutes: int = DEFAULT_GRANULARITY_MINUTES, buffer_minutes: int = 0, min_notice_minutes: int = 0,
+                       working_hours_start: str = None, working_hours_end: str = None, max_results: int = MAX_SLOT_RESULTS,
+                       calendar_ids: list[str] = None) -> list[str]:
+    logger.info("Tool 'check_availability' called with args: start=%s, end=%s", start_time, end_time)
     try:
-        service = get_calendar_service()
-        start_dt = datetime.datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-        end_dt = datetime.datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-        body = {"timeMin": start_dt.isoformat(), "timeMax": end_dt.isoformat(), "timeZone": timezone, "items": [{"id": "primary"}]}
-        events_result = service.freebusy().query(body=body).execute()
-        busy_intervals = events_result.get('calendars', {}).get('primary', {}).get('busy', [])
+        tz, _, slots, errors = _find_common_slots(calendar_ids or ['primary'], start_time, end_time, duration_minutes, timezone,
+                                                  granularity_minutes, buffer_minutes, min_notice_minutes,
+                                                  working_hours_start, working_hours_end)
+        firsts, lasts = free_runs(slots, granularity_minutes, tz)
         available_slots = []
-        current_time = start_dt
-        busy_intervals.sort(key=lambda x: x['start'])
-        for busy in busy_intervals:
-            busy_start = datetime.datetime.fromisoformat(busy['start'].replace('Z', '+00:00'))
-            if current_time + datetime.timedelta(minutes=duration_minutes) <= busy_start:
-                available_slots.append(current_time.isoformat())
-            busy_end = datetime.datetime.fromisoformat(busy['end'].replace('Z', '+00:00'))
-            current_time = max(current_time, busy_end)
-        if current_time + datetime.timedelta(minutes=duration_minutes) <= end_dt:
-            available_slots.append(current_time.isoformat())
+        for first, last in zip(to_isoformat(firsts, tz), to_isoformat(lasts, tz)):
+            if first == last:
+                available_slots.append(first)
+            else:
+                available_slots.append(f"{first} to {last[11:16]} every {int(granularity_minutes)} min")
+        if len(available_slots) > int(max_results):
+            hidden = len(available_slots) - int(max_results)
+            available_slots = available_slots[:int(max_results)]
+            available_slots.append(f"Truncated: {hidden} more free ranges not listed; the last free start is "
+                                   f"{to_isoformat(lasts[-1:], tz)[0]}. Search from a later time to list them.")
+        available_slots.extend(f"Could not read calendar '{calendar_id}': {error}" for calendar_id, error in errors.items())
         return available_slots
     except Exception as e:
-        logger.error(f"Error in check_availability: {e}", exc_info=True)
+        logger.error("Error in check_availability: %s", e, exc_info=True)
         return [f"An error occurred: {e}"]
 
 
+@track_tool
+def find_group_availability(calendar_ids: list[str], start_time: str, end_time: str, duration_minutes: int, timezone: str = "Asia/Kolkata",
+                            granularity_minutes: int = DEFAULT_GRANULARITY_MINUTES, working_hours_start: str = None,
+                            working_hours_end: str = None, max_results: int = 10) -> dict:
+    """
+    Finds the best times when every listed calendar is free.
+
+    Args:
+        calendar_ids: Calendar IDs or attendee emails; 'primary' is the user's own calendar.
+        start_time: Start of the search range (ISO 8601).
+        end_time: End of the search range (ISO 8601).
+        duration_minutes: Meeting length in minutes.
+        timezone: The user's IANA timezone.
+        granularity_minutes: Spacing between candidate start times.
+        working_hours_start: Optional earliest local start, e.g. '09:00'.
+        working_hours_end: Optional latest local end, e.g. '18:00'.
+        max_results: Number of ranked slots to return.
+
+    Returns:
+        A dict with the ranked common slots and any calendars that could not be read.
+    """
+    logger.info("Tool 'find_group_availability' called for %s calendars: start=%s, end=%s", len(calendar_ids), start_time, end_time)
+    try:
+        tz, busy, slots, errors = _find_common_slots(calendar_ids, start_time, end_time, duration_minutes, timezone,
+                                                     granularity_minutes, 0, 0, working_hours_start, working_hours_end)
+        ranked = rank_slots(busy, slots, int(duration_minutes), limit=int(max_results))
+        return {"slots": to_isoformat(ranked, tz), "unavailable_calendars": errors}
+    except Exception as e:
+        logger.error("Error in find_group_availability: %s", e, exc_info=True)
+        return {"error": f"An error occurred: {e}"}
+
+
+def _parse_weekdays(weekdays) -> set:
+    """Day names ('monday', 'tue'), 'weekdays', 'weekends' or ints (Monday=0) as a set of ints."""
+    days = set()
+    for day in weekdays:
+        name = str(day).strip().lower()
+        if name in ("weekday", "weekdays"):
+            days |= {0, 1, 2, 3, 4}
+        elif name in ("weekend", "weekends"):
+            days |= {5, 6}
+        elif name.isdigit() and int(name) < 7:
+            days.add(int(name))
+        else:
+            matches = [i for i, full in enumerate(WEEKDAY_NAMES) if len(name) >= 2 and full.startswith(name)]
+            if len(matches) != 1:
+                raise ValueError(f"Unknown weekday '{day}'.")
+            days.add(matches[0])
+    return days
+
+
+def _parse_time_windows(windows) -> list[tuple[datetime.time, datetime.time]]:
+    """'HH:MM-HH:MM' strings or 'morning'/'afternoon'/'evening' as (start, end) times."""
+    parsed = []
+    for window in windows:
+        text = NAMED_WINDOWS.get(str(window).strip().lower(), str(window))
+        try:
+            start, end = (datetime.time.fromisoformat(part.strip()) for part in text.split("-"))
+        except ValueError:
+            raise ValueError(f"Invalid time window '{window}'; use 'HH:MM-HH:MM'.") from None
+        parsed.append((start, end))
+    return parsed
+
+
+@track_tool
+def search_availability(start_date: str, end_date: str, duration_minutes: int, timezone: str = "Asia/Kolkata",
+                        weekdays: list[str] = None, time_windows: list[str] = None, calendar_ids: list[str] = None,
+                        granularity_minutes: int = DEFAULT_GRANULARITY_MINUTES, buffer_minutes: int = 0, min_notice_minutes: int = 0,
+                        max_results: int = MAX_SEARCH_RESULTS, max_per_day: int = 2) -> dict:
+    """
+    Finds the best free slots over a range of days with recurring constraints,
+    e.g. "an hour any weekday morning in the next two weeks", in one call.
+
+    Busy time for the whole range is read once (see `query_busy_intervals`),
+    every candidate start in the allowed windows is checked in one vectorized
+    pass, and the best non-overlapping slots are returned, spread over days.
+
+    Args:
+        start_date: First day to search: 'today', 'tomorrow' or YYYY-MM-DD.
+        end_date: Last day to search (inclusive), in the same forms.
+        duration_minutes: Meeting length in minutes.
+        timezone: The user's IANA timezone; windows follow its DST changes.
+        weekdays: Allowed days, e.g. ['monday', 'wednesday'] or ['weekdays']. Defaults to every day.
+        time_windows: Allowed daily windows, e.g. ['09:00-12:00'] or ['morning']. Defaults to 09:00-18:00.
+        calendar_ids: Calendars that must all be free. Defaults to ['primary'].
+        granularity_minutes: Spacing between candidate start times.
+        buffer_minutes: Free time to keep around existing events.
+        min_notice_minutes: Minimum minutes from now before a slot may start.
+        max_results: Number of slots to return.
+        max_per_day: At most this many of the returned slots fall on one day.
+
+    Returns:
+        A dict with the slots (start, end, score in [0, 1]; higher means more
+        free time around it), how many free starts matched, and any calendars
+        that could not be read.
+    """
+    logger.info("Tool 'search_availability' called: %s to %s, %s min", start_date, end_date, duration_minutes)
+    try:
+        tz = pytz.timezone(timezone)
+        first, last = resolve_day(start_date, tz), resolve_day(end_date, tz)
+        if last < first:
+            return {"error": "The end date is before the start date."}
+        if (last - first).days + 1 > MAX_SEARCH_DAYS:
+            return {"error": f"Please search at most {MAX_SEARCH_DAYS} days at a time."}
+        allowed_days = _parse_weekdays(weekdays) if weekdays else None
+        windows = _parse_time_windows(time_windows or [DEFAULT_SEARCH_WINDOW])
+
+        start_dt = tz.localize(datetime.datetime.combine(first, datetime.time()))
+        end_dt = tz.localize(datetime.datetime.combine(last + datetime.timedelta(days=1), datetime.time()))
+        busy_by_calendar, errors = query_busy_intervals(calendar_ids or ['primary'], start_dt, end_dt, timezone)
+        busy = IntervalIndex.from_pairs([pair for pairs in busy_by_calendar.values() for pair in pairs]).merged()
+
+        now_ts = datetime.datetime.now(tz).timestamp()
+        start_ts, end_ts = max(start_dt.timestamp(), now_ts), end_dt.timestamp()
+        allowed = recurring_windows(start_ts, end_ts, tz, windows, allowed_days)
+        slots = find_free_slots(busy, start_ts, end_ts, int(duration_minutes), granularity_minutes=int(granularity_minutes),
+                                buffer_minutes=int(buffer_minutes), min_notice_minutes=int(min_notice_minutes),
+                                now_ts=now_ts, allowed=allowed, tz=tz)
+        best, scores = select_best_slots(busy, slots, int(duration_minutes), tz, int(max_results), int(max_per_day) or None)
+        ends = best + int(duration_minutes) * 60
+        return {
+            "slots": [{"start": start, "end": end, "score": round(float(score), 2)}
+                      for start, end, score in zip(to_isoformat(best, tz), to_isoformat(ends, tz), scores)],
+            "matching_start_times": int(len(slots)),
+            "unavailable_calendars": errors,
+        }
+    except Exception as e:
+        logger.error("Error in search_availability: %s", e, exc_info=True)
+        return {"error": f"An error occurred: {e}"}
+
+
+@track_tool
 def create_calendar_event(start_time: str, end_time: str, title: str, timezone: str = "Asia/Kolkata") -> str:
-    logger.info(f"Tool 'create_calendar_event' called with args: start={start_time}, title={title}")
+    logger.info("Tool 'create_calendar_event' called with args: start=%s, title=%s", start_time, title)
     try:
         service = get_calendar_service()
         event = {'summary': title, 'start': {'dateTime': start_time, 'timeZone': timezone}, 'end': {'dateTime': end_time, 'timeZone': timezone}}
         created_event = service.events().insert(calendarId='primary', body=event).execute()
+        get_event_store().upsert(created_event)
         return f"Success! The event '{title}' has been scheduled. Link: {created_event.get('htmlLink')}"
     except Exception as e:
-        logger.error(f"Error in create_calendar_event: {e}", exc_info=True)
+        logger.error("Error in create_calendar_event: %s", e, exc_info=True)
         return f"An error occurred: {e}"
 
 
+def resolve_day(day: str, tz) -> datetime.date:
+    """'today', 'tomorrow' or YYYY-MM-DD (a longer ISO timestamp is cut to its date) as a date in `tz`."""
+    today = datetime.datetime.now(tz).date()
+    if day.lower() == 'today':
+        return today
+    if day.lower() == 'tomorrow':
+        return today + datetime.timedelta(days=1)
+    return datetime.datetime.strptime(day[:10], "%Y-%m-%d").date()
+
+
+@track_tool
 def get_day_schedule(day: str, timezone: str = "Asia/Kolkata") -> list[str]:
-    logger.info(f"Tool 'get_day_schedule' called for day: {day}")
+    logger.info("Tool 'get_day_schedule' called for day: %s", day)
     try:
-        service = get_calendar_service()
         tz = pytz.timezone(timezone)
-        if day.lower() == 'today':
-            start_dt = datetime.datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
-        elif day.lower() == 'tomorrow':
-            start_dt = (datetime.datetime.now(tz) + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
-        else:
-            start_dt = tz.localize(datetime.datetime.strptime(day, "%Y-%m-%d"))
+        start_dt = tz.localize(datetime.datetime.combine(resolve_day(day, tz), datetime.time()))
         end_dt = start_dt + datetime.timedelta(days=1, microseconds=-1)
-        events_result = service.events().list(calendarId='primary', timeMin=start_dt.isoformat(), timeMax=end_dt.isoformat(), singleEvents=True, orderBy='startTime').execute()
-        events = events_result.get('items', [])
+        events = get_event_store().events_between(start_dt, end_dt)
         if not events: return ["Your schedule for that day is completely free."]
         schedule = []
         for event in events:
@@ -100,13 +312,53 @@ def get_day_schedule(day: str, timezone: str = "Asia/Kolkata") -> list[str]:
             schedule.append(f"{start_time_obj.strftime('%I:%M %p')} - {end_time_obj.strftime('%I:%M %p')}: {event['summary']}")
         return schedule
     except Exception as e:
-        logger.error(f"Error in get_day_schedule: {e}", exc_info=True)
+        logger.error("Error in get_day_schedule: %s", e, exc_info=True)
         return [f"An error occurred: {e}"]
 
+def _describe_event(event: dict, tz) -> str:
+    start = parse_event_time(event['start'], tz).astimezone(tz)
+    return f"event_id: {event['id']} | {start.strftime('%a %d %b %I:%M %p')} | {event.get('summary', '(no title)')}"
+
+
+def _resolve_event(service, store, event_id: str, query: str, now: datetime.datetime):
+    """
+    Finds the one event an operation refers to, by ID or by search text.
+
+    The local index is consulted first; the server-side search only runs for
+    events outside the store's window. Returns (event, None) or (None, error message).
+    """
+    if event_id:
+        event = store.get(event_id)
+        if event is None:
+            try:
+                event = service.events().get(calendarId='primary', eventId=event_id).execute()
+            except HttpError as e:
+                if e.resp.status in (404, 410):
+                    return None, f"Error: No event with event_id '{event_id}'."
+                raise
+        return event, None
+    if not query:
+        return None, "Error: Give either an event_id or a search query."
+    events = store.lookup(query, time_min=now, limit=MAX_EVENT_MATCHES)
+    if not events:
+        # The store only covers its sync window; fall back to the server-side search.
+        events_result = service.events().list(calendarId='primary', q=query, timeMin=now.isoformat(), maxResults=MAX_EVENT_MATCHES, singleEvents=True, orderBy='startTime').execute()
+        events = events_result.get('items', [])
+    if not events:
+        return None, f"Error: No upcoming events found matching '{query}'."
+    if len(events) > 1:
+        listing = "\n".join(f"- {_describe_event(event, now.tzinfo)}" for event in events)
+        return None, (f"Error: Found multiple events matching '{query}'. Ask the user which one they mean, "
+                      f"then call again with its event_id:\n{listing}")
+    return events[0], None
+
+
 # --- NEW, POWERFUL TOOL ---
-def manage_calendar_event(query: str, action: str, new_start_time: str = None, new_end_time: str = None, timezone: str = "Asia/Kolkata") -> str:
+@track_tool
+def manage_calendar_event(query: str = "", action: str = "", new_start_time: str = None, new_end_time: str = None,
+                          timezone: str = "Asia/Kolkata", event_id: str = None) -> str:
     """
-    Finds, deletes, or updates a single calendar event based on a search query.
+    Finds, deletes, or updates a single calendar event based on a search query or its ID.
 
     Args:
         query: The search text to find the event (e.g., 'Meeting with HQ').
@@ -114,46 +366,141 @@ def manage_calendar_event(query: str, action: str, new_start_time: str = None, n
         new_start_time: The new start time if updating (ISO 8601 format).
         new_end_time: The new end time if updating (ISO 8601 format).
         timezone: The user's IANA timezone.
+        event_id: The event's ID, e.g. from an earlier list of matches. Takes precedence over `query`.
 
     Returns:
         A confirmation message of the action performed.
     """
-    logger.info(f"Tool 'manage_calendar_event' called with query: '{query}', action: '{action}'")
+    logger.info("Tool 'manage_calendar_event' called with query: '%s', event_id: '%s', action: '%s'", query, event_id, action)
     try:
         service = get_calendar_service()
         tz = pytz.timezone(timezone)
         now = datetime.datetime.now(tz)
 
-        events_result = service.events().list(calendarId='primary', q=query, timeMin=now.isoformat(), maxResults=5, singleEvents=True, orderBy='startTime').execute()
-        events = events_result.get('items', [])
-
-        if not events:
-            return f"Error: No upcoming events found matching '{query}'."
-        if len(events) > 1:
-            return f"Error: Found multiple events matching '{query}'. Please be more specific."
+        store = get_event_store()
+        event, error = _resolve_event(service, store, event_id, query, now)
+        if error:
+            return error
 
-        event = events[0]
         event_id = event['id']
-        summary = event['summary']
+        summary = event.get('summary', '(no title)')
 
         if action.lower() == 'delete':
             service.events().delete(calendarId='primary', eventId=event_id).execute()
-            logger.info(f"Event '{summary}' (ID: {event_id}) deleted successfully.")
+            store.remove(event_id)
+            logger.info("Event '%s' (ID: %s) deleted successfully.", summary, event_id)
             return f"Success: The event '{summary}' has been permanently deleted."
         
         elif action.lower() == 'update':
             if not new_start_time or not new_end_time:
                 return "Error: To update an event, you must provide both a new start and end time."
             
-            event['start']['dateTime'] = new_start_time
-            event['end']['dateTime'] = new_end_time
+            # Copy before editing: the event may be the store's own record.
+            event = {**event, 'start': {**event['start'], 'dateTime': new_start_time}, 'end': {**event['end'], 'dateTime': new_end_time}}
             updated_event = service.events().update(calendarId='primary', eventId=event_id, body=event).execute()
-            logger.info(f"Event '{summary}' (ID: {event_id}) updated successfully.")
+            store.upsert(updated_event)
+            logger.info("Event '%s' (ID: %s) updated successfully.", summary, event_id)
             return f"Success: The event '{summary}' has been updated. New time: {new_start_time}. Link: {updated_event.get('htmlLink')}"
         
         else:
             return f"Error: Invalid action '{action}'. Please use 'delete' or 'update'."
 
     except Exception as e:
-        logger.error(f"Error in manage_calendar_event: {e}", exc_info=True)
-        return f"An unexpected error occurred: {e}"
\ No newline at end of file
+        logger.error("Error in manage_calendar_event: %s", e, exc_info=True)
+        return f"An unexpected error occurred: {e}"
+
+
+@track_tool
+def bulk_manage_calendar_events(operations: list[dict], timezone: str = "Asia/Kolkata") -> list[str]:
+    """
+    Creates, updates and deletes many events in one go.
+
+    Every operation is resolved against the local event index first; the ones
+    that resolve are sent together as a single Calendar HTTP batch (split at
+    BATCH_MAX_CALLS), and the store is patched from the batch responses.
+
+    Args:
+        operations: Items with an 'action' ('create', 'update' or 'delete').
+            Updates and deletes name their event by 'event_id' or 'query'.
+            Creates need 'title', 'start_time' and 'end_time'; updates take any
+            of them (ISO 8601 times, both or neither).
+        timezone: The user's IANA timezone.
+
+    Returns:
+        One result line per operation, in the order given.
+    """
+    logger.info("Tool 'bulk_manage_calendar_events' called with %s operations", len(operations))
+    results = [None] * len(operations)
+    try:
+        service = get_calendar_service()
+        tz = pytz.timezone(timezone)
+        now = datetime.datetime.now(tz)
+        store = get_event_store()
+
+        pending = {}    # index -> (request, action, event_id, summary)
+        for index, operation in enumerate(operations):
+            action = str(operation.get('action', '')).lower()
+            title, start_time, end_time = operation.get('title'), operation.get('start_time'), operation.get('end_time')
+            if bool(start_time) != bool(end_time):
+                results[index] = "Error: Give both a start_time and an end_time, or neither."
+                continue
+            times = {'start': {'dateTime': start_time, 'timeZone': timezone}, 'end': {'dateTime': end_time, 'timeZone': timezone}} if start_time else {}
+            if action == 'create':
+                if not title or not start_time:
+                    results[index] = "Error: To create an event, give a title, a start_time and an end_time."
+                    continue
+                request = service.events().insert(calendarId='primary', body={'summary': title, **times})
+                pending[index] = (request, action, None, title)
+                continue
+            if action not in ('update', 'delete'):
+                results[index] = f"Error: Invalid action '{action}'. Please use 'create', 'update' or 'delete'."
+                continue
+            event, error = _resolve_event(service, store, operation.get('event_id'), operation.get('query', ''), now)
+            if error:
+                results[index] = error
+                continue
+            summary = event.get('summary', '(no title)')
+            if action == 'delete':
+                request = service.events().delete(calendarId='primary', eventId=event['id'])
+            else:
+                changes = {**times, **({'summary': title} if title else {})}
+                if not changes:
+                    results[index] = "Error: To update an event, give a new title or new start and end times."
+                    continue
+                request = service.events().patch(calendarId='primary', eventId=event['id'], body=changes)
+            pending[index] = (request, action, event['id'], summary)
+
+        def collect(request_id, response, exception):
+            index = int(request_id)
+            _, action, event_id, summary = pending[index]
+            if isinstance(exception, HttpError) and exception.resp.status in (404, 410) and event_id:
+                # Already gone on the server; the local copy was stale.
+                store.remove(event_id)
+                if action == 'delete':
+                    results[index] = f"Success: '{summary}' was already deleted."
+                    return
+            if exception is not None:
+                results[index] = f"Error: Could not {action} '{summary}': {exception}"
+                return
+            if action == 'delete':
+                store.remove(event_id)
+                results[index] = f"Success: '{summary}' has been deleted."
+            else:
+                store.upsert(response)
+                verb = "scheduled" if action == 'create' else "updated"
+                results[index] = f"Success: '{response.get('summary', summary)}' has been {verb}. Link: {response.get('htmlLink')}"
+
+        indexes = list(pending)
+        for first in range(0, len(indexes), BATCH_MAX_CALLS):
+            chunk = indexes[first:first + BATCH_MAX_CALLS]
+            # Calendar quota counts every call inside a batch; the batch's own request pays for one.
+            current_calendar_client().limiter.acquire({"requests_per_minute": len(chunk) - 1})
+            batch = current_calendar_client().new_batch_http_request(callback=collect)
+            for index in chunk:
+                batch.add(pending[index][0], request_id=str(index))
+            batch.execute()
+        return [f"{index + 1}. {result}" for index, result in enumerate(results)]
+    except Exception as e:
+        logger.error("Error in bulk_manage_calendar_events: %s", e, exc_info=True)
+        # Operations already answered are still reported; a batch may have partly gone through.
+        return [f"An error occurred: {e}"] + [f"{index + 1}. {result}" for index, result in enumerate(results) if result is not None]
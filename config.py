@@ -8,5 +8,15 @@ load_dotenv()
 # Get the Gemini API key
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY not found. Please set it in the .env file.")
\ No newline at end of file
+def require_gemini_api_key() -> str:
+    """The Gemini API key; raises if it is not set. Called by the app, not at import, so the
+    offline benchmarks can import the rest of the code without a key."""
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY not found. Please set it in the .env file.")
+    return GEMINI_API_KEY
+
+# Approximate input-token budget for the conversation history sent with every model call
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "8000"))
+
+# The Calendar account in token.json; used for every session when users do not sign in
+DEFAULT_USER = "default"
@@ -0,0 +1,435 @@
+# event_store.py
+import bisect
+import datetime
+import itertools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import pytz
+from googleapiclient.errors import HttpError
+
+from calendar_client import current_calendar_client, user_file_name
+from config import DEFAULT_USER
+from logger_config import logger
+
+# Set EVENT_STORE_DB to a file path to persist the stores across restarts.
+# Users other than DEFAULT_USER get a file of their own next to it.
+EVENT_STORE_DB = os.getenv("EVENT_STORE_DB")
+# How old a sync may get before a read triggers an incremental refresh.
+MAX_STALENESS_SECONDS = 30
+# Window fetched on first use, relative to now.
+WINDOW_PAST_DAYS = 1
+WINDOW_FUTURE_DAYS = 30
+# Events that ended longer ago than this are evicted.
+RETENTION_SECONDS = 24 * 3600
+# Eviction only runs once the window start lags the cutoff by this much.
+EVICTION_INTERVAL_SECONDS = 3600
+
+_TOKEN = re.compile(r"\w+")
+
+
+def _tokens(text: str) -> set:
+    return set(_TOKEN.findall(text.lower()))
+
+
+def _text_tokens(event: dict) -> set:
+    """Search tokens for an event: title, location and description."""
+    return _tokens(" ".join([event.get('summary', ''), event.get('location', ''), event.get('description', '')]))
+
+
+def _attendee_tokens(event: dict) -> set:
+    """Attendee emails (whole and split into words) and display names."""
+    tokens = set()
+    for attendee in event.get('attendees', []):
+        email = attendee.get('email', '').lower()
+        if email:
+            tokens.add(email)
+        tokens |= _tokens(email + " " + attendee.get('displayName', ''))
+    return tokens
+
+
+def parse_event_time(value: dict, tz) -> datetime.datetime:
+    """Parses an event 'start'/'end' field; all-day dates are taken as midnight in `tz`."""
+    if 'dateTime' in value:
+        return datetime.datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00'))
+    return tz.localize(datetime.datetime.strptime(value['date'], "%Y-%m-%d"))
+
+
+def _is_busy(event: dict) -> bool:
+    """Mirrors the freebusy rules: opaque, not cancelled and not declined by the owner."""
+    if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+        return False
+    for attendee in event.get('attendees', []):
+        if attendee.get('self') and attendee.get('responseStatus') == 'declined':
+            return False
+    return True
+
+
+# Numbers every store made in this process, so a replaced store never matches its predecessor.
+_generations = itertools.count(1)
+
+
+class CalendarEventStore:
+    """
+    Local copy of one calendar's events inside a time window.
+
+    The store is filled with one windowed `events().list` and then kept current
+    with incremental sync (`syncToken`), so availability and schedule reads are
+    answered from memory. The tools patch it directly after their own writes.
+    With `db_path` set, events and the sync token are persisted to SQLite and
+    survive restarts.
+
+    Events are indexed by ID, start time, text tokens and attendees. The token
+    indexes are updated with every change, so `lookup` never scans the store.
+    `version` goes up with every change applied, from sync or from the app's own
+    writes, so results derived from the store can tell when they are stale.
+    It starts again at 0 in a new store, so `generation`, unique to each store
+    in the process, tells a replaced store (see `reset_event_stores`) apart.
+    """
+
+    def __init__(self, service_factory, calendar_id='primary', db_path=None,
+                 max_staleness=MAX_STALENESS_SECONDS, retention=RETENTION_SECONDS, clock=time.time):
+        self.service_factory = service_factory
+        self.calendar_id = calendar_id
+        self.max_staleness = max_staleness
+        self.retention = retention
+        self.clock = clock
+        self.timezone = pytz.utc
+        self._lock = threading.RLock()
+        self._events = {}       # event id -> (start_ts, end_ts, event)
+        self._order = []        # (start_ts, event id), rebuilt lazily
+        self._dirty = False
+        self._by_token = {}     # text token -> event ids
+        self._by_attendee = {}  # attendee token -> event ids
+        self._keys = {}         # event id -> (text tokens, attendee tokens) it is indexed under
+        self._vocab = None      # sorted text tokens for prefix search, rebuilt lazily
+        self._sync_token = None
+        self._window = None     # (start_ts, end_ts) covered by the store
+        self._last_sync = 0.0
+        self.version = 0
+        self.generation = next(_generations)
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS events (calendar_id TEXT, event_id TEXT, start_ts REAL, end_ts REAL, body TEXT, PRIMARY KEY (calendar_id, event_id))")
+            self._db.execute("CREATE TABLE IF NOT EXISTS sync_state (calendar_id TEXT PRIMARY KEY, sync_token TEXT, window_start REAL, window_end REAL, timezone TEXT)")
+            self._load_from_db()
+
+    # --- Persistence ---
+    def _load_from_db(self):
+        row = self._db.execute("SELECT sync_token, window_start, window_end, timezone FROM sync_state WHERE calendar_id = ?", (self.calendar_id,)).fetchone()
+        if not row:
+            return
+        self._sync_token, start, end, tz_name = row
+        self._window = (start, end)
+        self.timezone = pytz.timezone(tz_name)
+        for event_id, start_ts, end_ts, body in self._db.execute("SELECT event_id, start_ts, end_ts, body FROM events WHERE calendar_id = ?", (self.calendar_id,)):
+            self._put(event_id, start_ts, end_ts, json.loads(body))
+        logger.info("Event store for '%s' loaded %s events from disk.", self.calendar_id, len(self._events))
+
+    def _persist(self, upserts=(), deletes=(), replace=False):
+        if self._db is None:
+            return
+        with self._db:
+            if replace:
+                self._db.execute("DELETE FROM events WHERE calendar_id = ?", (self.calendar_id,))
+            self._db.executemany("DELETE FROM events WHERE calendar_id = ? AND event_id = ?", [(self.calendar_id, i) for i in deletes])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)",
+                [(self.calendar_id, i, s, e, json.dumps(ev)) for i, (s, e, ev) in ((i, self._events[i]) for i in upserts if i in self._events)],
+            )
+            if self._window:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?)",
+                    (self.calendar_id, self._sync_token, self._window[0], self._window[1], self.timezone.zone),
+                )
+
+    # --- Local mutation ---
+    def _put(self, event_id: str, start_ts: float, end_ts: float, event: dict):
+        self._drop(event_id)
+        self._events[event_id] = (start_ts, end_ts, event)
+        keys = (_text_tokens(event), _attendee_tokens(event))
+        if not keys[0] <= self._by_token.keys():
+            self._vocab = None
+        for index, tokens in zip((self._by_token, self._by_attendee), keys):
+            for token in tokens:
+                index.setdefault(token, set()).add(event_id)
+        self._keys[event_id] = keys
+        self._dirty = True
+        self.version += 1
+
+    def _drop(self, event_id: str):
+        if self._events.pop(event_id, None) is None:
+            return
+        for index, tokens in zip((self._by_token, self._by_attendee), self._keys.pop(event_id)):
+            for token in tokens:
+                ids = index[token]
+                ids.discard(event_id)
+                if not ids:
+                    del index[token]
+                    if index is self._by_token:
+                        self._vocab = None
+        self._dirty = True
+        self.version += 1
+
+    def _clear(self):
+        self._events.clear()
+        self._by_token.clear()
+        self._by_attendee.clear()
+        self._keys.clear()
+        self._order = []
+        self._vocab = None
+        self._dirty = True
+        self.version += 1
+
+    def _apply(self, event: dict) -> bool:
+        """Applies one event or tombstone; returns True if it is kept."""
+        event_id = event['id']
+        if event.get('status') == 'cancelled':
+            self._drop(event_id)
+            return False
+        start_ts = parse_event_time(event['start'], self.timezone).timestamp()
+        end_ts = parse_event_time(event['end'], self.timezone).timestamp()
+        if self._window and (end_ts <= self._window[0] or start_ts >= self._window[1]):
+            self._drop(event_id)
+            return False
+        self._put(event_id, start_ts, end_ts, event)
+        return True
+
+    def upsert(self, event: dict):
+        """Records an event the app itself created or updated."""
+        with self._lock:
+            if self._window is None:
+                return
+            kept = self._apply(event)
+            self._persist(upserts=[event['id']] if kept else [], deletes=[] if kept else [event['id']])
+
+    def remove(self, event_id: str):
+        """Drops an event the app itself deleted."""
+        with self._lock:
+            self._drop(event_id)
+            self._persist(deletes=[event_id])
+
+    def invalidate(self):
+        """Forgets everything; the next read performs a full window fetch."""
+        with self._lock:
+            self._clear()
+            self._sync_token = None
+            self._window = None
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("DELETE FROM events WHERE calendar_id = ?", (self.calendar_id,))
+                    self._db.execute("DELETE FROM sync_state WHERE calendar_id = ?", (self.calendar_id,))
+
+    # --- Sync ---
+    def _list_pages(self, **params):
+        service = self.service_factory()
+        items, page_token = [], None
+        while True:
+            result = service.events().list(calendarId=self.calendar_id, singleEvents=True, maxResults=2500, pageToken=page_token, **params).execute()
+            items.extend(result.get('items', []))
+            if result.get('timeZone'):
+                self.timezone = pytz.timezone(result['timeZone'])
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return items, result.get('nextSyncToken')
+
+    def _full_sync(self, window_start: float, window_end: float):
+        time_min = datetime.datetime.fromtimestamp(window_start, pytz.utc).isoformat()
+        time_max = datetime.datetime.fromtimestamp(window_end, pytz.utc).isoformat()
+        items, sync_token = self._list_pages(timeMin=time_min, timeMax=time_max)
+        self._clear()
+        self._window = (window_start, window_end)
+        self._sync_token = sync_token
+        for event in items:
+            self._apply(event)
+        self._last_sync = self.clock()
+        self._persist(upserts=list(self._events), replace=True)
+        logger.info("Event store for '%s' filled with %s events.", self.calendar_id, len(self._events))
+
+    def _incremental_sync(self):
+        try:
+            items, sync_token = self._list_pages(syncToken=self._sync_token)
+        except HttpError as e:
+            if e.resp.status == 410:
+                logger.info("Sync token for '%s' expired, refetching window.", self.calendar_id)
+                self._full_sync(*self._window)
+                return
+            raise
+        kept, dropped = [], []
+        for event in items:
+            (kept if self._apply(event) else dropped).append(event['id'])
+        self._sync_token = sync_token
+        self._last_sync = self.clock()
+        self._persist(upserts=kept, deletes=dropped)
+
+    def _evict(self, keep_from: float):
+        cutoff = min(self.clock() - self.retention, keep_from)
+        if self._window is None or self._window[0] >= cutoff - EVICTION_INTERVAL_SECONDS:
+            return
+        expired = [i for i, (_, end_ts, _) in self._events.items() if end_ts <= cutoff]
+        for event_id in expired:
+            self._drop(event_id)
+        self._window = (cutoff, self._window[1])
+        self._persist(deletes=expired)
+
+    def ensure_fresh(self, time_min: float, time_max: float):
+        """Makes sure the store covers [time_min, time_max) and is no older than `max_staleness`."""
+        with self._lock:
+            now = self.clock()
+            self._evict(keep_from=time_min)
+            if self._window is None or self._sync_token is None:
+                start = min(time_min, now - WINDOW_PAST_DAYS * 86400)
+                end = max(time_max, now + WINDOW_FUTURE_DAYS * 86400)
+                self._full_sync(start, end)
+            elif time_min < self._window[0] or time_max > self._window[1]:
+                self._full_sync(min(time_min, self._window[0]), max(time_max, self._window[1]))
+            elif now - self._last_sync > self.max_staleness:
+                self._incremental_sync()
+
+    def poll_changes(self) -> int:
+        """Pulls remote changes if the last sync is older than `max_staleness`; returns `version`."""
+        with self._lock:
+            if self._sync_token is not None and self.clock() - self._last_sync > self.max_staleness:
+                self._incremental_sync()
+            return self.version
+
+    # --- Queries ---
+    def _sorted(self):
+        if self._dirty:
+            self._order = sorted((start_ts, event_id) for event_id, (start_ts, _, _) in self._events.items())
+            self._dirty = False
+        return self._order
+
+    def events_between(self, time_min: datetime.datetime, time_max: datetime.datetime) -> list[dict]:
+        """Returns the events overlapping [time_min, time_max), ordered by start time."""
+        lo, hi = time_min.timestamp(), time_max.timestamp()
+        self.ensure_fresh(lo, hi)
+        with self._lock:
+            order = self._sorted()
+            stop = bisect.bisect_left(order, (hi,))
+            events = []
+            for _, event_id in order[:stop]:
+                _, end_ts, event = self._events[event_id]
+                if end_ts > lo:
+                    events.append(event)
+            return events
+
+    def busy_intervals(self, time_min: datetime.datetime, time_max: datetime.datetime) -> list[tuple[float, float]]:
+        """Returns busy (start_ts, end_ts) epoch pairs overlapping the range, ordered by start."""
+        lo, hi = time_min.timestamp(), time_max.timestamp()
+        self.ensure_fresh(lo, hi)
+        with self._lock:
+            order = self._sorted()
+            stop = bisect.bisect_left(order, (hi,))
+            busy = []
+            for _, event_id in order[:stop]:
+                start_ts, end_ts, event = self._events[event_id]
+                if end_ts > lo and _is_busy(event):
+                    busy.append((start_ts, end_ts))
+            return busy
+
+    def _word_ids(self, word: str) -> set:
+        """Ids of events with `word` as a text token or, failing that, a token starting with it."""
+        if word in self._by_token:
+            return self._by_token[word]
+        if self._vocab is None:
+            self._vocab = sorted(self._by_token)
+        ids = set()
+        i = bisect.bisect_left(self._vocab, word)
+        while i < len(self._vocab) and self._vocab[i].startswith(word):
+            ids |= self._by_token[self._vocab[i]]
+            i += 1
+        return ids
+
+    def get(self, event_id: str):
+        """Returns the event with this ID, or None if the store does not hold it."""
+        now = self.clock()
+        self.ensure_fresh(now, now)
+        with self._lock:
+            entry = self._events.get(event_id)
+            return entry[2] if entry else None
+
+    def lookup(self, query: str = "", attendee: str = None, start: datetime.datetime = None,
+               time_min: datetime.datetime = None, limit: int = 5) -> list[dict]:
+        """
+        Finds events through the indexes, ordered by start time.
+
+        Every word of `query` must match a word of the title, location or
+        description (or, if no event has that exact word, start one), or name
+        an attendee. Every word of `attendee` must match an
+        attendee's email or name. `start` keeps events starting within that
+        minute, and `time_min` drops events that ended before it.
+        """
+        lo = time_min.timestamp() if time_min else None
+        start_ts = start.timestamp() if start else None
+        if start_ts is not None:
+            self.ensure_fresh(start_ts, start_ts + 60)
+        else:
+            now = self.clock()
+            self.ensure_fresh(lo if lo is not None else now, lo if lo is not None else now)
+        with self._lock:
+            candidates = None
+            for word in _tokens(query):
+                ids = self._word_ids(word) | self._by_attendee.get(word, set())
+                candidates = ids if candidates is None else candidates & ids
+            for word in (_tokens(attendee) | ({attendee.lower()} if '@' in attendee else set())) if attendee else ():
+                ids = self._by_attendee.get(word, set())
+                candidates = ids if candidates is None else candidates & ids
+            order = self._sorted()
+            if start_ts is not None:
+                first = bisect.bisect_left(order, (start_ts - start_ts % 60,))
+                stop = bisect.bisect_left(order, (start_ts - start_ts % 60 + 60,))
+                ids = {event_id for _, event_id in order[first:stop]}
+                candidates = ids if candidates is None else candidates & ids
+            if candidates is None:
+                ranked = [event_id for _, event_id in order]
+            else:
+                ranked = [event_id for _, event_id in sorted((self._events[i][0], i) for i in candidates)]
+            matches = []
+            for event_id in ranked:
+                _, end_ts, event = self._events[event_id]
+                if lo is not None and end_ts <= lo:
+                    continue
+                matches.append(event)
+                if len(matches) >= limit:
+                    break
+            return matches
+
+
+_stores = {}    # (user id, calendar id) -> store
+_stores_lock = threading.Lock()
+
+
+def _db_path(user_id: str):
+    if not EVENT_STORE_DB or user_id == DEFAULT_USER:
+        return EVENT_STORE_DB
+    root, ext = os.path.splitext(EVENT_STORE_DB)
+    return f"{root}-{user_file_name(user_id)}{ext}"
+
+
+def get_event_store(calendar_id='primary') -> CalendarEventStore:
+    """
+    Returns the process-wide store for a calendar of the current user (see
+    `calendar_client.use_calendar_client`), creating it on first use.
+    """
+    client = current_calendar_client()
+    with _stores_lock:
+        store = _stores.get((client.user_id, calendar_id))
+        if store is None:
+            store = CalendarEventStore(client.get_service, calendar_id, db_path=_db_path(client.user_id))
+            _stores[(client.user_id, calendar_id)] = store
+        return store
+
+
+def reset_event_stores(user_id: str = None):
+    """Drops every store, or one user's, e.g. when the signed-in account changes."""
+    with _stores_lock:
+        for key in [key for key in _stores if user_id is None or key[0] == user_id]:
+            _stores.pop(key).invalidate()
+
@@ -0,0 +1,179 @@
+# history_manager.py
+import datetime
+import json
+import re
+
+from config import HISTORY_TOKEN_BUDGET
+from logger_config import logger
+
+# Rough characters-per-token ratio used until the model reports real counts.
+CHARS_PER_TOKEN = 4
+# The most recent turns are never summarized or shrunk.
+KEEP_RECENT_TURNS = 2
+# Tool results in older turns are cut to this many characters.
+OLD_TOOL_RESULT_CHARS = 200
+# Per-turn summary lines are cut to this length, and only this many are kept.
+SUMMARY_LINE_CHARS = 160
+MAX_SUMMARY_TURNS = 20
+
+_SCHEDULE_LINE = re.compile(r"^(\d{1,2}:\d{2} [AP]M) - (\d{1,2}:\d{2} [AP]M): (.*)$")
+
+
+def estimate_tokens(content) -> int:
+    """Cheap token estimate for a history entry (dict or SDK Content)."""
+    text = json.dumps(content) if isinstance(content, dict) else str(content)
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _compact_schedule(lines):
+    compact = []
+    for line in lines:
+        match = _SCHEDULE_LINE.match(line) if isinstance(line, str) else None
+        if not match:
+            compact.append(line)
+            continue
+        start, end, title = match.groups()
+        start = datetime.datetime.strptime(start, "%I:%M %p").strftime("%H:%M")
+        end = datetime.datetime.strptime(end, "%I:%M %p").strftime("%H:%M")
+        compact.append(f"{start}-{end} {title}")
+    return compact
+
+
+def compact_tool_result(name: str, result):
+    """Rewrites a tool result into an equivalent, shorter form for the history."""
+    if name == "get_day_schedule" and isinstance(result, list):
+        return _compact_schedule(result)
+    return result
+
+
+class HistoryManager:
+    """
+    Conversation history with per-entry token accounting.
+
+    Entries are grouped into turns, each starting at a user message. Once the
+    estimated size passes `token_budget`, tool results in older turns are cut
+    down first. If that is not enough, the oldest turns are replaced by a short
+    extractive summary. Tool-call/tool-response pairs are only ever dropped
+    together, so the history stays valid. Estimates are rescaled from the
+    prompt token counts the model reports back.
+    """
+
+    def __init__(self, token_budget: int = HISTORY_TOKEN_BUDGET, keep_recent_turns: int = KEEP_RECENT_TURNS, counter=estimate_tokens):
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.counter = counter
+        self.scale = 1.0
+        self._entries = []      # dicts: content, tokens, turn, tool (True for tool responses)
+        self._summary = []
+        self._summary_tokens = 0
+        self._turn = 0
+
+    def __len__(self):
+        return len(self._entries) + (1 if self._summary else 0)
+
+    @property
+    def token_count(self) -> int:
+        """Estimated prompt tokens for the current history."""
+        return int((self._summary_tokens + sum(e["tokens"] for e in self._entries)) * self.scale)
+
+    def contents(self) -> list:
+        """The history to send to `generate_content`."""
+        contents = [e["content"] for e in self._entries]
+        if self._summary:
+            contents.insert(0, self._summary_entry())
+        return contents
+
+    def append(self, content, tool: bool = False):
+        """Adds an entry; a plain user message starts a new turn."""
+        if isinstance(content, dict) and content.get("role") == "user" and not tool:
+            self._turn += 1
+        self._entries.append({"content": content, "tokens": self.counter(content), "turn": self._turn, "tool": tool})
+        self._compact()
+
+    def add_user_message(self, text: str):
+        self.append({"role": "user", "parts": [{"text": text}]})
+
+    def add_model_message(self, text: str):
+        self.append({"role": "model", "parts": [{"text": text}]})
+
+    def add_tool_results(self, calls: list, results: list):
+        """Records one turn's tool results, compacted, as a single function-response entry."""
+        parts = [
+            {"function_response": {"name": name, "response": {"result": json.dumps(compact_tool_result(name, result))}}}
+            for (name, _), result in zip(calls, results)
+        ]
+        self.append({"role": "model", "parts": parts}, tool=True)
+
+    def discard_current_turn(self):
+        """Removes every entry of the latest turn, e.g. when the turn failed."""
+        while self._entries and self._entries[-1]["turn"] == self._turn:
+            self._entries.pop()
+        self._turn -= 1
+
+    def calibrate(self, prompt_token_count: int, extra_tokens: int = 0):
+        """Rescales estimates from the model's reported prompt size; `extra_tokens` covers the system prompt and tools."""
+        estimated = self._summary_tokens + sum(e["tokens"] for e in self._entries)
+        if prompt_token_count and estimated:
+            self.scale = max((prompt_token_count - extra_tokens) / estimated, 0.1)
+
+    # --- Compaction ---
+    def _summary_entry(self):
+        text = "Summary of the earlier conversation (older turns were condensed):\n" + "\n".join(self._summary)
+        return {"role": "user", "parts": [{"text": text}]}
+
+    def _over_budget(self) -> bool:
+        return self.token_count > self.token_budget
+
+    def _compact(self):
+        if not self._over_budget():
+            return
+        recent_from = self._turn - self.keep_recent_turns + 1
+        for entry in self._entries:
+            if entry["turn"] >= recent_from or not self._over_budget():
+                break
+            if entry["tool"] and entry["tokens"] * CHARS_PER_TOKEN > OLD_TOOL_RESULT_CHARS:
+                parts = []
+                for part in entry["content"]["parts"]:
+                    response = part["function_response"]
+                    result = response["response"]["result"]
+                    if len(result) > OLD_TOOL_RESULT_CHARS:
+                        result = result[:OLD_TOOL_RESULT_CHARS] + "...(truncated)"
+                    parts.append({"function_response": {"name": response["name"], "response": {"result": result}}})
+                entry["content"] = {"role": "model", "parts": parts}
+                entry["tokens"] = self.counter(entry["content"])
+        dropped = 0
+        while self._over_budget() and self._entries and self._entries[0]["turn"] < recent_from:
+            turn = self._entries[0]["turn"]
+            turn_entries = []
+            while self._entries and self._entries[0]["turn"] == turn:
+                turn_entries.append(self._entries.pop(0))
+            self._summarize(turn_entries)
+            dropped += 1
+        # The summary counts against the budget too; forget its oldest lines first.
+        while self._over_budget() and len(self._summary) > 1:
+            self._summary.pop(0)
+            self._summary_tokens = self.counter(self._summary_entry())
+        if dropped:
+            logger.info("History compacted: summarized %s turn(s), now ~%s tokens.", dropped, self.token_count)
+
+    def _summarize(self, turn_entries):
+        user_text, model_text, tools = "", "", []
+        for entry in turn_entries:
+            content = entry["content"]
+            if not isinstance(content, dict):
+                continue
+            texts = [part["text"] for part in content.get("parts", []) if "text" in part]
+            if entry["tool"]:
+                tools.extend(part["function_response"]["name"] for part in content["parts"])
+            elif content.get("role") == "user" and texts:
+                user_text = " ".join(texts)
+            elif texts:
+                model_text = " ".join(texts)
+        line = f"- User: {user_text}"
+        if tools:
+            line += f" | Tools: {', '.join(tools)}"
+        if model_text:
+            line += f" | Assistant: {model_text}"
+        self._summary.append(line[:SUMMARY_LINE_CHARS])
+        self._summary = self._summary[-MAX_SUMMARY_TURNS:]
+        self._summary_tokens = self.counter(self._summary_entry())
@@ -1,17 +1,183 @@
 # logger_config.py
+"""
+Application logging.
+
+Callers only pay for putting the record on a queue: `LazyQueueHandler` skips
+the formatting that the stock QueueHandler does on the calling thread, so
+%-style arguments are only rendered on the listener thread. The listener
+writes each distinct warning/error once per window, with a count of its
+repeats when the window ends, and writes JSON lines to a size-rotated file and plain text to stdout.
+
+Structured fields come from `extra=` (e.g. `duration_ms`, `prompt_tokens`)
+or from `log_context(...)`, which tags every record logged inside it, e.g.
+with the conversation ID or the tool being run.
+"""
+import atexit
+import contextlib
+import contextvars
+import datetime
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import time
+
+LOG_FILE = os.getenv("LOG_FILE", "agent.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# The log file is rotated at this size, keeping LOG_BACKUP_COUNT old files.
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "3"))
+# Identical warnings/errors repeated within this window are counted instead of written.
+DEDUP_WINDOW_SECONDS = 60
+# How often an idle listener checks for expired windows whose repeat counts are due.
+DEDUP_FLUSH_SECONDS = 1.0
+
+TEXT_FORMAT = "%(asctime)s - [%(levelname)s] - %(filename)s:%(lineno)d - %(message)s"
+# Record attributes copied into the JSON output when present.
+STRUCTURED_FIELDS = ("user_id", "conversation_id", "tool", "duration_ms", "prompt_tokens", "output_tokens", "total_tokens", "repeated")
+
+_context = contextvars.ContextVar("log_context", default={})
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Adds `fields` to every record logged in this block (and in contexts copied from it)."""
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the current `log_context` fields onto a record, on the calling thread."""
+
+    def filter(self, record):
+        for key, value in _context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueues records as they are. The stock `prepare` formats the message on
+    the calling thread so the record can be pickled; this queue never leaves
+    the process, so formatting is left to the listener.
+    """
+
+    def prepare(self, record):
+        return record
+
 
-def setup_logger():
-    """Sets up a structured logger for the application."""
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - [%(levelname)s] - %(filename)s:%(lineno)d - %(message)s",
-        handlers=[
-            logging.FileHandler("agent.log"),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "where": f"{record.filename}:{record.lineno}",
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key in STRUCTURED_FIELDS:
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class DedupingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener that writes the first of each distinct warning/error and
+    only counts its repeats for `window` seconds from then, even when other
+    records come in between. When the window expires, a "repeated N times"
+    summary is written for every message that repeated, giving the time from
+    its first occurrence to the summary (shorter than `window` when `stop`
+    ends the windows early). Expiry is checked on
+    every record and, when the queue is idle, every `flush_interval` seconds.
+    Runs on the listener thread, so the message is rendered here.
+    """
+
+    def __init__(self, log_queue, *handlers, window=DEDUP_WINDOW_SECONDS, flush_interval=DEDUP_FLUSH_SECONDS,
+                 clock=time.monotonic):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.window = window
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self._seen = {}     # key -> [first record, repeats, first seen]
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.flush_interval if block else None)
+            except queue.Empty:
+                if not block:
+                    raise
+                self._flush_repeats(self.clock())
+
+    def handle(self, record):
+        now = self.clock()
+        self._flush_repeats(now)
+        if record.levelno >= logging.WARNING:
+            key = (record.levelno, record.pathname, record.lineno, record.getMessage())
+            seen = self._seen.get(key)
+            if seen is not None:
+                seen[1] += 1
+                return
+            self._seen[key] = [record, 0, now]
+        super().handle(record)
+
+    def _flush_repeats(self, now=None):
+        """Ends the windows that expired by `now`, or all of them when `now` is None."""
+        expire_all = now is None
+        if expire_all:
+            now = self.clock()
+        for key, (first, repeats, since) in list(self._seen.items()):
+            if not expire_all and now - since < self.window:
+                continue
+            del self._seen[key]
+            if repeats:
+                summary = logging.LogRecord(first.name, first.levelno, first.pathname, first.lineno,
+                                            "Repeated %d more times in %.0fs: %s",
+                                            (repeats, now - since, first.getMessage()), None)
+                summary.repeated = repeats
+                super().handle(summary)
+
+    def stop(self):
+        super().stop()
+        self._flush_repeats()
+
+
+def setup_logger(log_file: str = LOG_FILE, stream=sys.stdout, level: str = LOG_LEVEL,
+                 max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT):
+    """Routes the root logger through a queue to a rotating JSON-lines file and `stream`."""
+    file_handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+    if stream is not None:
+        stream_handler = logging.StreamHandler(stream)
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+        handlers.append(stream_handler)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    listener = DedupingQueueListener(log_queue, *handlers)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
     return logging.getLogger(__name__)
 
-logger = setup_logger()
\ No newline at end of file
+
+logger = setup_logger()
@@ -0,0 +1,230 @@
+# metrics.py
+"""
+In-process instrumentation: counters and latency histograms with labels.
+
+`timer(name, **labels)` records `<name>_seconds` (a histogram, whose count is
+the call count) and, when the block raises, `<name>_errors_total`. Tools are
+wrapped with `track_tool`, which also counts error results, since the tools
+report failures as return values. `render_prometheus()` produces the text
+exposition format; set METRICS_PORT to serve it on /metrics.
+"""
+import bisect
+import contextlib
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from logger_config import logger
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Buckets for small counts such as model round trips per user message.
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10)
+METRICS_PORT = os.getenv("METRICS_PORT")
+_ERROR_PREFIXES = ("Error", "An error occurred", "An unexpected error occurred")
+
+
+class Histogram:
+    """Fixed-bucket histogram: per-bucket counts plus sum and count, as Prometheus keeps them."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)     # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation (the largest bound for +Inf)."""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _render_labels(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value)}"' for key, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe store of labelled counters and histograms."""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._counters = {}     # (name, label key) -> value
+        self._histograms = {}   # (name, label key) -> Histogram
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        """Times the block into `<name>_seconds`; an exception also counts in `<name>_errors_total`."""
+        started = self.clock()
+        try:
+            yield
+        except BaseException:
+            self.inc(f"{name}_errors_total", **labels)
+            raise
+        finally:
+            self.observe(f"{name}_seconds", self.clock() - started, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{_render_labels(labels)} {value:g}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_render_labels(labels, [('le', f'{bound:g}')])} {cumulative}")
+                lines.append(f"{name}_bucket{_render_labels(labels, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{name}_sum{_render_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_render_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> list[dict]:
+        """One row per timed operation for the debug panel; p50/p95 are bucket upper bounds."""
+        rows = []
+        with self._lock:
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if not name.endswith("_seconds"):
+                    continue
+                base = name[:-len("_seconds")]
+                errors = self._counters.get((f"{base}_errors_total", labels), 0)
+                rows.append({
+                    "operation": base + _render_labels(labels),
+                    "calls": histogram.count,
+                    "errors": int(errors),
+                    "error_rate": round(errors / histogram.count, 3) if histogram.count else 0.0,
+                    "mean_ms": round(histogram.sum / histogram.count * 1000, 1) if histogram.count else 0.0,
+                    "p50_ms": histogram.quantile(0.5) * 1000,
+                    "p95_ms": histogram.quantile(0.95) * 1000,
+                })
+        return rows
+
+    def counters(self) -> dict:
+        with self._lock:
+            return {name + _render_labels(labels): value for (name, labels), value in sorted(self._counters.items())}
+
+    def total(self, name: str) -> float:
+        """Sum of a counter over all its label sets."""
+        with self._lock:
+            return sum(value for (counter, _), value in self._counters.items() if counter == name)
+
+    def histogram(self, name: str, **labels):
+        with self._lock:
+            return self._histograms.get((name, _label_key(labels)))
+
+
+metrics = MetricsRegistry()
+
+
+def is_error_result(result) -> bool:
+    """True for the error strings the tools return instead of raising."""
+    if isinstance(result, list) and result:
+        result = result[0]
+    return isinstance(result, str) and result.startswith(_ERROR_PREFIXES)
+
+
+def track_tool(func):
+    """Records a tool's latency and call count under `tool_seconds{tool=...}`, and its error results."""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = metrics.clock()
+        failed = True
+        try:
+            result = func(*args, **kwargs)
+            failed = is_error_result(result)
+            return result
+        finally:
+            duration = metrics.clock() - started
+            metrics.observe("tool_seconds", duration, tool=name)
+            if failed:
+                metrics.inc("tool_errors_total", tool=name)
+            logger.info("Tool '%s' finished in %.1f ms", name, duration * 1000, extra={"duration_ms": round(duration * 1000, 1)})
+
+    return wrapper
+
+
+def profile_call(func, *args, limit: int = 30, **kwargs):
+    """Runs `func` under cProfile; returns (result, the top `limit` functions by cumulative time as text)."""
+    profiler = cProfile.Profile()
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+    finally:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        logger.info("Profiled %s", getattr(func, "__name__", func))
+    return result, out.getvalue()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serves /metrics on a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%s/metrics", host, server.server_port)
+    return server
@@ -1,25 +1,208 @@
 # Data models for smart_scheduler_v2
 
 # models.py
+import datetime
+import json
+import struct
+import sys
+import uuid
+from array import array
 from dataclasses import dataclass, field
-from typing import List, Optional
+from typing import Optional
 
-@dataclass
+import pytz
+
+SCHEMA_VERSION = 1
+_MAGIC = b"MR"
+_HEADER = struct.Struct("<2sBB")    # magic, schema version, presence bits
+_INT = struct.Struct("<q")
+_LEN = struct.Struct("<H")
+_COUNT = struct.Struct("<I")
+# The header plus the length of conversation_id, which always follows it, read in one call.
+_HEADER_AND_ID = struct.Struct("<2sBBH")
+
+# Optional fields in wire order, with their presence bit.
+_OPTIONAL_INTS = ("duration_minutes", "time_range_start", "time_range_end", "confirmed_slot_start")
+_OPTIONAL_STRS = ("user_timezone", "meeting_title")
+_TIME_FIELDS = ("time_range_start", "time_range_end", "confirmed_slot_start")
+# Built once: json.dumps with any keyword argument constructs a new encoder on every call.
+_JSON_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+def to_epoch(value) -> Optional[int]:
+    """Accepts epoch seconds (int or float) or an ISO 8601 string (as older states stored) and returns epoch seconds."""
+    if value is None or type(value) is int:
+        return value
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return _LEN.pack(len(data)) + data
+
+
+_plans = {}
+
+
+def _decode_plan(presence: int):
+    """For a presence bitmap: one Struct for all the present ints, their names, and the present strings' names."""
+    plan = _plans.get(presence)
+    if plan is None:
+        ints = [name for bit, name in enumerate(_OPTIONAL_INTS) if presence & (1 << bit)]
+        strs = [name for bit, name in enumerate(_OPTIONAL_STRS, len(_OPTIONAL_INTS)) if presence & (1 << bit)]
+        plan = _plans[presence] = (struct.Struct("<" + "q" * len(ints)), ints, strs)
+    return plan
+
+
+@dataclass(slots=True)
 class MeetingRequestState:
-    """Manages the state of a single meeting request conversation."""
-    conversation_id: str = "default_session"
+    """
+    Manages the state of a single meeting request conversation.
+
+    Times are epoch seconds; `user_timezone` is the IANA zone they are shown
+    in. `suggested_slots` is an int64 array of epoch seconds.
+
+    `to_bytes`/`from_bytes` is the compact, fast encoding. The JSON form is
+    kept for readability and older stored states; it is slower than the old
+    plain dataclass's JSON, because it copies into a fresh dict and parses
+    the slots into an array (see benchmarks/bench_models.py).
+    """
+    conversation_id: str = field(default_factory=lambda: uuid.uuid4().hex)
     duration_minutes: Optional[int] = None
-    time_range_start: Optional[str] = None
-    time_range_end: Optional[str] = None
+    time_range_start: Optional[int] = None
+    time_range_end: Optional[int] = None
     user_timezone: Optional[str] = None
-    suggested_slots: List[str] = field(default_factory=list)
-    confirmed_slot_start: Optional[str] = None
+    suggested_slots: array = field(default_factory=lambda: array("q"))
+    confirmed_slot_start: Optional[int] = None
     meeting_title: Optional[str] = None
     status: str = "needs_info" # e.g., 'needs_info', 'pending_confirmation', 'confirmed'
 
-    def to_dict(self):
-        return self.__dict__
+    def __post_init__(self):
+        # Gemini function-call args arrive as floats; the binary form needs ints.
+        for name in _OPTIONAL_INTS:
+            value = getattr(self, name)
+            if value is not None and type(value) is not int:
+                setattr(self, name, to_epoch(value) if name in _TIME_FIELDS else int(value))
+        slots = self.suggested_slots
+        if type(slots) is not array:
+            try:
+                self.suggested_slots = array("q", slots)
+            except TypeError:
+                self.suggested_slots = array("q", map(to_epoch, slots))
+
+    def isoformat(self, ts: Optional[int]) -> Optional[str]:
+        """Renders an epoch time from this state in the user's timezone."""
+        if ts is None:
+            return None
+        tz = pytz.timezone(self.user_timezone) if self.user_timezone else pytz.utc
+        return datetime.datetime.fromtimestamp(ts, tz).isoformat()
+
+    # --- JSON ---
+    def to_dict(self) -> dict:
+        """A fresh JSON-safe dict; mutating it does not touch the state."""
+        return {
+            "schema_version": SCHEMA_VERSION,
+            "conversation_id": self.conversation_id,
+            "duration_minutes": self.duration_minutes,
+            "time_range_start": self.time_range_start,
+            "time_range_end": self.time_range_end,
+            "user_timezone": self.user_timezone,
+            "suggested_slots": self.suggested_slots.tolist(),
+            "confirmed_slot_start": self.confirmed_slot_start,
+            "meeting_title": self.meeting_title,
+            "status": self.status,
+        }
 
     @classmethod
     def from_dict(cls, data):
-        return cls(**data)
\ No newline at end of file
+        """Accepts both the current layout and the older one with ISO string times."""
+        if "schema_version" in data:
+            data = dict(data)
+            cls._check_version(data.pop("schema_version"))
+        return cls(**data)
+
+    @staticmethod
+    def _check_version(version):
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"Unsupported MeetingRequestState schema version {version}")
+
+    def to_json(self) -> str:
+        return _JSON_ENCODER.encode(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text):
+        # The parsed dict is ours, so the version is popped off it rather than copied around.
+        data = json.loads(text)
+        if "schema_version" in data:
+            cls._check_version(data.pop("schema_version"))
+        return cls(**data)
+
+    # --- Binary ---
+    def to_bytes(self) -> bytes:
+        """
+        Compact, schema-versioned binary form: a header with presence bits, then
+        the fields in a fixed order. Strings are length-prefixed UTF-8, ints are
+        little-endian int64, and the slots are a count plus the raw int64 array.
+        """
+        presence = 0
+        parts = [None, _pack_str(self.conversation_id)]
+        for bit, name in enumerate(_OPTIONAL_INTS + _OPTIONAL_STRS):
+            value = getattr(self, name)
+            if value is None:
+                continue
+            presence |= 1 << bit
+            parts.append(_INT.pack(value) if name in _OPTIONAL_INTS else _pack_str(value))
+        parts.append(_pack_str(self.status))
+        slots = self.suggested_slots
+        if sys.byteorder == "big":
+            slots = array("q", slots)
+            slots.byteswap()
+        parts.append(_COUNT.pack(len(slots)))
+        parts.append(slots.tobytes())
+        parts[0] = _HEADER.pack(_MAGIC, SCHEMA_VERSION, presence)
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Raises ValueError for anything that is not a complete serialized state."""
+        try:
+            return cls._decode(bytes(data))
+        except (struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"Truncated or corrupt MeetingRequestState: {e}") from None
+
+    @classmethod
+    def _decode(cls, data: bytes):
+        magic, version, presence, length = _HEADER_AND_ID.unpack_from(data, 0)
+        if magic != _MAGIC:
+            raise ValueError("Not a serialized MeetingRequestState")
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"Unsupported MeetingRequestState schema version {version}")
+        ints, int_names, str_names = _decode_plan(presence)
+        # Fields are set directly: the encoded values are already normalized, so __post_init__ has nothing to do.
+        state = object.__new__(cls)
+        offset = _HEADER_AND_ID.size + length
+        state.conversation_id = data[_HEADER_AND_ID.size:offset].decode("utf-8")
+        state.duration_minutes = state.time_range_start = state.time_range_end = state.confirmed_slot_start = None
+        state.user_timezone = state.meeting_title = None
+        for name, value in zip(int_names, ints.unpack_from(data, offset)):
+            setattr(state, name, value)
+        offset += ints.size
+        for name in str_names:
+            (length,) = _LEN.unpack_from(data, offset)
+            offset += _LEN.size + length
+            setattr(state, name, data[offset - length:offset].decode("utf-8"))
+        (length,) = _LEN.unpack_from(data, offset)
+        offset += _LEN.size + length
+        state.status = data[offset - length:offset].decode("utf-8")
+        (count,) = _COUNT.unpack_from(data, offset)
+        offset += _COUNT.size
+        if len(data) - offset != count * _INT.size:
+            raise ValueError(f"MeetingRequestState holds {len(data) - offset} bytes of slots, expected {count * _INT.size}")
+        slots = array("q")
+        slots.frombytes(data[offset:])
+        if sys.byteorder == "big":
+            slots.byteswap()
+        state.suggested_slots = slots
+        return state
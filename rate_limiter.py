@@ -0,0 +1,226 @@
+# rate_limiter.py
+import random
+import re
+import threading
+import time
+import weakref
+from dataclasses import dataclass
+
+from logger_config import logger
+
+# Gemini free-tier defaults; override per deployment.
+GEMINI_REQUESTS_PER_MINUTE = 15
+GEMINI_INPUT_TOKENS_PER_MINUTE = 1_000_000
+GEMINI_REQUESTS_PER_DAY = 1500
+# Calendar API default per-user quota is 600 requests/minute.
+CALENDAR_REQUESTS_PER_MINUTE = 600
+
+MAX_RETRIES = 5
+BASE_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+# A caller never waits longer than this for capacity before getting a RateLimitExceeded.
+MAX_QUEUE_WAIT_SECONDS = 120.0
+
+_RETRY_DELAY = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request cannot get quota within its wait limit or runs out of retries."""
+
+
+class SystemClock:
+    """Real time source; tests swap in a fake with the same two methods."""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` tokens, refilled continuously over `period` seconds."""
+
+    def __init__(self, name: str, capacity: float, period: float, clock):
+        self.name = name
+        self.capacity = capacity
+        self.period = period
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock.monotonic()
+        self.throttled = 0
+
+    def _refill(self):
+        now = self.clock.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / self.period)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * self.period / self.capacity
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def drain(self):
+        """Empties the bucket, e.g. after the server reported this quota exhausted."""
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+
+    def snapshot(self) -> dict:
+        self._refill()
+        return {"capacity": self.capacity, "period_seconds": self.period, "available": round(self.tokens, 2), "throttled": self.throttled}
+
+
+@dataclass
+class RetryPolicy:
+    max_retries: int = MAX_RETRIES
+    base_backoff: float = BASE_BACKOFF_SECONDS
+    max_backoff: float = MAX_BACKOFF_SECONDS
+
+    def backoff(self, attempt: int, hint: float = None) -> float:
+        """Full-jitter exponential backoff, never shorter than a server retry hint."""
+        delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+        return max(delay, hint) if hint else delay
+
+
+def _retry_hint(error) -> float:
+    """Extracts a server-provided retry delay in seconds from an exception, if any."""
+    resp = getattr(error, "resp", None)
+    if resp is not None and resp.get("retry-after", "").isdigit():
+        return float(resp["retry-after"])
+    match = _RETRY_DELAY.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+def _is_retryable(error) -> bool:
+    """429s and transient 5xx errors from either the Gemini SDK or googleapiclient."""
+    status = getattr(getattr(error, "resp", None), "status", None) or getattr(error, "code", None)
+    if isinstance(status, int):
+        return status == 429 or 500 <= status < 600
+    name = type(error).__name__
+    return name in ("ResourceExhausted", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "TooManyRequests")
+
+
+class RateLimiter:
+    """
+    Client-side quota guard for one API.
+
+    Each quota dimension (requests/minute, input tokens/minute, requests/day)
+    is a token bucket. `call` queues the caller until every bucket has room,
+    then runs the function with jittered exponential retries on 429/5xx that
+    respect server retry hints. A 429 also drains the buckets so other callers
+    back off instead of hitting the same wall. `stats()` exposes the state.
+    """
+
+    def __init__(self, name: str, limits: dict, clock=None, policy: RetryPolicy = None, max_wait: float = MAX_QUEUE_WAIT_SECONDS):
+        self.name = name
+        self.clock = clock or SystemClock()
+        self.policy = policy or RetryPolicy()
+        self.max_wait = max_wait
+        self.buckets = {dim: TokenBucket(dim, capacity, period, self.clock) for dim, (capacity, period) in limits.items()}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.queued_seconds = 0.0
+
+    def acquire(self, cost: dict = None):
+        """Blocks until every bucket can pay `cost` (default: one request), then pays it."""
+        cost = cost or {}
+        waited = 0.0
+        while True:
+            with self._lock:
+                needed = {dim: cost.get(dim, 1 if dim.startswith("requests") else 0) for dim in self.buckets}
+                delay = max(bucket.wait_time(needed[dim]) for dim, bucket in self.buckets.items())
+                if delay <= 0:
+                    for dim, bucket in self.buckets.items():
+                        bucket.take(needed[dim])
+                    self.queued_seconds += waited
+                    return
+                for dim, bucket in self.buckets.items():
+                    if bucket.wait_time(needed[dim]) > 0:
+                        bucket.throttled += 1
+            if waited + delay > self.max_wait:
+                raise RateLimitExceeded(f"{self.name}: no quota available within {self.max_wait}s")
+            self.clock.sleep(delay)
+            waited += delay
+
+    def call(self, func, *args, cost: dict = None, **kwargs):
+        """Runs `func(*args, **kwargs)` under the limiter with retries."""
+        attempt = 0
+        while True:
+            self.acquire(cost)
+            with self._lock:
+                self.calls += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not _is_retryable(e):
+                    raise
+                hint = _retry_hint(e)
+                if getattr(getattr(e, "resp", None), "status", None) == 429 or getattr(e, "code", None) == 429:
+                    # The server says a short-window quota is gone; make every caller wait for the refill.
+                    # Daily buckets are left alone so one burst does not stall the process for hours.
+                    with self._lock:
+                        for bucket in self.buckets.values():
+                            if bucket.period <= 60:
+                                bucket.drain()
+                if attempt >= self.policy.max_retries:
+                    with self._lock:
+                        self.failures += 1
+                    raise RateLimitExceeded(f"{self.name}: giving up after {attempt + 1} attempts: {e}") from e
+                delay = self.policy.backoff(attempt, hint)
+                logger.warning("%s call failed (%s), retry %s in %.1fs", self.name, type(e).__name__, attempt + 1, delay)
+                with self._lock:
+                    self.retries += 1
+                self.clock.sleep(delay)
+                attempt += 1
+
+    def stats(self) -> dict:
+        """Point-in-time view of the buckets and counters."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "queued_seconds": round(self.queued_seconds, 3),
+                "buckets": {dim: bucket.snapshot() for dim, bucket in self.buckets.items()},
+            }
+
+
+gemini_limiter = RateLimiter("gemini", {
+    "requests_per_minute": (GEMINI_REQUESTS_PER_MINUTE, 60),
+    "input_tokens_per_minute": (GEMINI_INPUT_TOKENS_PER_MINUTE, 60),
+    "requests_per_day": (GEMINI_REQUESTS_PER_DAY, 86400),
+})
+_calendar_limiters = weakref.WeakSet()
+
+
+def new_calendar_limiter() -> RateLimiter:
+    """
+    A limiter for one user's Calendar client. The quota is per user, so each
+    client gets its own: one user's load or 429 backoff never throttles another.
+    """
+    limiter = RateLimiter("calendar", {
+        "requests_per_minute": (CALENDAR_REQUESTS_PER_MINUTE, 60),
+    })
+    _calendar_limiters.add(limiter)
+    return limiter
+
+
+def limiter_stats() -> dict:
+    """Inspection API: the Gemini limiter's state, and the counters summed over every live Calendar limiter."""
+    calendar = {"limiters": 0, "calls": 0, "retries": 0, "failures": 0, "queued_seconds": 0.0}
+    for limiter in list(_calendar_limiters):
+        stats = limiter.stats()
+        calendar["limiters"] += 1
+        for key in ("calls", "retries", "failures", "queued_seconds"):
+            calendar[key] += stats[key]
+    calendar["queued_seconds"] = round(calendar["queued_seconds"], 3)
+    return {gemini_limiter.name: gemini_limiter.stats(), "calendar": calendar}
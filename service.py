@@ -0,0 +1,239 @@
+# service.py
+"""
+The backend the UI calls into for every message, shared by all sessions.
+
+Turns run on a bounded pool of worker threads, each under its user's Calendar
+client (`calendar_client.CalendarClientCache`), so users' credentials, event
+stores and cached tool results stay apart. Queued turns are kept per user and
+dispatched round-robin across users, and only one turn per user runs at a
+time, so a busy user cannot starve the others and two turns never mutate the
+same conversation history at once (e.g. when a Streamlit rerun abandons a
+waiting `respond` and sends the next message while the worker still runs).
+
+Overload is answered right away instead of stalling sessions: `submit` raises
+ServiceBusy when the queue is full, when the user already has
+`max_pending_per_user` turns in flight, or when the expected wait (queued
+turns per worker times the recent mean turn time) is longer than `max_wait`.
+A turn that still ends up waiting longer than that fails with ServiceBusy
+instead of starting late.
+
+Callbacks (the streaming reply, `on_tool_calls`) never run on a worker: their
+calls are queued and `respond` runs them on the calling thread while it
+waits, so UI code stays on the thread that owns the page. A turn submitted
+with `profile=True` runs under cProfile on its worker, and the stats come back
+as `TurnResult.profile`. The Calendar client
+is imported on first use, so the app can import this module before it paints.
+"""
+import collections
+import contextvars
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from logger_config import log_context, logger
+from metrics import COUNT_BUCKETS, metrics, profile_call
+
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "8"))
+SERVICE_MAX_QUEUE = int(os.getenv("SERVICE_MAX_QUEUE", "64"))
+SERVICE_MAX_WAIT_SECONDS = float(os.getenv("SERVICE_MAX_WAIT_SECONDS", "20"))
+MAX_PENDING_PER_USER = int(os.getenv("SERVICE_MAX_PENDING_PER_USER", "4"))
+# Turn time assumed when predicting waits until a turn has been measured,
+# and the weight of the latest turn in the running mean after that.
+INITIAL_TURN_SECONDS = 2.0
+TURN_TIME_SMOOTHING = 0.2
+
+_DONE = object()
+
+
+class ServiceBusy(Exception):
+    """Raised when a turn is refused, or given up, because it could not start within the wait limit."""
+
+
+class _Relay:
+    """Stands in for an object whose methods must run on the caller's thread: calls are queued for it."""
+
+    def __init__(self, target, calls: queue.Queue):
+        self._target = target
+        self._calls = calls
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+        return lambda *args, **kwargs: self._calls.put((value, args, kwargs))
+
+
+@dataclass
+class Turn:
+    """One submitted message. `future` holds the agent's TurnResult or the exception it raised."""
+    user_id: str
+    history: object
+    prompt: str
+    reply: object
+    on_tool_calls: object
+    context: contextvars.Context
+    submitted: float
+    profile: bool = False
+    future: Future = field(default_factory=Future)
+    calls: queue.Queue = field(default_factory=queue.Queue)
+
+
+class SchedulerService:
+    """Runs agent turns for many users on a bounded, fair worker pool; see the module docstring."""
+
+    def __init__(self, agent, clients=None, workers: int = SERVICE_WORKERS,
+                 max_queue: int = SERVICE_MAX_QUEUE, max_pending_per_user: int = MAX_PENDING_PER_USER,
+                 max_wait: float = SERVICE_MAX_WAIT_SECONDS, clock=time.monotonic):
+        if clients is None:
+            from calendar_client import CalendarClientCache
+            clients = CalendarClientCache()
+        self.agent = agent
+        self.clients = clients
+        self.max_queue = max_queue
+        self.max_pending_per_user = max_pending_per_user
+        self.max_wait = max_wait
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._queues = collections.OrderedDict()   # user id -> deque of turns, in round-robin order
+        self._pending = collections.Counter()      # user id -> turns queued or running
+        self._running = set()                      # user ids with a turn running
+        self._queued = 0
+        self._turn_seconds = INITIAL_TURN_SECONDS   # smoothed turn time
+        self._closed = False
+        self._workers = [threading.Thread(target=self._work, name=f"service-{i}", daemon=True) for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    # --- Admission ---
+    def _refuse(self, reason: str, message: str):
+        metrics.inc("service_rejections_total", reason=reason)
+        logger.warning("Turn refused (%s): %s", reason, message)
+        raise ServiceBusy(message)
+
+    def submit(self, user_id: str, history, prompt: str, reply=None, on_tool_calls=None, profile: bool = False) -> Turn:
+        """Queues one message for `user_id`, or raises ServiceBusy at once if it could not start in time."""
+        turn = Turn(user_id, history, prompt, reply, on_tool_calls, contextvars.copy_context(), self.clock(), profile)
+        with self._cond:
+            if self._closed:
+                raise ServiceBusy("The service is shutting down.")
+            if self._pending[user_id] >= self.max_pending_per_user:
+                self._refuse("user_limit", f"{self._pending[user_id]} of your messages are still being handled.")
+            if self._queued >= self.max_queue:
+                self._refuse("queue_full", f"{self._queued} messages are already waiting.")
+            expected = self._queued / len(self._workers) * self._turn_seconds
+            if expected > self.max_wait:
+                self._refuse("expected_wait", f"The expected wait is {expected:.0f}s.")
+            self._queues.setdefault(user_id, collections.deque()).append(turn)
+            self._pending[user_id] += 1
+            self._queued += 1
+            metrics.observe("service_queue_depth", self._queued, buckets=COUNT_BUCKETS)
+            self._cond.notify()
+        turn.future.add_done_callback(lambda _: turn.calls.put(_DONE))
+        return turn
+
+    def respond(self, user_id: str, history, prompt: str, reply=None, on_tool_calls=None, profile: bool = False):
+        """
+        Same contract as `Agent.respond`, run on the pool for `user_id`. Blocks
+        until the turn ends, running its callbacks on this thread meanwhile.
+        Raises ServiceBusy when the turn is refused or waited too long.
+        """
+        turn = self.submit(user_id, history, prompt, reply, on_tool_calls, profile)
+        while (call := turn.calls.get()) is not _DONE:
+            method, args, kwargs = call
+            method(*args, **kwargs)
+        return turn.future.result()
+
+    # --- Workers ---
+    def _next_turn(self):
+        """The oldest turn of the first user in round-robin order with nothing running; caller holds the lock."""
+        for user_id, turns in self._queues.items():
+            if user_id in self._running:
+                continue
+            turn = turns.popleft()
+            del self._queues[user_id]
+            if turns:
+                self._queues[user_id] = turns   # back of the line
+            self._queued -= 1
+            self._running.add(user_id)
+            return turn
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while (turn := self._next_turn()) is None:
+                    if self._closed:
+                        return
+                    self._cond.wait()
+            started = self.clock()
+            waited = started - turn.submitted
+            metrics.observe("service_queue_wait_seconds", waited)
+            try:
+                if waited > self.max_wait:
+                    metrics.inc("service_rejections_total", reason="waited_too_long")
+                    turn.future.set_exception(ServiceBusy(f"Your message waited {waited:.0f}s without starting."))
+                elif turn.future.set_running_or_notify_cancel():
+                    try:
+                        turn.future.set_result(turn.context.run(self._run, turn))
+                    except BaseException as e:
+                        turn.future.set_exception(e)
+            finally:
+                duration = self.clock() - started
+                with self._cond:
+                    self._running.discard(turn.user_id)
+                    self._pending[turn.user_id] -= 1
+                    if not self._pending[turn.user_id]:
+                        del self._pending[turn.user_id]
+                    if waited <= self.max_wait:
+                        self._turn_seconds += TURN_TIME_SMOOTHING * (duration - self._turn_seconds)
+                    self._cond.notify_all()
+
+    def _run(self, turn: Turn):
+        """
+        One turn on a worker, under the user's Calendar client; runs in a copy of
+        the submitter's context. Raises CalendarAuthRequired at once when the
+        user has no token, instead of starting an OAuth flow on the worker.
+        """
+        from calendar_client import CalendarAuthRequired, use_calendar_client
+        client = self.clients.get(turn.user_id)
+        if not client.has_token():
+            # Getting one needs the user in a browser; a worker must not wait for that.
+            raise CalendarAuthRequired(f"User '{turn.user_id}' has not granted Calendar access yet.")
+        reply = _Relay(turn.reply, turn.calls) if turn.reply is not None else None
+        on_tool_calls = None
+        if turn.on_tool_calls is not None:
+            on_tool_calls = lambda calls: turn.calls.put((turn.on_tool_calls, (calls,), {}))  # noqa: E731
+        with use_calendar_client(client), log_context(user_id=turn.user_id), \
+                metrics.timer("service_turn"):
+            if not turn.profile:
+                return self.agent.respond(turn.history, turn.prompt, reply, on_tool_calls=on_tool_calls)
+            result, result.profile = profile_call(self.agent.respond, turn.history, turn.prompt, reply, on_tool_calls=on_tool_calls)
+            return result
+
+    # --- Inspection and shutdown ---
+    def stats(self) -> dict:
+        """Point-in-time view of the pool and the queue."""
+        with self._cond:
+            return {
+                "workers": len(self._workers),
+                "queued": self._queued,
+                "running": len(self._running),
+                "users": len(self._pending),
+                "mean_turn_seconds": round(self._turn_seconds, 3),
+            }
+
+    def close(self):
+        """Refuses new turns, fails the queued ones with ServiceBusy and lets the workers exit."""
+        with self._cond:
+            self._closed = True
+            dropped = [turn for turns in self._queues.values() for turn in turns]
+            self._queues.clear()
+            self._queued = 0
+            for turn in dropped:
+                self._pending[turn.user_id] -= 1
+            self._cond.notify_all()
+        for turn in dropped:
+            turn.future.set_exception(ServiceBusy("The service is shutting down."))
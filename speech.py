@@ -0,0 +1,331 @@
+# speech.py
+"""
+Speech-to-text off the Streamlit script thread.
+
+`start_transcription(wav_bytes)` returns a TranscriptionJob at once. On a
+worker thread the WAV is decoded and resampled a chunk at a time and fed to a
+backend, and the transcript so far is published as `job.partial` while the
+rest of the clip is still being processed.
+
+Backends are chosen by name (SPEECH_BACKEND, default "google"):
+- "google": Google Web Speech through SpeechRecognition. The clip is cut into
+  segments at pauses and the segments are sent concurrently, so network time
+  does not grow with the length of the clip.
+- "vosk": offline, with a local Kaldi model (`pip install vosk`, and
+  VOSK_MODEL_PATH pointing at an unpacked model). Streams natively.
+- "sphinx": offline CMU PocketSphinx through SpeechRecognition
+  (`pip install pocketsphinx`).
+"""
+import contextvars
+import io
+import json
+import os
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from logger_config import logger
+from metrics import metrics
+
+SPEECH_BACKEND = os.getenv("SPEECH_BACKEND", "google")
+SPEECH_LANGUAGE = os.getenv("SPEECH_LANGUAGE", "en-US")
+VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH")
+# Rate the backends are fed at; every engine here works at 16 kHz.
+TARGET_SAMPLE_RATE = 16000
+# Input decoded per step.
+CHUNK_SECONDS = 0.5
+# Segment length for the request-per-segment backends. A segment is cut at the
+# quietest SILENCE_FRAME_SECONDS frame in its last SEGMENT_SEARCH_SECONDS.
+SEGMENT_SECONDS = 5.0
+SEGMENT_SEARCH_SECONDS = 1.5
+SILENCE_FRAME_SECONDS = 0.05
+# Segments quieter than this RMS (on the int16 scale) are not sent at all.
+SILENCE_RMS = 200
+MAX_PARALLEL_SEGMENTS = 4
+MAX_JOBS = 4
+
+# Jobs wait on segment requests, so the two run on separate pools.
+_job_pool = ThreadPoolExecutor(max_workers=MAX_JOBS, thread_name_prefix="stt")
+_segment_pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL_SEGMENTS, thread_name_prefix="stt-segment")
+
+
+class TranscriptionError(Exception):
+    """The audio could not be transcribed: nothing intelligible, or the engine failed."""
+
+
+# --- Decoding ---
+
+def _to_float(frames: bytes, width: int, channels: int) -> np.ndarray:
+    """PCM frames as mono float32 in [-1, 1]."""
+    if width == 1:
+        samples = (np.frombuffer(frames, np.uint8).astype(np.float32) - 128) / 128
+    elif width == 3:
+        raw = np.frombuffer(frames, np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) | raw[:, 1].astype(np.int32) << 8 | raw[:, 2].astype(np.int8).astype(np.int32) << 16) / float(2 ** 23)
+    else:
+        samples = np.frombuffer(frames, {2: np.int16, 4: np.int32}[width]) / float(2 ** (8 * width - 1))
+    samples = samples.astype(np.float32, copy=False)
+    return samples.reshape(-1, channels).mean(axis=1) if channels > 1 else samples
+
+
+class Resampler:
+    """
+    Streaming linear-interpolation resampler. The read position and the input
+    it still needs are carried across chunks, so chunked output matches a
+    one-shot conversion. When downsampling, a moving average over one output
+    period (also carried across chunks) keeps the worst aliasing out.
+    """
+
+    def __init__(self, in_rate: int, out_rate: int):
+        self.step = in_rate / out_rate
+        self.width = int(self.step) if self.step >= 2 else 1
+        self._history = np.zeros(self.width - 1, np.float32)
+        self._tail = np.empty(0, np.float32)
+        self._pos = 0.0     # position of the next output sample within tail + new input
+
+    def _smooth(self, samples: np.ndarray) -> np.ndarray:
+        if self.width == 1:
+            return samples
+        x = np.concatenate([self._history, samples])
+        self._history = x[len(x) - (self.width - 1):]
+        sums = np.concatenate([[0.0], np.cumsum(x, dtype=np.float64)])
+        return ((sums[self.width:] - sums[:-self.width]) / self.width).astype(np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.step == 1:
+            return samples
+        x = np.concatenate([self._tail, self._smooth(samples)])
+        count = int((len(x) - 1 - self._pos) // self.step) + 1 if len(x) - 1 >= self._pos else 0
+        positions = self._pos + self.step * np.arange(count)
+        out = np.interp(positions, np.arange(len(x)), x).astype(np.float32)
+        next_pos = self._pos + self.step * count
+        keep = min(int(next_pos), len(x))
+        self._tail = x[keep:]
+        self._pos = next_pos - keep
+        return out
+
+
+def clip_seconds(wav_bytes: bytes) -> float:
+    """Length of a WAV clip, read from its header."""
+    with wave.open(io.BytesIO(wav_bytes)) as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def iter_pcm_chunks(wav_bytes: bytes, sample_rate: int = TARGET_SAMPLE_RATE, chunk_seconds: float = CHUNK_SECONDS):
+    """
+    Yields the clip as mono int16 arrays at `sample_rate`, decoding
+    `chunk_seconds` of input at a time. BytesIO shares the memory of a bytes
+    object until written to, so the recording is read in place, never copied whole.
+    """
+    with wave.open(io.BytesIO(wav_bytes)) as wav:
+        width, channels, rate = wav.getsampwidth(), wav.getnchannels(), wav.getframerate()
+        resampler = Resampler(rate, sample_rate)
+        frames_per_chunk = max(int(rate * chunk_seconds), 1)
+        while True:
+            frames = wav.readframes(frames_per_chunk)
+            if not frames:
+                return
+            out = resampler.process(_to_float(frames, width, channels))
+            if len(out):
+                yield np.clip(out * 32768, -32768, 32767).astype(np.int16)
+
+
+def split_segments(chunks, sample_rate: int = TARGET_SAMPLE_RATE, segment_seconds: float = SEGMENT_SECONDS):
+    """Regroups int16 chunks into segments of about `segment_seconds`, cut at pauses."""
+    target = int(segment_seconds * sample_rate)
+    frame = max(int(SILENCE_FRAME_SECONDS * sample_rate), 1)
+    search = int(SEGMENT_SEARCH_SECONDS * sample_rate)
+    pending, size = [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size < target + search:
+            continue
+        buffer = np.concatenate(pending)
+        while len(buffer) >= target + search:
+            window = buffer[target - search:target + search].astype(np.float32)
+            frames = window[:len(window) // frame * frame].reshape(-1, frame)
+            cut = target - search + int(np.argmin((frames ** 2).mean(axis=1))) * frame + frame // 2
+            yield buffer[:cut]
+            buffer = buffer[cut:]
+        pending, size = [buffer], len(buffer)
+    if size:
+        yield np.concatenate(pending)
+
+
+def _is_silent(pcm: np.ndarray) -> bool:
+    return not len(pcm) or float(np.sqrt((pcm.astype(np.float32) ** 2).mean())) < SILENCE_RMS
+
+
+# --- Backends ---
+
+class TranscriptionBackend:
+    """Turns mono int16 PCM at `sample_rate` into text as the audio arrives."""
+
+    name = "base"
+    sample_rate = TARGET_SAMPLE_RATE
+
+    def stream(self, chunks):
+        """Consumes int16 chunks; yields the transcript so far whenever it grows. The last value is final."""
+        raise NotImplementedError
+
+
+class SegmentedBackend(TranscriptionBackend):
+    """
+    For engines that take one utterance per call: segments are transcribed on
+    a pool, up to `max_parallel` at once, and joined in order as they finish.
+    """
+
+    max_parallel = MAX_PARALLEL_SEGMENTS
+
+    def transcribe_segment(self, pcm: np.ndarray) -> str:
+        """Text for one segment; "" when nothing intelligible was said."""
+        raise NotImplementedError
+
+    def stream(self, chunks):
+        futures, texts = [], []
+        slots = threading.BoundedSemaphore(self.max_parallel)
+
+        def run(pcm):
+            try:
+                return self.transcribe_segment(pcm)
+            finally:
+                slots.release()
+
+        for segment in split_segments(chunks, self.sample_rate):
+            if _is_silent(segment):
+                continue
+            slots.acquire()
+            futures.append(_segment_pool.submit(contextvars.copy_context().run, run, segment))
+            grown = False
+            while len(texts) < len(futures) and futures[len(texts)].done():
+                texts.append(futures[len(texts)].result())
+                grown = True
+            if grown:
+                yield " ".join(t for t in texts if t)
+        for future in futures[len(texts):]:
+            texts.append(future.result())
+            yield " ".join(t for t in texts if t)
+
+
+class GoogleBackend(SegmentedBackend):
+    name = "google"
+
+    def __init__(self, language: str = SPEECH_LANGUAGE):
+        self.language = language
+
+    def transcribe_segment(self, pcm):
+        import speech_recognition as sr
+        try:
+            return sr.Recognizer().recognize_google(sr.AudioData(pcm.tobytes(), self.sample_rate, 2), language=self.language)
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            raise TranscriptionError(f"Speech service error: {e}") from e
+
+
+class SphinxBackend(SegmentedBackend):
+    name = "sphinx"
+    max_parallel = 1    # CPU-bound; more threads would only contend
+
+    def __init__(self, language: str = SPEECH_LANGUAGE):
+        self.language = language
+
+    def transcribe_segment(self, pcm):
+        import speech_recognition as sr
+        try:
+            return sr.Recognizer().recognize_sphinx(sr.AudioData(pcm.tobytes(), self.sample_rate, 2), language=self.language)
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            raise TranscriptionError(f"PocketSphinx is not available: {e}") from e
+
+
+class VoskBackend(TranscriptionBackend):
+    name = "vosk"
+    _models = {}
+    _models_lock = threading.Lock()
+
+    def __init__(self, model_path: str = VOSK_MODEL_PATH):
+        if not model_path:
+            raise TranscriptionError("Set VOSK_MODEL_PATH to an unpacked Vosk model to use offline transcription.")
+        self.model_path = model_path
+
+    def _model(self):
+        # Loading a model takes seconds and hundreds of MB; keep one per path.
+        with self._models_lock:
+            if self.model_path not in self._models:
+                try:
+                    import vosk
+                except ImportError as e:
+                    raise TranscriptionError("Offline transcription needs the 'vosk' package.") from e
+                vosk.SetLogLevel(-1)
+                self._models[self.model_path] = vosk.Model(self.model_path)
+            return self._models[self.model_path]
+
+    def stream(self, chunks):
+        import vosk
+        recognizer = vosk.KaldiRecognizer(self._model(), self.sample_rate)
+        final = []
+        for chunk in chunks:
+            if recognizer.AcceptWaveform(chunk.tobytes()):
+                final.append(json.loads(recognizer.Result()).get("text", ""))
+                yield " ".join(t for t in final if t)
+            else:
+                partial = json.loads(recognizer.PartialResult()).get("partial", "")
+                yield " ".join(t for t in final + [partial] if t)
+        final.append(json.loads(recognizer.FinalResult()).get("text", ""))
+        yield " ".join(t for t in final if t)
+
+
+BACKENDS = {"google": GoogleBackend, "sphinx": SphinxBackend, "vosk": VoskBackend}
+
+
+def get_backend(name: str = SPEECH_BACKEND) -> TranscriptionBackend:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise TranscriptionError(f"Unknown speech backend '{name}'. Choose one of: {', '.join(BACKENDS)}.") from None
+
+
+# --- Jobs ---
+
+class TranscriptionJob:
+    """One clip being transcribed in the background. `partial` is the transcript so far."""
+
+    def __init__(self, wav_bytes: bytes, backend: TranscriptionBackend):
+        self.backend = backend
+        self.partial = ""
+        self.started = time.perf_counter()
+        self.first_partial_at = None
+        # Copy the caller's context so the worker's records carry e.g. the conversation ID.
+        self._future = _job_pool.submit(contextvars.copy_context().run, self._run, wav_bytes)
+
+    def _run(self, wav_bytes: bytes) -> str:
+        text = ""
+        with metrics.timer("speech_recognition", engine=self.backend.name):
+            for text in self.backend.stream(iter_pcm_chunks(wav_bytes, self.backend.sample_rate)):
+                if text and self.first_partial_at is None:
+                    self.first_partial_at = time.perf_counter()
+                self.partial = text
+        duration = time.perf_counter() - self.started
+        logger.info("Transcribed %.1f s of audio with %s in %.0f ms", clip_seconds(wav_bytes), self.backend.name, duration * 1000,
+                    extra={"duration_ms": round(duration * 1000, 1)})
+        if not text.strip():
+            raise TranscriptionError("Could not understand the audio.")
+        return text.strip()
+
+    def done(self) -> bool:
+        return self._future.done()
+
+    def result(self, timeout: float = None) -> str:
+        """The final transcript; raises TranscriptionError if there is none."""
+        return self._future.result(timeout)
+
+
+def start_transcription(wav_bytes: bytes, backend: TranscriptionBackend = None) -> TranscriptionJob:
+    """Starts transcribing a WAV clip on a worker thread and returns immediately."""
+    return TranscriptionJob(wav_bytes, backend or get_backend())
@@ -1,36 +1,287 @@
 # state_manager.py
+import contextlib
 import json
 import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
 from models import MeetingRequestState
 from logger_config import logger
 
-STATE_FILE = "conversation_state.json"
+STATE_DB = "conversation_state.db"
+STATE_JOURNAL = "conversation_state.jsonl"
+# Sessions kept by the in-memory LRU store.
+MEMORY_CAPACITY = 10_000
+# The journal is rewritten once it holds this many lines per live session.
+JOURNAL_COMPACT_RATIO = 4
+JOURNAL_MIN_COMPACT_LINES = 1000
+# Conversations whose last saved fields are remembered for incremental saves;
+# a forgotten one is saved in full next time.
+WRITTEN_CAPACITY = 10_000
+# Stored with every conversation and bumped by every save, so a writer can tell
+# that someone else (e.g. another process on the same database) saved in between.
+VERSION_FIELD = "_version"
+
+
+def _encode(state: MeetingRequestState) -> dict:
+    """Field name -> JSON text, so changed fields can be found by string comparison."""
+    return {key: json.dumps(value) for key, value in state.to_dict().items()}
+
+
+class StateStore:
+    """
+    Storage backend for conversation states, keyed by `conversation_id`.
+
+    Subclasses implement `_read`, `_write` and `_delete`. Saves are
+    incremental: the store remembers what it last wrote for each conversation
+    (for the WRITTEN_CAPACITY most recent ones) and only passes the changed
+    fields to `_write`. Each conversation also stores a version that every save
+    bumps. If the stored version is not the one this store last wrote or read,
+    another writer got in between, and the save writes every field instead of
+    a diff against a stale copy.
+    """
+
+    def __init__(self, written_capacity: int = WRITTEN_CAPACITY):
+        self._lock = threading.Lock()
+        self.written_capacity = written_capacity
+        self._written = OrderedDict()   # conversation_id -> (version, {field: json text} as last persisted)
+
+    def _read(self, conversation_id: str):
+        """Returns {field: json text} or None."""
+        raise NotImplementedError
+
+    def _write(self, conversation_id: str, changes: dict):
+        """Persists the changed {field: json text} pairs; runs inside `_transaction`."""
+        raise NotImplementedError
+
+    def _delete(self, conversation_id: str):
+        raise NotImplementedError
+
+    def _stored_version(self, conversation_id: str):
+        """The version currently stored for the conversation, or None."""
+        fields = self._read(conversation_id)
+        return int(fields[VERSION_FIELD]) if fields and VERSION_FIELD in fields else None
+
+    def _transaction(self):
+        """Makes the version check and the write atomic against other writers."""
+        return contextlib.nullcontext()
+
+    def _remember(self, conversation_id: str, version, fields: dict):
+        self._written[conversation_id] = (version, fields)
+        self._written.move_to_end(conversation_id)
+        while len(self._written) > self.written_capacity:
+            self._written.popitem(last=False)
+
+    def save(self, state: MeetingRequestState) -> int:
+        """Saves the fields that changed since the last save; returns how many were written."""
+        encoded = _encode(state)
+        with self._lock, self._transaction():
+            stored = self._stored_version(state.conversation_id)
+            known = self._written.get(state.conversation_id)
+            if known is None or known[0] != stored:
+                changes = encoded
+            else:
+                changes = {key: value for key, value in encoded.items() if known[1].get(key) != value}
+            if changes:
+                version = (stored or 0) + 1
+                self._write(state.conversation_id, {**changes, VERSION_FIELD: json.dumps(version)})
+                self._remember(state.conversation_id, version, encoded)
+            return len(changes)
+
+    def load(self, conversation_id: str):
+        """Returns the stored state or None."""
+        with self._lock:
+            fields = self._read(conversation_id)
+            if fields is None:
+                return None
+            fields = dict(fields)
+            version = fields.pop(VERSION_FIELD, None)
+            self._remember(conversation_id, int(version) if version is not None else None, fields)
+        return MeetingRequestState.from_dict({key: json.loads(value) for key, value in fields.items()})
+
+    def delete(self, conversation_id: str):
+        with self._lock:
+            self._written.pop(conversation_id, None)
+            self._delete(conversation_id)
+
+
+class MemoryStateStore(StateStore):
+    """Process-local LRU store; the least recently used sessions fall out past `capacity`."""
+
+    def __init__(self, capacity: int = MEMORY_CAPACITY):
+        super().__init__(written_capacity=capacity)
+        self.capacity = capacity
+        self._data = OrderedDict()
+
+    def _read(self, conversation_id):
+        fields = self._data.get(conversation_id)
+        if fields is not None:
+            self._data.move_to_end(conversation_id)
+        return fields
+
+    def _write(self, conversation_id, changes):
+        fields = self._data.setdefault(conversation_id, {})
+        fields.update(changes)
+        self._data.move_to_end(conversation_id)
+        while len(self._data) > self.capacity:
+            evicted, _ = self._data.popitem(last=False)
+            self._written.pop(evicted, None)
+
+    def _delete(self, conversation_id):
+        self._data.pop(conversation_id, None)
+
+
+class SQLiteStateStore(StateStore):
+    """
+    SQLite store in WAL mode with one row per (conversation, field).
+
+    A save is a single transaction that upserts only the changed fields.
+    WAL lets readers in other processes proceed while a save commits.
+    """
+
+    def __init__(self, path: str = STATE_DB):
+        super().__init__()
+        self.path = path
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS state (conversation_id TEXT, field TEXT, value TEXT, PRIMARY KEY (conversation_id, field)) WITHOUT ROWID")
+
+    def _read(self, conversation_id):
+        rows = self._db.execute("SELECT field, value FROM state WHERE conversation_id = ?", (conversation_id,)).fetchall()
+        return dict(rows) if rows else None
+
+    def _stored_version(self, conversation_id):
+        row = self._db.execute("SELECT value FROM state WHERE conversation_id = ? AND field = ?", (conversation_id, VERSION_FIELD)).fetchone()
+        return int(row[0]) if row else None
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so no other process can save between the version check and the write.
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _write(self, conversation_id, changes):
+        self._db.executemany(
+            "INSERT INTO state VALUES (?, ?, ?) ON CONFLICT (conversation_id, field) DO UPDATE SET value = excluded.value",
+            [(conversation_id, key, value) for key, value in changes.items()],
+        )
+
+    def _delete(self, conversation_id):
+        self._db.execute("DELETE FROM state WHERE conversation_id = ?", (conversation_id,))
+
+    def close(self):
+        self._db.close()
+
+
+class JournalStateStore(StateStore):
+    """
+    Append-only JSON-lines journal. Each save appends one line holding only the
+    changed fields, and the whole journal is replayed into memory on open. Once
+    the journal holds JOURNAL_COMPACT_RATIO lines per live session, it is
+    rewritten to one line per session in a temp file and swapped in with an
+    atomic os.replace. Meant for a single writer process.
+    """
+
+    def __init__(self, path: str = STATE_JOURNAL, compact_ratio: int = JOURNAL_COMPACT_RATIO):
+        super().__init__()
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self._data = {}
+        self._lines = 0
+        damaged = False
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for line in f:
+                    # A line without its newline is a torn append too, even if it happens to parse.
+                    damaged = damaged or not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from a crash mid-append; everything before it is intact.
+                        logger.error("Skipping corrupt line in %s", path)
+                        damaged = True
+                        continue
+                    self._apply(record)
+                    self._lines += 1
+        self._file = open(path, "a")
+        if damaged:
+            # Appending after the torn fragment would glue the next record onto it; rewrite the journal first.
+            self.compact()
+
+    def _apply(self, record):
+        if record.get("deleted"):
+            self._data.pop(record["id"], None)
+        else:
+            self._data.setdefault(record["id"], {}).update(record["changes"])
+
+    def _append(self, record):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._file.flush()
+        self._apply(record)
+        self._lines += 1
+        if self._lines > max(self.compact_ratio * len(self._data), JOURNAL_MIN_COMPACT_LINES):
+            self.compact()
+
+    def _read(self, conversation_id):
+        fields = self._data.get(conversation_id)
+        return dict(fields) if fields is not None else None
+
+    def _stored_version(self, conversation_id):
+        version = self._data.get(conversation_id, {}).get(VERSION_FIELD)
+        return int(version) if version is not None else None
+
+    def _write(self, conversation_id, changes):
+        self._append({"id": conversation_id, "changes": changes})
+
+    def _delete(self, conversation_id):
+        self._append({"id": conversation_id, "deleted": True})
+
+    def compact(self):
+        """Rewrites the journal with one line per live session. Callers hold the lock."""
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for conversation_id, fields in self._data.items():
+                f.write(json.dumps({"id": conversation_id, "changes": fields}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._file.close()
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a")
+        self._lines = len(self._data)
+        logger.info("Compacted %s to %s sessions.", self.path, self._lines)
+
+    def close(self):
+        self._file.close()
+
 
 class StateManager:
-    """Handles loading and saving the conversation state."""
-    def __init__(self, state_file=STATE_FILE):
-        self.state_file = state_file
+    """Handles loading and saving conversation states through a pluggable StateStore."""
+    def __init__(self, store: StateStore = None):
+        self.store = store if store is not None else SQLiteStateStore()
 
     def save_state(self, state: MeetingRequestState):
-        """Saves the current state to a JSON file."""
+        """Saves the fields of `state` that changed since it was last saved."""
         try:
-            with open(self.state_file, 'w') as f:
-                json.dump(state.to_dict(), f, indent=4)
-            logger.info(f"State saved successfully to {self.state_file}")
-        except IOError as e:
-            logger.error(f"Error saving state to {self.state_file}: {e}")
-
-    def load_state(self) -> MeetingRequestState:
-        """Loads the state from a JSON file, or creates a new one."""
-        if os.path.exists(self.state_file):
-            try:
-                with open(self.state_file, 'r') as f:
-                    data = json.load(f)
-                    logger.info(f"State loaded successfully from {self.state_file}")
-                    return MeetingRequestState.from_dict(data)
-            except (IOError, json.JSONDecodeError) as e:
-                logger.error(f"Error loading state from {self.state_file}, creating new state. Error: {e}")
-                return MeetingRequestState()
-        else:
-            logger.info("No state file found, creating a new state.")
-            return MeetingRequestState()
\ No newline at end of file
+            changed = self.store.save(state)
+            logger.debug("State for '%s' saved (%s fields changed)", state.conversation_id, changed)
+        except (IOError, sqlite3.Error) as e:
+            logger.error("Error saving state for '%s': %s", state.conversation_id, e)
+
+    def load_state(self, conversation_id: str) -> MeetingRequestState:
+        """Loads the state for a conversation, or creates a new one."""
+        try:
+            state = self.store.load(conversation_id)
+        except (IOError, sqlite3.Error, json.JSONDecodeError) as e:
+            logger.error("Error loading state for '%s', creating new state. Error: %s", conversation_id, e)
+            state = None
+        if state is None:
+            logger.debug("No saved state for '%s', creating a new state.", conversation_id)
+            return MeetingRequestState(conversation_id=conversation_id)
+        return state
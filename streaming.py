@@ -0,0 +1,110 @@
+# streaming.py
+import re
+import time
+
+from logger_config import logger
+
+# A sentence ends at ., ! or ? (optionally followed by a closing quote/bracket) and whitespace,
+# unless the next word starts in lowercase ("9 a.m. and ..."). A boundary at the very end of the
+# buffer is held until the next chunk shows what follows.
+_SENTENCE_END = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[^a-z\s])")
+# Very short fragments ("e.g.", "1.") are held back and merged into the next sentence.
+MIN_SENTENCE_CHARS = 12
+
+
+class SentenceBuffer:
+    """Accumulates streamed text and hands out complete sentences as soon as they end."""
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, text: str) -> list[str]:
+        self._pending += text
+        sentences = []
+        start = 0
+        for match in _SENTENCE_END.finditer(self._pending):
+            sentence = self._pending[start:match.end()].strip()
+            if len(sentence) < MIN_SENTENCE_CHARS:
+                continue
+            sentences.append(sentence)
+            start = match.end()
+        self._pending = self._pending[start:]
+        return sentences
+
+    def flush(self) -> str:
+        rest, self._pending = self._pending.strip(), ""
+        return rest
+
+
+class StreamingReply:
+    """
+    One assistant reply rendered while it is generated.
+
+    `render` receives the full text so far after every chunk and `speak`
+    receives each complete sentence, so the UI and speech both start before
+    generation ends. Time to first visible token and to first spoken sentence
+    are logged when the reply finishes.
+    """
+
+    def __init__(self, render, speak=None, clock=time.perf_counter):
+        self.render = render
+        self.speak = speak
+        self.clock = clock
+        self.started = clock()
+        self.text = ""
+        self.first_token_at = None
+        self.first_speech_at = None
+        self._sentences = SentenceBuffer()
+        self._paragraph = False
+        self._checkpoint = ("", "")
+
+    def new_paragraph(self):
+        """Separates the next text added (e.g. another model round's) from what is shown so far."""
+        self._paragraph = True
+
+    def checkpoint(self):
+        """Remembers the reply as it is now, for `rewind`."""
+        self._checkpoint = (self.text, self._sentences._pending)
+
+    def rewind(self):
+        """
+        Drops the text added since the last `checkpoint`, e.g. by a model call that
+        failed mid-stream and is being retried. Sentences already spoken stay spoken.
+        """
+        text, pending = self._checkpoint
+        if self.text != text:
+            self.text, self._sentences._pending = text, pending
+            self.render(self.text)
+
+    def add_text(self, chunk: str):
+        if not chunk:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = self.clock()
+        if self._paragraph and self.text:
+            chunk = "\n\n" + chunk
+        self._paragraph = False
+        self.text += chunk
+        self.render(self.text)
+        for sentence in self._sentences.feed(chunk):
+            self._say(sentence)
+
+    def _say(self, sentence: str):
+        if self.speak is None:
+            return
+        if self.first_speech_at is None:
+            self.first_speech_at = self.clock()
+        self.speak(sentence)
+
+    def finish(self) -> dict:
+        """Speaks any trailing partial sentence and logs the latency metrics."""
+        rest = self._sentences.flush()
+        if rest:
+            self._say(rest)
+        metrics = {
+            "time_to_first_token_ms": None if self.first_token_at is None else round((self.first_token_at - self.started) * 1000, 1),
+            "time_to_first_speech_ms": None if self.first_speech_at is None else round((self.first_speech_at - self.started) * 1000, 1),
+            "total_ms": round((self.clock() - self.started) * 1000, 1),
+        }
+        logger.info("Streaming reply metrics: %s", metrics)
+        return metrics
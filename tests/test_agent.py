@@ -0,0 +1,104 @@
+# tests/test_agent.py
+"""Agent streaming against a stand-in model whose stream can fail part way."""
+import types
+
+from agent import Agent
+from history_manager import HistoryManager
+from rate_limiter import RateLimiter, RetryPolicy
+from streaming import StreamingReply
+
+
+class ServiceUnavailable(Exception):
+    """Named like the Gemini SDK's 503 error, which the limiter retries by name."""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def part(text=None, call=None):
+    function_call = types.SimpleNamespace(name=call[0], args=call[1]) if call else None
+    return types.SimpleNamespace(text=text or "", function_call=function_call)
+
+
+class Response:
+    usage_metadata = types.SimpleNamespace(prompt_token_count=100, candidates_token_count=10, total_token_count=110)
+
+    def __init__(self, parts, chunks=None, fail_after=None):
+        self.candidates = [types.SimpleNamespace(content=types.SimpleNamespace(parts=parts))]
+        self.text = "".join(p.text for p in parts)
+        self._chunks = chunks if chunks is not None else [p.text for p in parts]
+        self._fail_after = fail_after
+
+    def __iter__(self):
+        for i, text in enumerate(self._chunks):
+            if i == self._fail_after:
+                raise ServiceUnavailable("503 while streaming")
+            yield types.SimpleNamespace(candidates=[types.SimpleNamespace(content=types.SimpleNamespace(parts=[part(text)]))])
+
+
+class ScriptedModel:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+class Executor:
+    registry = {}
+
+    def execute(self, calls):
+        return ["Free all afternoon."] * len(calls)
+
+
+def make_agent(model):
+    limiter = RateLimiter("gemini-test", {"requests_per_minute": (100, 60)}, clock=FakeClock(), policy=RetryPolicy())
+    return Agent(model, executor=Executor(), limiter=limiter)
+
+
+def test_stream_failing_mid_way_is_retried_without_repeating_text():
+    final = [part("You are free at 3 pm. Shall I book it?")]
+    model = ScriptedModel(Response(final, chunks=["You are free ", "at 3 pm."], fail_after=1), Response(final))
+    shown = []
+    reply = StreamingReply(render=shown.append)
+    result = make_agent(model).respond(HistoryManager(), "When am I free?", reply)
+    assert model.calls == 2
+    assert reply.text == "You are free at 3 pm. Shall I book it?"
+    assert result.text == reply.text
+
+
+def test_history_keeps_the_text_shown_across_tool_rounds():
+    model = ScriptedModel(
+        Response([part("Let me check."), part(call=("check_availability", {"start_time": "x"}))]),
+        Response([part("You are free all afternoon.")]),
+    )
+    history = HistoryManager()
+    reply = StreamingReply(render=lambda text: None)
+    make_agent(model).respond(history, "Am I free?", reply)
+    assert reply.text == "Let me check.\n\nYou are free all afternoon."
+    assert history.contents()[-1] == {"role": "model", "parts": [{"text": reply.text}]}
+
+
+def test_retry_works_through_a_service_relay():
+    import queue
+    from service import _Relay
+
+    final = [part("You are free at 3 pm.")]
+    model = ScriptedModel(Response(final, chunks=["You are ", "free"], fail_after=1), Response(final))
+    reply = StreamingReply(render=lambda text: None)
+    calls = queue.Queue()
+    result = make_agent(model).respond(HistoryManager(), "When am I free?", _Relay(reply, calls))
+    while not calls.empty():
+        func, args, kwargs = calls.get()
+        func(*args, **kwargs)
+    assert reply.text == result.text == "You are free at 3 pm."
@@ -0,0 +1,78 @@
+# tests/test_logger_config.py
+"""DedupingQueueListener driven by a fake clock, without starting its thread."""
+import logging
+import queue
+
+from logger_config import DedupingQueueListener
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def make_listener(window=60):
+    clock = [0.0]
+    handler = ListHandler()
+    listener = DedupingQueueListener(queue.SimpleQueue(), handler, window=window, clock=lambda: clock[0])
+    return listener, handler, clock
+
+
+def record(msg, level=logging.WARNING, lineno=1):
+    return logging.LogRecord("test", level, "test.py", lineno, msg, None, None)
+
+
+def test_interleaved_repeats_are_counted_per_message():
+    listener, handler, clock = make_listener()
+    for _ in range(3):
+        listener.handle(record("a"))
+        listener.handle(record("b", lineno=2))
+    assert handler.messages == ["a", "b"]
+    clock[0] = 61
+    listener.handle(record("c", lineno=3))
+    assert handler.messages == ["a", "b", "Repeated 2 more times in 61s: a", "Repeated 2 more times in 61s: b", "c"]
+
+
+def test_info_records_are_never_deduped():
+    listener, handler, _ = make_listener()
+    listener.handle(record("hi", logging.INFO))
+    listener.handle(record("hi", logging.INFO))
+    assert handler.messages == ["hi", "hi"]
+
+
+class IdleThenQueue:
+    """A queue that is empty for its first `get`, then returns `item`."""
+
+    def __init__(self, item):
+        self.item = item
+        self.gets = 0
+
+    def get(self, block=True, timeout=None):
+        self.gets += 1
+        if self.gets == 1:
+            raise queue.Empty
+        return self.item
+
+
+def test_idle_dequeue_flushes_expired_windows():
+    listener, handler, clock = make_listener()
+    listener.handle(record("a"))
+    listener.handle(record("a"))
+    clock[0] = 61
+    listener.queue = IdleThenQueue(record("x", logging.INFO))
+    assert listener.dequeue(True).getMessage() == "x"
+    assert handler.messages == ["a", "Repeated 1 more times in 61s: a"]
+
+
+def test_stop_flushes_open_windows():
+    listener, handler, clock = make_listener()
+    listener.handle(record("a"))
+    listener.handle(record("a"))
+    clock[0] = 5
+    listener.start()
+    listener.stop()
+    assert handler.messages == ["a", "Repeated 1 more times in 5s: a"]
@@ -0,0 +1,25 @@
+# tests/test_models.py
+"""MeetingRequestState normalization and binary round trips."""
+import pytest
+
+from models import MeetingRequestState
+
+
+def test_float_args_are_stored_as_ints():
+    # Gemini function-call arguments arrive as floats.
+    state = MeetingRequestState(duration_minutes=30.0, time_range_start=1_900_000_000.0, suggested_slots=[1_900_003_600.0])
+    assert type(state.duration_minutes) is int and type(state.time_range_start) is int
+    assert MeetingRequestState.from_bytes(state.to_bytes()) == state
+
+
+def test_round_trip_keeps_every_field():
+    state = MeetingRequestState("c1", 45, 1, 2, "Asia/Kolkata", [5, 6], 7, "Planning €", "confirmed")
+    assert MeetingRequestState.from_bytes(state.to_bytes()) == state
+    assert MeetingRequestState.from_bytes(memoryview(state.to_bytes())) == state
+
+
+def test_truncated_input_raises_value_error():
+    data = MeetingRequestState("c1", 45, meeting_title="Planning", suggested_slots=[5, 6]).to_bytes()
+    for end in range(len(data)):
+        with pytest.raises(ValueError):
+            MeetingRequestState.from_bytes(data[:end])
@@ -0,0 +1,178 @@
+# tests/test_rate_limiter.py
+"""RateLimiter and TokenBucket driven by a fake clock, so nothing really sleeps."""
+import pytest
+
+from rate_limiter import RateLimiter, RateLimitExceeded, RetryPolicy, TokenBucket
+
+
+class FakeClock:
+    """Same interface as rate_limiter.SystemClock; `sleep` just moves time forward."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ResourceExhausted(Exception):
+    """Named like the Gemini SDK's quota error, which the limiter retries by name."""
+
+
+class HttpStatusError(Exception):
+    def __init__(self, code, message=""):
+        super().__init__(message)
+        self.code = code
+
+
+def make_limiter(clock, per_minute=2, **kwargs):
+    return RateLimiter("test", {"requests_per_minute": (per_minute, 60)}, clock=clock, **kwargs)
+
+
+def test_bucket_refills_continuously():
+    clock = FakeClock()
+    bucket = TokenBucket("rpm", capacity=60, period=60, clock=clock)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 30
+    assert bucket.wait_time(30) == 0.0
+    assert bucket.wait_time(31) == pytest.approx(1.0)
+    clock.now += 1000
+    assert bucket.snapshot()["available"] == 60     # never above capacity
+
+
+def test_callers_queue_until_the_bucket_refills():
+    clock = FakeClock()
+    limiter = make_limiter(clock, per_minute=2)
+    limiter.acquire()
+    limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire()                                # third request waits for one token: 30 s at 2/min
+    assert clock.sleeps == [pytest.approx(30.0)]
+    assert limiter.stats()["queued_seconds"] == pytest.approx(30.0)
+    assert limiter.stats()["buckets"]["requests_per_minute"]["throttled"] == 1
+
+
+def test_queueing_longer_than_max_wait_raises():
+    clock = FakeClock()
+    limiter = make_limiter(clock, per_minute=1, max_wait=10)
+    limiter.acquire()
+    with pytest.raises(RateLimitExceeded):
+        limiter.acquire()                            # would need 60 s
+    assert clock.sleeps == []
+
+
+def test_token_cost_is_charged_per_dimension():
+    clock = FakeClock()
+    limiter = RateLimiter("test", {"requests_per_minute": (100, 60), "input_tokens_per_minute": (1000, 60)}, clock=clock)
+    limiter.acquire({"input_tokens_per_minute": 1000})
+    limiter.acquire({"input_tokens_per_minute": 500})
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+
+def test_retry_waits_at_least_the_server_retry_delay():
+    clock = FakeClock()
+    limiter = make_limiter(clock, per_minute=100, policy=RetryPolicy(max_retries=3, base_backoff=1.0))
+    attempts = []
+
+    def flaky():
+        attempts.append(clock.now)
+        if len(attempts) == 1:
+            raise ResourceExhausted("quota exceeded retry_delay { seconds: 7 }")
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 7
+    assert limiter.stats()["retries"] == 1
+
+
+def test_429_drains_the_short_window_buckets():
+    clock = FakeClock()
+    limiter = make_limiter(clock, per_minute=10, policy=RetryPolicy(max_retries=1, base_backoff=0.001))
+    calls = []
+
+    def rejected_once():
+        calls.append(clock.now)
+        if len(calls) == 1:
+            raise HttpStatusError(429)
+        return "ok"
+
+    assert limiter.call(rejected_once) == "ok"
+    # After the drain the retry had to wait for a refilled token (6 s at 10/min), not just the tiny backoff.
+    assert calls[1] - calls[0] >= 6 - 1e-9
+
+
+def test_exhausted_retries_raise_rate_limit_exceeded():
+    clock = FakeClock()
+    limiter = make_limiter(clock, per_minute=100, policy=RetryPolicy(max_retries=2, base_backoff=0.5))
+    calls = []
+
+    def always_busy():
+        calls.append(clock.now)
+        raise HttpStatusError(503, "unavailable")
+
+    with pytest.raises(RateLimitExceeded) as excinfo:
+        limiter.call(always_busy)
+    assert len(calls) == 3
+    assert isinstance(excinfo.value.__cause__, HttpStatusError)
+    assert limiter.stats()["failures"] == 1
+
+
+def test_non_retryable_errors_propagate_unchanged():
+    clock = FakeClock()
+    limiter = make_limiter(clock)
+
+    def broken():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        limiter.call(broken)
+    assert clock.sleeps == []
+
+
+class FakeResponse(dict):
+    def __init__(self, status):
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = "test"
+
+
+class ScriptedHttp:
+    """httplib2 stand-in answering with the given statuses in turn."""
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.requests = 0
+
+    def request(self, uri, method="GET", body=None, headers=None):
+        self.requests += 1
+        return FakeResponse(self.statuses.pop(0)), b"{}"
+
+
+@pytest.mark.parametrize("uri, method, requests", [
+    ("https://www.googleapis.com/calendar/v3/calendars/primary/events", "GET", 2),
+    ("https://www.googleapis.com/calendar/v3/freeBusy", "POST", 2),
+    ("https://www.googleapis.com/calendar/v3/calendars/primary/events", "POST", 1),
+    ("https://www.googleapis.com/batch/calendar/v3", "POST", 1),
+])
+def test_server_errors_are_retried_only_when_the_request_can_be_repeated(uri, method, requests):
+    from calendar_client import RateLimitedHttp
+    http = ScriptedHttp(503, 200)
+    limiter = RateLimiter("calendar", {"requests_per_minute": (100, 60)}, clock=FakeClock(), policy=RetryPolicy())
+    resp, _ = RateLimitedHttp(http, limiter).request(uri, method=method)
+    assert http.requests == requests
+    assert resp.status == (200 if requests == 2 else 503)
+
+
+def test_insert_is_retried_on_429():
+    from calendar_client import RateLimitedHttp
+    http = ScriptedHttp(429, 200)
+    limiter = RateLimiter("calendar", {"requests_per_minute": (100, 60)}, clock=FakeClock(), policy=RetryPolicy())
+    resp, _ = RateLimitedHttp(http, limiter).request("https://www.googleapis.com/calendar/v3/calendars/primary/events", method="POST")
+    assert (http.requests, resp.status) == (2, 200)
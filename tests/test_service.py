@@ -0,0 +1,88 @@
+# tests/test_service.py
+"""SchedulerService with a stand-in agent and Calendar clients."""
+import threading
+import time
+import types
+
+import pytest
+
+from service import SchedulerService
+
+
+class FakeClients:
+    def get(self, user_id):
+        return types.SimpleNamespace(user_id=user_id, has_token=lambda: user_id != "nobody")
+
+
+class RecordingAgent:
+    """Sleeps through each turn and records the most turns one history ever had running at once."""
+
+    def __init__(self, seconds=0.02):
+        self.seconds = seconds
+        self.lock = threading.Lock()
+        self.running = {}
+        self.peak = 0
+
+    def respond(self, history, prompt, reply=None, on_tool_calls=None):
+        with self.lock:
+            self.running[id(history)] = self.running.get(id(history), 0) + 1
+            self.peak = max(self.peak, self.running[id(history)])
+        time.sleep(self.seconds)
+        with self.lock:
+            self.running[id(history)] -= 1
+        return prompt
+
+
+def test_one_turn_at_a_time_per_user():
+    agent = RecordingAgent()
+    service = SchedulerService(agent, clients=FakeClients(), workers=4)
+    history = object()
+    try:
+        turns = [service.submit("alice", history, f"message {i}") for i in range(4)]
+        assert [turn.future.result(timeout=5) for turn in turns] == [f"message {i}" for i in range(4)]
+    finally:
+        service.close()
+    assert agent.peak == 1
+
+
+def test_other_users_run_alongside():
+    agent = RecordingAgent(seconds=0.2)
+    service = SchedulerService(agent, clients=FakeClients(), workers=2)
+    try:
+        first = service.submit("alice", object(), "a")
+        second = service.submit("bob", object(), "b")
+        time.sleep(0.1)
+        assert service.stats()["running"] == 2
+        first.future.result(timeout=5), second.future.result(timeout=5)
+    finally:
+        service.close()
+
+
+def test_user_without_a_token_fails_fast():
+    from calendar_client import CalendarAuthRequired
+    agent = RecordingAgent()
+    service = SchedulerService(agent, clients=FakeClients(), workers=1)
+    try:
+        turn = service.submit("nobody", object(), "hi")
+        with pytest.raises(CalendarAuthRequired):
+            turn.future.result(timeout=5)
+    finally:
+        service.close()
+    assert agent.peak == 0
+
+
+def test_profiled_turn_returns_stats_from_the_worker():
+    from agent import TurnResult
+
+    class Agent:
+        def respond(self, history, prompt, reply=None, on_tool_calls=None):
+            return TurnResult(prompt, round_trips=1)
+
+    service = SchedulerService(Agent(), clients=FakeClients(), workers=1)
+    try:
+        profiled = service.respond("alice", object(), "hi", profile=True)
+        plain = service.respond("alice", object(), "hi")
+    finally:
+        service.close()
+    assert "respond" in profiled.profile
+    assert plain.profile is None
@@ -0,0 +1,23 @@
+# tests/test_state_manager.py
+"""JournalStateStore recovery from a crash in the middle of an append."""
+from models import MeetingRequestState
+from state_manager import JournalStateStore
+
+
+def test_save_after_a_torn_tail_survives_a_restart(tmp_path):
+    path = str(tmp_path / "state.jsonl")
+    store = JournalStateStore(path)
+    store.save(MeetingRequestState(conversation_id="a", meeting_title="Sync"))
+    store.close()
+    with open(path, "a") as f:
+        f.write('{"id":"b","changes":{"status"')    # the crash cut this append short
+
+    store = JournalStateStore(path)
+    store.save(MeetingRequestState(conversation_id="c", duration_minutes=30))
+    store.close()
+
+    store = JournalStateStore(path)
+    assert store.load("a").meeting_title == "Sync"
+    assert store.load("b") is None
+    assert store.load("c").duration_minutes == 30
+    store.close()
@@ -0,0 +1,77 @@
+# tests/test_tool_cache.py
+"""ToolResultCache against a stand-in event store and tool, without Google APIs."""
+import types
+
+from calendar_client import use_calendar_client
+from tool_cache import ToolResultCache
+from tool_executor import ToolExecutor, ToolSpec
+
+
+class FakeStore:
+    def __init__(self, generation):
+        self.generation = generation
+        self.version = 0
+
+    def poll_changes(self):
+        return self.version
+
+
+def test_replaced_store_at_the_same_version_misses():
+    computed = []
+
+    def get_day_schedule(day="today", timezone=None):
+        computed.append(day)
+        return [f"Standup on {day}"]
+
+    executor = ToolExecutor(registry={"get_day_schedule": ToolSpec(get_day_schedule)})
+    stores = [FakeStore(1)]
+    cache = ToolResultCache(store_factory=lambda: stores[-1])
+    calls = [("get_day_schedule", {"day": "2030-01-07"})]
+    with use_calendar_client(types.SimpleNamespace(user_id="alice")):
+        cache.execute(calls, executor)
+        cache.execute(calls, executor)
+        assert len(computed) == 1
+        # e.g. reset_event_stores after an account switch: a new store, back at version 0
+        stores.append(FakeStore(2))
+        cache.execute(calls, executor)
+    assert len(computed) == 2
+
+
+def test_calls_reading_other_calendars_get_the_short_ttl():
+    computed = []
+
+    def check_availability(start_time, end_time, duration_minutes, timezone="UTC", calendar_ids=None):
+        computed.append(calendar_ids)
+        return ["free"]
+
+    now = [0.0]
+    executor = ToolExecutor(registry={"check_availability": ToolSpec(check_availability)})
+    cache = ToolResultCache(store_factory=lambda: FakeStore(1), clock=lambda: now[0])
+    args = {"start_time": "2030-01-07T09:00:00+00:00", "end_time": "2030-01-07T17:00:00+00:00", "duration_minutes": 30}
+    own = [("check_availability", {**args, "calendar_ids": ["primary"]})]
+    shared = [("check_availability", {**args, "calendar_ids": ["primary", "bob@example.com"]})]
+    with use_calendar_client(types.SimpleNamespace(user_id="alice")):
+        cache.execute(own, executor)
+        cache.execute(shared, executor)
+        now[0] = 120
+        cache.execute(own, executor)
+        cache.execute(shared, executor)
+    assert computed == [["primary"], ["primary", "bob@example.com"], ["primary", "bob@example.com"]]
+
+
+def test_results_are_not_cached_when_the_store_changes_while_tools_run():
+    store = FakeStore(1)
+    computed = []
+
+    def get_day_schedule(day="today", timezone=None):
+        computed.append(day)
+        store.version += 1      # a sync lands while the tool runs
+        return [f"Standup on {day}"]
+
+    executor = ToolExecutor(registry={"get_day_schedule": ToolSpec(get_day_schedule)})
+    cache = ToolResultCache(store_factory=lambda: store)
+    calls = [("get_day_schedule", {"day": "2030-01-07"})]
+    with use_calendar_client(types.SimpleNamespace(user_id="alice")):
+        cache.execute(calls, executor)
+        cache.execute(calls, executor)
+    assert len(computed) == 2
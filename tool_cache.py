@@ -0,0 +1,255 @@
+# tool_cache.py
+"""
+Memoized read-only tool results, and templated answers for schedule lookups.
+
+Results of read-only tools (`ToolSpec.read_only`) are cached under their
+normalized arguments: defaults filled in, times resolved to epoch seconds,
+'today'/'tomorrow' resolved to a date, calendar lists sorted, so differently
+worded questions that come down to the same query share an entry. Entries
+are kept per user (the Calendar client the call runs under). An entry is used
+only while that user's primary calendar's event store is the same store
+(`generation`, so a store replaced after a reset or an account switch does
+not match) at the same version it was computed at (the store moves on with
+every change it sees, from incremental sync or from our own writes); results
+are not cached if the store moved on while the tools ran. An entry also
+expires with its TTL, which bounds staleness for other people's calendars
+read through freebusy: any call whose `calendar_ids` name a calendar besides
+'primary' gets the shorter OTHER_CALENDARS_TTL_SECONDS.
+
+When the model's first tool turn only asks for `get_day_schedule` and the user
+just wants to see their day, `templated_answer` writes the reply itself and
+the second model call is skipped.
+
+Hits, misses, templated answers and the time they saved are counted in
+`metrics` (`tool_cache_*`, `templated_answers_total`).
+"""
+import collections
+import datetime
+import inspect
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+import pytz
+
+from agent_config import DEFAULT_TIMEZONE
+from calendar_client import current_calendar_client
+from calendar_tools import resolve_day
+from event_store import get_event_store
+from logger_config import logger
+from metrics import is_error_result, metrics
+
+DEFAULT_TTL_SECONDS = 300
+# Other people's calendars are not synced, so their answers age out sooner.
+OTHER_CALENDARS_TTL_SECONDS = 60
+TTL_SECONDS = {"find_group_availability": OTHER_CALENDARS_TTL_SECONDS}
+MAX_ENTRIES = 256
+TEMPLATED_TOOLS = ("get_day_schedule",)
+
+# Only plain "what does my day look like" messages get a templated answer;
+# anything asking for a change, a free time or a judgement goes back to the model.
+_SCHEDULE_QUESTION = re.compile(r"\b(schedule|agenda|calendar|plans?|meetings?|events?|day|busy)\b", re.IGNORECASE)
+_NEEDS_MODEL = re.compile(
+    r"\b(book|create|add|set up|arrange|cancel|delete|remove|move|reschedule|change|update|invite|"
+    r"free|available|availability|slots?|fit|before|after|between|conflicts?|should|could|can|why|how long|longest|first|last)\b"
+    r"|\bschedule (a|an|my|the|it|this|that)\b",
+    re.IGNORECASE,
+)
+_FREE_DAY = "Your schedule for that day is completely free."
+
+
+@dataclass
+class _Entry:
+    result: object
+    version: tuple     # (store generation, store version) the result was computed at
+    created: float
+    duration: float     # how long computing the result took, i.e. what a hit saves
+    ttl: float
+
+
+def _timestamp(value: str, tz) -> float:
+    dt = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if dt.tzinfo is None:
+        dt = tz.localize(dt)
+    return dt.timestamp()
+
+
+def normalize_args(func, args: dict, now: float):
+    """
+    The cache key for calling `func` with `args`, or None if the arguments do
+    not bind or parse (the tool itself then reports the problem).
+
+    Availability depends on the clock near the start of the range (past slots
+    and the minimum notice are cut off), so such keys also carry the current
+    slot-granularity step.
+    """
+    try:
+        bound = inspect.signature(func).bind(**args)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        tz = pytz.timezone(arguments.get("timezone") or DEFAULT_TIMEZONE)
+        key = []
+        for name, value in sorted(arguments.items()):
+            if value is None:
+                pass
+            elif name == "timezone":
+                value = tz.zone
+            elif name.endswith("_time"):
+                value = _timestamp(value, tz)
+            elif name == "day" or name.endswith("_date"):
+                value = resolve_day(value, tz).isoformat()
+            elif name == "calendar_ids":
+                value = tuple(sorted(set(value)))
+            elif isinstance(value, float) and value.is_integer():
+                value = int(value)
+            elif isinstance(value, list):
+                value = tuple(value)
+            key.append((name, value))
+        if "granularity_minutes" in arguments and ("start_time" in arguments or "start_date" in arguments):
+            step = int(arguments["granularity_minutes"]) * 60
+            notice = int(arguments.get("min_notice_minutes") or 0) * 60
+            if "start_time" in arguments:
+                start = _timestamp(arguments["start_time"], tz)
+            else:
+                start = tz.localize(datetime.datetime.combine(resolve_day(arguments["start_date"], tz), datetime.time())).timestamp()
+            if start < now + notice + step:
+                key.append(("now", int(now // step)))
+        return (func.__name__, tuple(key))
+    except (TypeError, ValueError, AttributeError, pytz.UnknownTimeZoneError):
+        return None
+
+
+def _day_label(day: str, timezone: str) -> str:
+    tz = pytz.timezone(timezone)
+    date = resolve_day(day, tz)
+    today = datetime.datetime.now(tz).date()
+    if date == today:
+        return "today"
+    if date == today + datetime.timedelta(days=1):
+        return "tomorrow"
+    return date.strftime("%A, %d %B")
+
+
+class ToolResultCache:
+    """Process-wide cache in front of a ToolExecutor; safe to share between sessions and threads."""
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, ttl_by_tool=None, max_entries=MAX_ENTRIES,
+                 store_factory=get_event_store, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.ttl_by_tool = TTL_SECONDS if ttl_by_tool is None else ttl_by_tool
+        self.max_entries = max_entries
+        self.store_factory = store_factory
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()   # key -> _Entry, least recently used first
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _get(self, key, version: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != version or self.clock() - entry.created > entry.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _ttl(self, key) -> float:
+        """The tool's TTL, cut to OTHER_CALENDARS_TTL_SECONDS when the call reads calendars besides 'primary'."""
+        ttl = self.ttl_by_tool.get(key[0], self.ttl_seconds)
+        calendars = dict(key[1]).get("calendar_ids")
+        if calendars and any(calendar_id != "primary" for calendar_id in calendars):
+            ttl = min(ttl, OTHER_CALENDARS_TTL_SECONDS)
+        return ttl
+
+    def _put(self, key, entry: _Entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def execute(self, calls: list[tuple[str, dict]], executor) -> list:
+        """
+        Same contract as `executor.execute`, answering read-only calls from the
+        cache where possible. Calls after a write in the same turn always run,
+        so they see its effect, and nothing from such a turn is cached.
+        """
+        now = time.time()
+        user_id = current_calendar_client().user_id
+        keys, wrote = [], False
+        for name, args in calls:
+            spec = executor.registry.get(name)
+            wrote = wrote or spec is None or not spec.read_only
+            key = None if wrote else normalize_args(spec.func, args, now)
+            keys.append(key and (*key, user_id))
+        version = None
+        if any(keys):
+            store = self.store_factory()
+            version = (store.generation, store.poll_changes())
+
+        results, misses = [None] * len(calls), []
+        for index, ((name, _), key) in enumerate(zip(calls, keys)):
+            entry = self._get(key, version) if key else None
+            if entry is None:
+                misses.append(index)
+                if key:
+                    metrics.inc("tool_cache_misses_total", tool=name)
+                continue
+            results[index] = entry.result
+            metrics.inc("tool_cache_hits_total", tool=name)
+            metrics.inc("tool_cache_saved_seconds_total", entry.duration, source="tool_result")
+            logger.info("Tool '%s' answered from cache", name)
+        if not misses:
+            return results
+
+        started = self.clock()
+        fresh = executor.execute([calls[i] for i in misses])
+        duration = self.clock() - started
+        if version is not None and not wrote:
+            # Results are stamped with the version they were computed from. If a sync
+            # landed while the tools ran, they may mix old and new data: keep none.
+            store = self.store_factory()
+            if (store.generation, store.version) != version:
+                version = None
+        created = self.clock()
+        for index, result in zip(misses, fresh):
+            results[index] = result
+            if keys[index] and version is not None and not is_error_result(result):
+                self._put(keys[index], _Entry(result, version, created, duration, self._ttl(keys[index])))
+        return results
+
+    def templated_answer(self, prompt: str, calls: list[tuple[str, dict]], results: list):
+        """
+        The reply to send instead of calling the model again, or None. Only for
+        turns made of TEMPLATED_TOOLS calls that all succeeded, answering a
+        message that just asks to see the schedule.
+        """
+        if not calls or any(name not in TEMPLATED_TOOLS for name, _ in calls):
+            return None
+        if not _SCHEDULE_QUESTION.search(prompt) or _NEEDS_MODEL.search(prompt):
+            return None
+        if any(is_error_result(result) or not isinstance(result, list) for result in results):
+            return None
+        sections = []
+        for (_, args), result in zip(calls, results):
+            try:
+                label = _day_label(args["day"], args.get("timezone") or DEFAULT_TIMEZONE)
+            except (KeyError, ValueError, pytz.UnknownTimeZoneError):
+                return None
+            if result == [_FREE_DAY]:
+                sections.append(f"Your schedule for {label} is completely free.")
+            else:
+                sections.append(f"Here's your schedule for {label}:\n" + "\n".join(f"- {line}" for line in result))
+
+        model_calls = metrics.histogram("model_call_seconds")
+        saved = model_calls.sum / model_calls.count if model_calls is not None and model_calls.count else 0.0
+        metrics.inc("templated_answers_total", tool=calls[0][0])
+        metrics.inc("tool_cache_saved_seconds_total", saved, source="template")
+        logger.info("Answered from a template, skipping a model call")
+        return "\n\n".join(sections)
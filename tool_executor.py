@@ -0,0 +1,106 @@
+# tool_executor.py
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from calendar_tools import (bulk_manage_calendar_events, check_availability, create_calendar_event, find_group_availability,
+                            get_day_schedule, manage_calendar_event, search_availability)
+from logger_config import log_context, logger
+from metrics import metrics
+
+MAX_WORKERS = 8
+DEFAULT_TIMEOUT_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """
+    A callable tool plus how it may be scheduled. Writes get no timeout
+    (`timeout=None`): an abandoned write would still land after the model
+    was told it failed and retried it. They are bounded by the Calendar
+    client's HTTP timeout and the rate limiter's wait limit instead.
+    """
+    func: Callable
+    timeout: Optional[float] = DEFAULT_TIMEOUT_SECONDS
+    read_only: bool = True  # read-only tools may run concurrently with each other
+
+
+TOOL_REGISTRY = {
+    "check_availability": ToolSpec(check_availability, timeout=20),
+    "find_group_availability": ToolSpec(find_group_availability, timeout=30),
+    "search_availability": ToolSpec(search_availability, timeout=30),
+    "get_day_schedule": ToolSpec(get_day_schedule, timeout=20),
+    "create_calendar_event": ToolSpec(create_calendar_event, timeout=None, read_only=False),
+    "manage_calendar_event": ToolSpec(manage_calendar_event, timeout=None, read_only=False),
+    "bulk_manage_calendar_events": ToolSpec(bulk_manage_calendar_events, timeout=None, read_only=False),
+}
+
+_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="tool")
+
+
+def _call_in_context(name: str, func: Callable, args: dict):
+    """Runs one tool on a worker thread with its log records tagged with the tool name."""
+    with log_context(tool=name):
+        return func(**args)
+
+
+class ToolExecutor:
+    """
+    Runs the function calls of one model turn.
+
+    Consecutive read-only calls are dispatched to a shared thread pool together;
+    a call that writes to the calendar waits for everything before it and runs
+    on its own, so the model's intended order of side effects is kept. Results
+    come back in call order, and each call's failure or timeout is reported as
+    its own result instead of aborting the turn. Only read-only calls time out.
+    """
+
+    def __init__(self, registry=None, pool=None):
+        self.registry = TOOL_REGISTRY if registry is None else registry
+        self.pool = _pool if pool is None else pool
+
+    def _run_group(self, group, results):
+        started = time.monotonic()
+        futures = []
+        for index, name, args in group:
+            spec = self.registry[name]
+            # Copy the caller's context so the worker's records carry e.g. the conversation ID.
+            future = self.pool.submit(contextvars.copy_context().run, _call_in_context, name, spec.func, args)
+            futures.append((index, name, spec, future))
+        for index, name, spec, future in futures:
+            remaining = None if spec.timeout is None else max(spec.timeout - (time.monotonic() - started), 0)
+            try:
+                results[index] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                # The worker thread cannot be interrupted; its late result is discarded.
+                logger.error("Tool '%s' timed out after %ss.", name, spec.timeout)
+                metrics.inc("tool_timeouts_total", tool=name)
+                results[index] = f"Error: the tool '{name}' timed out after {spec.timeout} seconds."
+            except Exception as e:
+                logger.error("Tool '%s' failed: %s", name, e, exc_info=True)
+                results[index] = f"An error occurred: {e}"
+
+    def execute(self, calls: list[tuple[str, dict]]) -> list:
+        """Executes (tool name, args) pairs and returns their results in the same order."""
+        results = [None] * len(calls)
+        group = []
+        for index, (name, args) in enumerate(calls):
+            spec = self.registry.get(name)
+            if spec is None:
+                results[index] = f"Unknown tool requested: {name}"
+                continue
+            if spec.read_only:
+                group.append((index, name, args))
+                continue
+            if group:
+                self._run_group(group, results)
+                group = []
+            self._run_group([(index, name, args)], results)
+        if group:
+            self._run_group(group, results)
+        return results
+
+
+tool_executor = ToolExecutor()